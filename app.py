@@ -1,10 +1,55 @@
 import streamlit as st
 
+from core import profiling
+from core.session_store import get_session_store
+from core.tables import markdown_table
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
 pages = [
     "strategy_utility/UI_strategy_utility.py",
     "pareto/UI_pareto.py",
-    "lemke_howson/UI_LH.py"
+    "lemke_howson/UI_LH.py",
+    "learning/UI_learning.py"
 ]
+# reruns kept for the profiling panel / export
+PROFILE_HISTORY = 20
 
 pg = st.navigation(pages)
-pg.run()
\ No newline at end of file
+profile_on = st.sidebar.toggle("Profiling", value=profiling.ENABLED_BY_DEFAULT, key='profiling_on')
+if profile_on:
+    profiling.begin_rerun(pg.title)
+try:
+    pg.run()
+finally:
+    profile = profiling.end_rerun()
+
+# this session's state memory (estimate), see core/session_store.py
+ctx = get_script_run_ctx()
+for rec in get_session_store().report():
+    if ctx is not None and rec['session'] == ctx.session_id:
+        st.sidebar.caption(f"Session state: {rec['total']/2**10:.0f} KiB")
+
+
+def render_profiling_panel(history):
+    # full reruns only: fragment reruns don't go through this script
+    last = history[-1].to_dict()
+    with st.sidebar.expander(f"Profile: {last['label']} {last['seconds']*1000:.0f} ms", expanded=False):
+        st.caption("Script time per timer (inclusive), last rerun. "
+                   "Time after the script (sending to the browser) is not included.")
+        # markdown tables: st.dataframe would import pandas on every page
+        st.markdown(markdown_table([
+            {'timer': name, 'calls': rec['calls'], 'total ms': round(rec['total'] * 1000, 2),
+             'max ms': round(rec['max'] * 1000, 2), 'share': f"{rec['total'] / last['seconds']:.0%}"}
+            for name, rec in last['timers'].items()
+        ]))
+        if len(last['counters']) > 0:
+            st.markdown(markdown_table([{'counter': k, 'count': v} for k, v in last['counters'].items()]))
+        st.download_button("Export JSON", profiling.to_json(history), file_name='profile.json',
+                           mime='application/json', key='profiling_export')
+
+
+if profile is not None:
+    history = st.session_state.setdefault('profiling_history', [])
+    history.append(profile)
+    del history[:-PROFILE_HISTORY]
+    render_profiling_panel(history)
@@ -0,0 +1,290 @@
+"""
+Benchmark cases. Each suite yields result records
+
+    {'name': ..., 'params': {...},
+     'timings': {op: {'median', 'min', 'repeat'} in seconds},
+     'counters': {counter: number}}
+
+names are stable across runs, which is what baseline comparison keys on.
+Games come from core.generators with fixed seeds, so every run measures
+the same work.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, List
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.startup import startup_suite
+from core.generators import generate
+from core.normal_form_game import NFG_Core
+from core.polymatrix import random_polymatrix
+from core.sparse_game import SparseNFG
+from core.symmetric import SymmetricNFG
+from lemke_howson.solver import LH_solver, lh_equilibria, symmetric_lh_equilibria
+from pareto.viz_components import ParetoViz, MixedStrategyProfile as ParetoProfile
+from strategy_utility.viz_components import MixedStrategy, MixedStrategyProfile, StrategyUtilityViz
+
+
+def stats(samples:List[float]) -> Dict[str, float]:
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'repeat': len(samples)
+    }
+
+
+def measure(fn:Callable, repeat:int, number:int=1) -> Dict[str, float]:
+    """Per-call seconds of fn, over repeat rounds of number calls."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return stats(samples)
+
+
+# ---- Lemke-Howson ----
+def _lh_solve(game:NFG_Core, max_pivots:int) -> int:
+    """Pivots of one LH run from the first label (max_pivots if it doesn't finish)."""
+    model = LH_solver(game)
+    model.update(initial=0)
+    pivots = 1
+    while not model.done and pivots < max_pivots:
+        model.update()
+        pivots += 1
+    return pivots
+
+
+def lh_suite(quick:bool=False, repeat:int=5) -> Iterator[dict]:
+    """LH_solver time and pivots vs game size, on generic and degenerate games."""
+    sizes = (5, 10, 20) if quick else (5, 10, 20, 40, 80)
+    for kind, params in (('uniform', {}), ('degenerate', dict(levels=3)), ('degenerate', dict(levels=2))):
+        for n in sizes:
+            games = generate(kind, [n, n], 5, seed=0, **params)
+            max_pivots = 50 * n
+            pivots = [_lh_solve(g, max_pivots) for g in games]
+            name = f"lh/{kind}{params.get('levels', '')}/{n}x{n}"
+            yield {
+                'name': name,
+                'params': dict(kind=kind, n=n, games=len(games), **params),
+                'timings': {'solve': measure(lambda: [_lh_solve(g, max_pivots) for g in games], repeat)},
+                'counters': {
+                    'pivots': int(sum(pivots)),
+                    'unfinished': int(sum(p >= max_pivots for p in pivots))
+                }
+            }
+
+
+# ---- utilities ----
+def _random_mix(cls, pid:int, labels:List[str], rng:np.random.Generator):
+    ms = cls(pid, labels)
+    ms.ratios = rng.random(len(labels)).tolist()
+    ms._normalize()
+    return ms
+
+
+def util_suite(quick:bool=False, repeat:int=5) -> Iterator[dict]:
+    """get_util calls/s and batched deviation_payoffs profiles/s vs player count."""
+    rng = np.random.default_rng(0)
+    players = (2, 3, 4) if quick else (2, 3, 4, 5, 6)
+    for n in players:
+        game = generate('uniform', [4] * n, 1, seed=0)[0]
+        sprofile = [_random_mix(MixedStrategy, p, game.labels[p], rng) for p in range(n)]
+        batch = [rng.dirichlet(np.ones(4), 1024) for _ in range(n)]
+        get_util = measure(lambda: game.get_util(0, sprofile), repeat, number=200)
+        deviation = measure(lambda: game.deviation_payoffs(batch), repeat)
+        yield {
+            'name': f"util/4^{n}",
+            'params': dict(n_players=n, n_strategies=4, batch=1024),
+            'timings': {'get_util': get_util, 'deviation_payoffs': deviation},
+            'counters': {
+                'get_util_per_s': 1.0 / get_util['median'],
+                'profiles_per_s': 1024 / deviation['median']
+            }
+        }
+
+
+def sparse_suite(quick:bool=False, repeat:int=5) -> Iterator[dict]:
+    """Batched deviation_payoffs and payoff memory, dense vs SparseNFG, vs density."""
+    rng = np.random.default_rng(0)
+    shape = [6] * 4 if quick else [8] * 5
+    batch = [rng.dirichlet(np.ones(n), 256) for n in shape]
+    for density in (0.001, 0.01, 0.1):
+        dense = generate('sparse', shape, 1, seed=0, density=density)[0]
+        sparse = SparseNFG.from_dense(dense)
+        yield {
+            'name': f"sparse/{'x'.join(map(str, shape))}/{density}",
+            'params': dict(shape=shape, density=density, nnz=sparse.nnz, batch=256),
+            'timings': {
+                'dense_deviation_payoffs': measure(lambda: dense.deviation_payoffs(batch), repeat),
+                'sparse_deviation_payoffs': measure(lambda: sparse.deviation_payoffs(batch), repeat),
+            },
+            'counters': {'dense_bytes': dense.payoff_nbytes(), 'sparse_bytes': sparse.payoff_nbytes()}
+        }
+
+
+def polymatrix_suite(quick:bool=False, repeat:int=5) -> Iterator[dict]:
+    """get_util and batched deviation_payoffs of polymatrix games vs player count (no dense tensor)."""
+    rng = np.random.default_rng(0)
+    players = (10, 50) if quick else (10, 50, 100, 200)
+    for n in players:
+        game = random_polymatrix(n, 3, degree=4, seed=0)
+        sprofile = [_random_mix(MixedStrategy, p, game.labels[p], rng) for p in range(n)]
+        batch = [rng.dirichlet(np.ones(3), 256) for _ in range(n)]
+        get_util = measure(lambda: game.get_util(0, sprofile), repeat, number=20)
+        deviation = measure(lambda: game.deviation_payoffs(batch), repeat)
+        yield {
+            'name': f"polymatrix/{n}x3",
+            'params': dict(n_players=n, n_strategies=3, degree=4, batch=256),
+            'timings': {'get_util': get_util, 'deviation_payoffs': deviation},
+            'counters': {'payoff_bytes': game.payoff_nbytes(), 'profiles_per_s': 256 / deviation['median']}
+        }
+
+
+def symmetric_suite(quick:bool=False, repeat:int=5) -> Iterator[dict]:
+    """Symmetric games: payoff memory and payoffs against a common mix vs player
+    count (SymmetricNFG), and LH on the symmetric LCP vs LH on both players'."""
+    rng = np.random.default_rng(0)
+    players = (4, 50) if quick else (4, 8, 50, 200)
+    for n in players:
+        game = SymmetricNFG(n, 3, rng.random((3, math.comb(n + 1, 2))))
+        X = rng.dirichlet(np.ones(3), 256)
+        yield {
+            'name': f"symmetric/{n}x3",
+            'params': dict(n_players=n, n_strategies=3, batch=256),
+            'timings': {'symmetric_payoff_vecs': measure(lambda: game.symmetric_payoff_vecs(X), repeat)},
+            'counters': {'payoff_bytes': game.payoff_nbytes(), 'dense_bytes': 8 * game.n_entries}
+        }
+    k = 10 if quick else 30
+    A = rng.random((k, k))
+    game = NFG_Core(2, [k, k], np.stack([A, A.T]), 'symmetric', [[f"s{i}" for i in range(k)]] * 2)
+    yield {
+        'name': f"symmetric/lh/{k}x{k}",
+        'params': dict(shape=[k, k]),
+        'timings': {
+            'lh_equilibria': measure(lambda: lh_equilibria(game), repeat),
+            'symmetric_lh_equilibria': measure(lambda: symmetric_lh_equilibria(game), repeat),
+        },
+        'counters': {}
+    }
+
+
+# ---- viz ----
+def _su_viz(game:NFG_Core, size:int, rng:np.random.Generator) -> StrategyUtilityViz:
+    """Strategy-utility viz of player 0 with the pure strategies plus a few mixes, and size opponent profiles."""
+    viz = StrategyUtilityViz(game, 0)
+    viz.reset_viz()
+    for _ in range(4):
+        viz._add_strategy_player_i(_random_mix(MixedStrategy, 0, game.labels[0], rng))
+    for _ in range(size - 1):
+        viz._add_sprofile_player_o(_su_profile(game, rng))
+    return viz
+
+
+def _su_profile(game:NFG_Core, rng:np.random.Generator) -> MixedStrategyProfile:
+    msp = MixedStrategyProfile(0)
+    msp.mixed_strats = [_random_mix(MixedStrategy, p, game.labels[p], rng) for p in range(1, game.n_players)]
+    return msp
+
+
+def _pr_viz(game:NFG_Core, size:int, rng:np.random.Generator) -> ParetoViz:
+    viz = ParetoViz(game)
+    for _ in range(size):
+        viz._add_sprofile(_pr_profile(game, rng))
+    return viz
+
+
+def _pr_profile(game:NFG_Core, rng:np.random.Generator) -> ParetoProfile:
+    msp = ParetoProfile(None)
+    msp.mixed_strats = [_random_mix(MixedStrategy, p, game.labels[p], rng) for p in range(game.n_players)]
+    return msp
+
+
+def _edit_latency(add:Callable, modify:Callable, delete:Callable, repeat:int) -> Dict[str, dict]:
+    # one add / modify / delete round trip per sample, so the viz keeps its size
+    samples = {'add': [], 'modify': [], 'delete': []}
+    for _ in range(repeat):
+        for op, fn in (('add', add), ('modify', modify), ('delete', delete)):
+            start = time.perf_counter()
+            fn()
+            samples[op].append(time.perf_counter() - start)
+    return {op: stats(s) for op, s in samples.items()}
+
+
+def _json_roundtrip(viz, cls, game:NFG_Core, repeat:int):
+    """Save (to_json + write) and load (read + from_dict) times of a viz file, and its size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'viz.json')
+
+        def save():
+            with open(path, 'w') as f:
+                f.write(viz.to_json())
+
+        def load():
+            with open(path, 'r') as f:
+                cls.from_dict(json.load(f), game=game)
+
+        save_t = measure(save, repeat)
+        load_t = measure(load, repeat)
+        return save_t, load_t, os.path.getsize(path)
+
+
+def viz_suite(quick:bool=False, repeat:int=20) -> Iterator[dict]:
+    """Edit latency and JSON save/load time of strategy-utility and Pareto viz files of growing size."""
+    rng = np.random.default_rng(0)
+    game = generate('uniform', [4, 4, 4], 1, seed=0)[0]
+    sizes = (10, 100) if quick else (10, 100, 1000)
+    for size in sizes:
+        viz = _su_viz(game, size, rng)
+        mid = size // 2
+        profile, strategy = _su_profile(game, rng), _random_mix(MixedStrategy, 0, game.labels[0], rng)
+        timings = {}
+        for op, latency in _edit_latency(
+                lambda: viz._add_sprofile_player_o(profile),
+                lambda: viz._modify_sprofile_player_o(mid, profile),
+                lambda: viz._delete_sprofile_player_o(len(viz.get_oppo_sps()) - 1), repeat).items():
+            timings[f'{op}_sprofile'] = latency
+        for op, latency in _edit_latency(
+                lambda: viz._add_strategy_player_i(strategy),
+                lambda: viz._modify_strategy_player_i(0, strategy),
+                lambda: viz._delete_strategy_player_i(len(viz.get_pi_s()) - 1), repeat).items():
+            timings[f'{op}_strategy'] = latency
+        timings['save'], timings['load'], nbytes = _json_roundtrip(viz, StrategyUtilityViz, game, max(repeat // 4, 3))
+        yield {
+            'name': f"viz/su/{size}",
+            'params': dict(shape=game.n_strategies, profiles=size, strategies=len(viz.get_pi_s())),
+            'timings': timings,
+            'counters': {'file_bytes': nbytes}
+        }
+
+        viz = _pr_viz(game, size, rng)
+        profile = _pr_profile(game, rng)
+        timings = _edit_latency(
+            lambda: viz._add_sprofile(profile),
+            lambda: viz._modify_sprofile(mid, profile),
+            lambda: viz._delete_sprofile(len(viz.msps) - 1), repeat)
+        timings['save'], timings['load'], nbytes = _json_roundtrip(viz, ParetoViz, game, max(repeat // 4, 3))
+        yield {
+            'name': f"viz/pr/{size}",
+            'params': dict(shape=game.n_strategies, profiles=size),
+            'timings': timings,
+            'counters': {'file_bytes': nbytes}
+        }
+
+
+SUITES = {
+    'lh': lh_suite,
+    'util': util_suite,
+    'sparse': sparse_suite,
+    'polymatrix': polymatrix_suite,
+    'symmetric': symmetric_suite,
+    'viz': viz_suite,
+    'startup': startup_suite,
+}
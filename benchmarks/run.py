@@ -0,0 +1,131 @@
+"""
+Benchmark runner: python -m benchmarks.run [options] (from the repo root)
+
+    python -m benchmarks.run --out bench.json                   # run every suite, store results
+    python -m benchmarks.run --suite lh util --quick            # smaller sizes, fewer repeats
+    python -m benchmarks.run --baseline bench.json --threshold 0.2
+        # compare with stored results: exit code 1 when some timing got more
+        # than 20% slower (or a solver needs more pivots)
+
+Results are JSON: {'env': machine / library metadata, 'results': records
+of benchmarks/cases.py}. Timings compare by median; compare results from
+the same machine (the env block is printed side by side when it differs).
+"""
+from __future__ import annotations
+from typing import List
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.cases import SUITES
+
+# counters where an increase is a regression (the others are informational)
+REGRESSION_COUNTERS = ('pivots', 'unfinished')
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        # BLAS thread counts change the tensor contraction timings
+        'threads': {k: os.environ[k] for k in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+                    if k in os.environ},
+    }
+
+
+def run(suites:List[str], quick:bool=False, repeat:int=None) -> dict:
+    results = []
+    for suite in suites:
+        kwargs = {} if repeat is None else dict(repeat=repeat)
+        for record in SUITES[suite](quick=quick, **kwargs):
+            timings = ' '.join(f"{op}={t['median']*1000:.3f}ms" for op, t in record['timings'].items())
+            print(f"{record['name']:<28} {timings}", flush=True)
+            results.append(record)
+    return {'env': environment(), 'results': results}
+
+
+def compare(current:dict, baseline:dict, threshold:float) -> List[str]:
+    """
+    Print the change of every timing (median) and regression counter against
+    the baseline; returns the regressions (more than threshold worse).
+    """
+    base = {r['name']: r for r in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        old = base.get(record['name'])
+        if old is None:
+            continue
+        for op, t in record['timings'].items():
+            if op not in old['timings']:
+                continue
+            ratio = t['median'] / max(old['timings'][op]['median'], 1e-12)
+            flag = ''
+            if ratio > 1.0 + threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{record['name']} {op}: {ratio:.2f}x slower")
+            print(f"{record['name']:<28} {op:<18} {old['timings'][op]['median']*1000:10.3f}ms -> "
+                  f"{t['median']*1000:10.3f}ms  {ratio:5.2f}x{flag}")
+        for counter in REGRESSION_COUNTERS:
+            if counter in record['counters'] and counter in old['counters']:
+                new_c, old_c = record['counters'][counter], old['counters'][counter]
+                if new_c > old_c * (1.0 + threshold):
+                    regressions.append(f"{record['name']} {counter}: {old_c} -> {new_c}")
+    missing = set(base) - {r['name'] for r in current['results']}
+    if missing:
+        print(f"not run (in the baseline only): {', '.join(sorted(missing))}")
+    for key in ('commit', 'python', 'numpy', 'platform', 'processor', 'cpu_count', 'threads'):
+        if baseline['env'].get(key) != current['env'].get(key):
+            print(f"env {key}: {baseline['env'].get(key)} -> {current['env'].get(key)}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks of the solvers, utilities and viz edits.')
+    parser.add_argument('--suite', nargs='+', choices=list(SUITES), default=list(SUITES))
+    parser.add_argument('--quick', action='store_true', help='smaller sizes (smoke runs)')
+    parser.add_argument('--repeat', type=int, default=None, help='timing rounds per case (default per suite)')
+    parser.add_argument('--out', default=None, help='write the results (json) here')
+    parser.add_argument('--baseline', default=None, help='results json to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fail when a median is more than this fraction slower than the baseline')
+    args = parser.parse_args(argv)
+
+    current = run(args.suite, quick=args.quick, repeat=args.repeat)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=1)
+        print(f"results written to {args.out}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"    {line}")
+        return 1
+    print(f"no regression over {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
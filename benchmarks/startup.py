@@ -0,0 +1,106 @@
+"""
+Cold-start timings of the pages: python -m benchmarks.startup [--top 15]
+
+Every sample runs in a fresh interpreter (nothing imported yet) and measures
+    import_streamlit   importing streamlit, the floor of any cold start
+    first_run          the page's first script run: its own imports and rendering
+    rerun              a second run, everything imported: first_run - rerun ~ import cost
+and lists the slowest imports (-X importtime, cumulative) of the first run.
+Also the 'startup' suite of python -m benchmarks.run.
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PAGES = [
+    "strategy_utility/UI_strategy_utility.py",
+    "pareto/UI_pareto.py",
+    "lemke_howson/UI_LH.py",
+    "learning/UI_learning.py"
+]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = '-- first run --'
+
+# run in the child: page path as argv[1], prints one json line
+_CHILD = f"""
+import sys, time, json
+sys.path.insert(0, {ROOT!r})
+start = time.perf_counter()
+import streamlit
+import_streamlit = time.perf_counter() - start
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+sys.stderr.write({MARKER!r} + '\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+first_run = time.perf_counter() - start
+sys.stderr.write({MARKER!r} + '\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+print(json.dumps(dict(import_streamlit=import_streamlit, first_run=first_run, rerun=rerun,
+                      exceptions=[str(e.value) for e in at.exception])))
+"""
+
+
+def measure_page(page:str) -> dict:
+    """One cold start of page: the timings, and the top-level imports of its first run (name -> seconds)."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD, os.path.join(ROOT, page)],
+                          capture_output=True, text=True, cwd=ROOT, timeout=600)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{page}: {proc.stderr[-2000:]}")
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports = {}
+    section = proc.stderr.split(MARKER)[1] if proc.stderr.count(MARKER) >= 2 else ''
+    for line in section.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting by indentation
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        if name.startswith('  ') or not cumulative.strip().isdigit():
+            continue
+        imports[name.strip()] = int(cumulative) / 1e6
+    out['imports'] = imports
+    return out
+
+
+def _stats(samples:List[float]) -> Dict[str, float]:
+    return {'median': statistics.median(samples), 'min': min(samples), 'repeat': len(samples)}
+
+
+def startup_suite(quick:bool=False, repeat:int=3) -> Iterator[dict]:
+    """Cold-start timings per page (fresh interpreters, see measure_page)."""
+    repeat = 1 if quick else repeat
+    for page in PAGES:
+        runs = [measure_page(page) for _ in range(repeat)]
+        yield {
+            'name': f"startup/{os.path.basename(page)[:-3]}",
+            'params': dict(page=page),
+            'timings': {k: _stats([r[k] for r in runs]) for k in ('import_streamlit', 'first_run', 'rerun')},
+            'counters': {
+                'imported_modules': len(runs[-1]['imports']),
+                'exceptions': len(runs[-1]['exceptions'])
+            }
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cold-start time of the app pages.')
+    parser.add_argument('pages', nargs='*', default=PAGES)
+    parser.add_argument('--top', type=int, default=15, help='slowest first-run imports shown')
+    args = parser.parse_args()
+
+    for page in args.pages:
+        run = measure_page(page)
+        print(f"{page}: import streamlit {run['import_streamlit']*1000:.0f}ms, "
+              f"first run {run['first_run']*1000:.0f}ms, rerun {run['rerun']*1000:.0f}ms"
+              + (f", exceptions: {run['exceptions']}" if run['exceptions'] else ''))
+        for name, seconds in sorted(run['imports'].items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {seconds*1000:8.1f}ms  {name}")
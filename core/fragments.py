@@ -0,0 +1,20 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Set
+
+import streamlit as st
+
+
+def rerun_dependents(deps:Dict[str,Set[str]], changed:Iterable[str], extra:Iterable[str]=()):
+    """
+    Rerun only the fragments that read the changed state.
+    Call from a widget callback (on_change / on_click).
+
+    deps: fragment key -> names of the state it reads, e.g. {'chart': {'visibility'}}
+    changed: names of the state the callback just changed
+    extra: fragment keys to rerun regardless, e.g. the caller's own fragment
+    """
+    changed = set(changed)
+    keys = [key for key, reads in deps.items() if reads & changed]
+    keys += [key for key in extra if key not in keys]
+    if len(keys) > 0:
+        st.rerun(keys)
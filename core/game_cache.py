@@ -0,0 +1,169 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+# default budget for the process-wide cache, overridable by env var
+DEFAULT_MAX_BYTES = int(os.environ.get('GTV_CACHE_MAX_BYTES', 256 * 2**20))
+
+
+def estimate_nbytes(value, _depth:int=0) -> int:
+    """Rough memory footprint of a cached value (numpy arrays counted by nbytes)."""
+    if _depth > 8:
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, NFG_Core):
+        return value.payoff_nbytes() + estimate_nbytes(value.labels, _depth+1)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(k, _depth+1) + estimate_nbytes(v, _depth+1) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v, _depth+1) for v in value)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_nbytes(vars(value), _depth+1)
+    return sys.getsizeof(value)
+
+
+class GameCache:
+    """
+    Process-wide, content-addressed cache shared by every session.
+
+    Games are keyed by NFG_Core.game_hash(); one read-only instance per
+    distinct game is handed out to all sessions. Derived artifacts
+    (equilibria, reductions, LH traces, ...) are stored under
+    (game_hash, kind, key). Entries are evicted least-recently-used
+    once their estimated size exceeds max_bytes.
+
+    Entries got / put with persist=True also go to store (a ResultStore,
+    see core/result_store.py): misses are looked up there before computing,
+    so results outlive the process and are shared with other processes.
+    """
+    def __init__(self, max_bytes:int=DEFAULT_MAX_BYTES, store=None):
+        self.max_bytes:int = max_bytes
+        self.store = store
+        self.nbytes:int = 0
+        self.hits:int = 0
+        self.misses:int = 0
+        self.store_hits:int = 0
+        # (game_hash, kind, key) -> (value, nbytes)
+        self.entries:OrderedDict = OrderedDict()
+        # path -> (mtime, text, game_hash) for files under data/
+        self.files:Dict[str, Tuple[float, str, str]] = {}
+        self.lock = threading.RLock()
+
+    # ---- generic entries ----
+    def get(self, game_hash:str, kind:str, key:Any=None, default=None, persist:bool=False):
+        with self.lock:
+            entry = self.entries.get((game_hash, kind, key))
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end((game_hash, kind, key))
+                return entry[0]
+            self.misses += 1
+        if persist and self.store is not None:
+            _missing = object()
+            value = self.store.get(game_hash, kind, key, default=_missing)
+            if value is not _missing:
+                with self.lock:
+                    self.store_hits += 1
+                return self.put(game_hash, kind, value, key)
+        return default
+
+    def put(self, game_hash:str, kind:str, value, key:Any=None, nbytes:int=None,
+            persist:bool=False, seconds:float=None):
+        """seconds: time value took to compute, kept by the store."""
+        if persist and self.store is not None:
+            self.store.put(game_hash, kind, value, key, seconds=seconds)
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        with self.lock:
+            old = self.entries.pop((game_hash, kind, key), None)
+            if old is not None:
+                self.nbytes -= old[1]
+            # too large to ever fit: don't cache, don't flush everything else
+            if nbytes > self.max_bytes:
+                return value
+            self.entries[(game_hash, kind, key)] = (value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        return value
+
+    def get_or_compute(self, game_hash:str, kind:str, compute:Callable[[], Any], key:Any=None,
+                       persist:bool=False):
+        _missing = object()
+        value = self.get(game_hash, kind, key, default=_missing, persist=persist)
+        if value is _missing:
+            # computed outside the lock: concurrent misses may compute twice, never block each other
+            start = time.perf_counter()
+            value = compute()
+            value = self.put(game_hash, kind, value, key, persist=persist, seconds=time.perf_counter() - start)
+        return value
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self.entries) > 0:
+            _, (_, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    # ---- games ----
+    def intern_game(self, game:NFG_Core) -> NFG_Core:
+        """Shared, read-only instance equal to game."""
+        game_hash = game.game_hash()
+        shared = self.get(game_hash, 'game')
+        if shared is None:
+            game.set_read_only()
+            shared = self.put(game_hash, 'game', game)
+        return shared
+
+    def load_json_file(self, path:str) -> Tuple[dict, NFG_Core]:
+        """
+        Parse a game or viz json file (e.g. the defaults under data/).
+        Returns a fresh dict, safe to mutate, and the shared game inside it.
+        The file is read once per process (again only if it changes on disk).
+        """
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.files.get(path)
+        if cached is not None and cached[0] == mtime:
+            data = json.loads(cached[1])
+            game = self.get(cached[2], 'game')
+            if game is not None:
+                return data, game
+        with open(path) as f:
+            text = f.read()
+        data = json.loads(text)
+        game = self.intern_game(NFG_Core.from_dict(data.get('game', data)))
+        with self.lock:
+            self.files[path] = (mtime, text, game.game_hash())
+        return data, game
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'store_hits': self.store_hits,
+            }
+
+
+_shared_cache: GameCache | None = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache() -> GameCache:
+    """The process-wide cache (Streamlit sessions run as threads of one process)."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from core.result_store import get_result_store
+            _shared_cache = GameCache(store=get_result_store())
+    return _shared_cache
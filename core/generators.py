@@ -0,0 +1,216 @@
+"""
+Random and structured NFG_Core generators, for benchmarks and stress tests.
+
+Every generator writes the payoffs of a whole batch of games into one array
+of shape (batch, n_players, *n_strategies) with numpy ops (no nested lists);
+the games are views into it. Seeded generation is deterministic: the same
+(kind, shape, n_games, seed, chunk, params) always gives the same games.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Iterator, List
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+
+@lru_cache(maxsize=None)
+def _labels(shape:tuple) -> List[List[str]]:
+    # shared by every generated game of this shape
+    return [[f"s{i}" for i in range(n)] for n in shape]
+
+
+def uniform_payoffs(rng:np.random.Generator, shape:List[int], batch:int, low:float=0.0, high:float=1.0):
+    """Independent uniform payoffs in [low, high)."""
+    out = rng.random((batch, len(shape), *shape))
+    out *= high - low
+    out += low
+    return out
+
+
+def covariant_payoffs(rng:np.random.Generator, shape:List[int], batch:int, rho:float=0.0):
+    """
+    Standard normal payoffs, correlated across players with coefficient rho
+    at every profile: rho = 1 common interest, rho = -1/(n_players-1) the most
+    conflicting (zero-sum when there are 2 players), 0 independent.
+    """
+    n = len(shape)
+    if not -1.0 / max(n - 1, 1) - 1e-12 <= rho <= 1.0:
+        raise ValueError(f"rho must be in [{-1.0 / max(n - 1, 1):.3f}, 1] for {n} players")
+    cov = np.full((n, n), rho)
+    np.fill_diagonal(cov, 1.0)
+    # symmetric square root (the covariance is singular at both ends of the range)
+    w, q = np.linalg.eigh(cov)
+    root = q * np.sqrt(np.clip(w, 0.0, None))
+    z = rng.standard_normal((batch, n, *shape))
+    return np.moveaxis(np.tensordot(root, z, axes=([1], [1])), 0, 1)
+
+
+def zero_sum_payoffs(rng:np.random.Generator, shape:List[int], batch:int):
+    """Uniform payoffs in [-1, 1), centered so they sum to 0 at every profile."""
+    out = uniform_payoffs(rng, shape, batch, -1.0, 1.0)
+    out -= out.mean(axis=1, keepdims=True)
+    return out
+
+
+def coordination_payoffs(rng:np.random.Generator, shape:List[int], batch:int, noise:float=0.5):
+    """
+    Common payoffs: uniform in [0, noise) off the diagonal, in [1, 1 + noise)
+    where every player picks the same index, so each diagonal profile is a
+    pure equilibrium.
+    """
+    common = rng.random((batch, *shape)) * noise
+    diag = np.arange(min(shape))
+    common[(slice(None),) + (diag,) * len(shape)] += 1.0
+    return np.repeat(common[:, None], len(shape), axis=1)
+
+
+def dominance_solvable_payoffs(rng:np.random.Generator, shape:List[int], batch:int, gap:float=0.1):
+    """
+    Uniform payoffs made solvable by iterated strict dominance: taking turns,
+    a player's last remaining strategy is made strictly worse (by a random
+    gap in (0, gap]) than a random other remaining one, on the profiles still
+    remaining, until one profile is left. Each player's strategies are then
+    shuffled per game, so the elimination order is hidden.
+    """
+    n = len(shape)
+    out = rng.random((batch, n, *shape))
+    # elimination order: (player, its strategy to eliminate, profiles still remaining)
+    schedule = []
+    remaining = list(shape)
+    p = 0
+    while sum(remaining) > n:
+        if remaining[p] > 1:
+            remaining[p] -= 1
+            schedule.append((p, remaining[p], tuple(slice(0, remaining[q]) for q in range(n) if q != p)))
+        p = (p + 1) % n
+    # written last elimination first: a later step only lowers rows of strategies
+    # that outlive the earlier ones, so their dominators are final when used
+    games = np.arange(batch)
+    for p, worse, others in reversed(schedule):
+        # player p's payoffs with its own strategy axis first
+        u = np.moveaxis(out[:, p], p + 1, 1)
+        dominator = rng.integers(0, worse, batch)
+        better = u[games, dominator][(slice(None),) + others]
+        u[(slice(None), worse) + others] = better - gap * (1.0 - rng.random(better.shape))
+    for q, k in enumerate(shape):
+        perm = rng.permuted(np.broadcast_to(np.arange(k), (batch, k)), axis=1)
+        index = perm.reshape((batch, 1) + tuple(k if a == q else 1 for a in range(n)))
+        out = np.take_along_axis(out, index, axis=q + 2)
+    return out
+
+
+def sparse_payoffs(rng:np.random.Generator, shape:List[int], batch:int, density:float=0.1):
+    """Uniform payoffs at a random density share of the entries, 0 elsewhere."""
+    out = rng.random((batch, len(shape), *shape))
+    out[rng.random(out.shape) >= density] = 0.0
+    return out
+
+
+def degenerate_payoffs(rng:np.random.Generator, shape:List[int], batch:int, levels:int=3):
+    """Integer payoffs in [0, levels): ties everywhere, degenerate for small levels."""
+    return rng.integers(0, levels, (batch, len(shape), *shape)).astype(float)
+
+
+def rps_payoffs(rng:np.random.Generator, shape:List[int], batch:int, noise:float=0.0):
+    """
+    Rock-Paper-Scissors with n strategies (shape [n, n]): i loses to the next
+    (n-1)//2 strategies and beats the rest (i ties the opposite one for even n),
+    as in data/pr/viz2_Rock-Paper-Scissors.json for n = 3. noise > 0 scales
+    each distance's stake by a random factor in [1, 1 + noise), keeping the
+    game symmetric and zero-sum.
+    """
+    if len(shape) != 2 or shape[0] != shape[1]:
+        raise ValueError(f"Rock-Paper-Scissors takes shape [n, n] ({shape} given)")
+    n = shape[0]
+    d = (np.arange(n)[None, :] - np.arange(n)[:, None]) % n
+    sign = np.where(d == 0, 0.0, np.where(d <= (n - 1) // 2, -1.0, 1.0))
+    sign[2 * d == n] = 0.0
+    # stake per distance, symmetric in d <-> n-d so that u0 stays antisymmetric
+    stake = 1.0 + noise * rng.random((batch, n))
+    stake = np.minimum(stake, stake[:, (n - np.arange(n)) % n])
+    u0 = sign[None] * np.take_along_axis(stake, d.reshape(1, -1).repeat(batch, 0), axis=1).reshape(batch, n, n)
+    # (+ 0.0: no negative zeros in the ties)
+    return np.stack([u0, -u0 + 0.0], axis=1)
+
+
+def prisoners_dilemma_payoffs(rng:np.random.Generator, shape:List[int], batch:int,
+                              benefit:float=2.0, temptation:float=1.0, noise:float=0.0):
+    """
+    n-player Prisoner's Dilemma (shape [2] * n, strategy 0 silent, 1 betray):
+        u_p = benefit * (share of the others staying silent) + temptation * [p betrays],
+    data/pr/viz2_Prisoner's Dilemma.json for 2 players (R=2, T=3, P=1, S=0).
+    noise > 0 adds uniform [0, noise) jitter (betraying stays dominant for
+    noise < temptation).
+    """
+    if any(k != 2 for k in shape):
+        raise ValueError(f"Prisoner's Dilemma takes shape [2] * n_players ({shape} given)")
+    n = len(shape)
+    silent = (np.indices(shape) == 0).astype(float)
+    others = (silent.sum(axis=0)[None] - silent) / max(n - 1, 1)
+    out = benefit * others + temptation * (1.0 - silent)
+    out = np.broadcast_to(out, (batch, n, *shape)).copy()
+    if noise > 0:
+        out += noise * rng.random(out.shape)
+    return out
+
+
+GENERATORS = {
+    'uniform': uniform_payoffs,
+    'covariant': covariant_payoffs,
+    'zero_sum': zero_sum_payoffs,
+    'coordination': coordination_payoffs,
+    'dominance_solvable': dominance_solvable_payoffs,
+    'sparse': sparse_payoffs,
+    'degenerate': degenerate_payoffs,
+    'rps': rps_payoffs,
+    'prisoners_dilemma': prisoners_dilemma_payoffs,
+}
+
+
+def iter_games(kind:str, shape:List[int], n_games:int, seed=None, chunk:int=4096, **params) -> Iterator[NFG_Core]:
+    """
+    Yield n_games generated games, chunk at a time (memory stays at one chunk
+    of payoffs however many games are drawn). params go to the generator.
+    """
+    fn = GENERATORS[kind]
+    shape = [int(k) for k in shape]
+    labels = _labels(tuple(shape))
+    if kind == 'rps' and shape == [3, 3]:
+        labels = [['Rock', 'Paper', 'Scissors']] * 2
+    elif kind == 'prisoners_dilemma':
+        labels = [['silent', 'betray']] * len(shape)
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < n_games:
+        batch = min(chunk, n_games - done)
+        u = fn(rng, shape, batch, **params)
+        for b in range(batch):
+            yield NFG_Core(len(shape), shape, u[b], f"{kind} {done + b}", labels)
+        done += batch
+
+
+def generate(kind:str, shape:List[int], n_games:int=1, seed=None, **params) -> List[NFG_Core]:
+    """List of n_games generated games, see iter_games."""
+    return list(iter_games(kind, shape, n_games, seed=seed, **params))
+
+
+if __name__ == "__main__":
+    import time
+
+    for kind, shape, params in (
+        ('uniform', [2, 2], {}),
+        ('covariant', [3, 3, 3], dict(rho=-0.5)),
+        ('zero_sum', [10, 10], {}),
+        ('coordination', [4, 4], {}),
+        ('dominance_solvable', [3, 3, 3], {}),
+        ('sparse', [5, 5], dict(density=0.2)),
+        ('degenerate', [3, 3], {}),
+        ('rps', [5, 5], dict(noise=0.5)),
+        ('prisoners_dilemma', [2, 2, 2, 2], {}),
+    ):
+        n_games = 10**6 if np.prod(shape) <= 4 else 10**4
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_games(kind, shape, n_games, seed=0, **params))
+        print(f"{kind:>18} {'x'.join(map(str, shape)):>8}: {count} games in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,244 @@
+"""
+Background jobs: expensive solves (all LH equilibria, learning dynamics
+over many starting points, QRE traces, simplicial subdivision) run on a
+worker pool shared by every session, so the page keeps answering widgets
+while they run.
+
+    result = background_result(st.session_state.ln, 'qre', game.game_hash(), 'qre',
+                               lambda job: trace(game, job), key=lam_max, persist=True)
+    if result is None:
+        return      # running (progress bar and Cancel shown), cancelled or failed
+
+A job function gets its Job: it reports job.progress(fraction, message)
+and calls job.check() where stopping is safe, which raises JobCancelled
+once the job is cancelled (threads can't be killed, so cancellation is
+cooperative). Sessions submitting the same (game hash, kind, key) while it
+runs share one Job; it is cancelled when the last of them lets go.
+Results are put into the shared GameCache (and the result store with
+persist=True), so a finished job is a cache hit for every session.
+
+Threads, not processes: job functions are closures over the shared game
+and results land in this process's cache without pickling. CPU-bound
+jobs share the GIL with script runs, which still get it every few
+milliseconds.
+"""
+from __future__ import annotations
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Tuple
+import os
+import threading
+import time
+
+import streamlit as st
+
+from core.game_cache import get_shared_cache
+
+# worker threads of the shared pool
+DEFAULT_WORKERS = int(os.environ.get('GTV_JOB_WORKERS', min(4, os.cpu_count() or 1)))
+# progress refresh of a running job's fragment
+POLL_SECONDS = float(os.environ.get('GTV_JOB_POLL_SECONDS', 0.5))
+# a new job finishing within this long is shown in the same run (no progress bar, no extra rerun)
+WAIT_SECONDS = float(os.environ.get('GTV_JOB_WAIT_SECONDS', 0.25))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, ident:Tuple[str, str, Any], label:str=''):
+        # (game_hash, kind, key) of the result
+        self.ident = ident
+        self.label:str = label
+        self.future:Future = None
+        self.fraction:float = 0.0
+        self.message:str = ''
+        # latest partial result, for previews while running (e.g. the QRE path so far)
+        self.partial = None
+        self.submitted:float = time.time()
+        self.started:float = None
+        self.finished:float = None
+        # sessions waiting for the result
+        self.subscribers:int = 0
+        self._cancel = threading.Event()
+
+    # ---- in the job ----
+    def progress(self, fraction:float, message:str=''):
+        self.fraction = min(max(float(fraction), 0.0), 1.0)
+        self.message = message
+
+    def check(self):
+        """Raise JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.label)
+
+    # ---- outside ----
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            # not started yet: never runs
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def error(self) -> BaseException:
+        """Exception of a finished job (JobCancelled when cancelled), or None."""
+        if self.cancelled:
+            return JobCancelled(self.label)
+        try:
+            return self.future.exception(timeout=0)
+        except CancelledError as e:
+            return e
+
+    def result(self):
+        return self.future.result(timeout=0)
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobPool:
+    """Thread pool running Jobs, one per distinct (game hash, kind, key) at a time."""
+    def __init__(self, max_workers:int=DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='gtv-job')
+        # queued or running jobs by ident
+        self.jobs:Dict[Tuple[str, str, Any], Job] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, game_hash:str, kind:str, fn:Callable[[Job], Any], key:Any=None,
+               persist:bool=False, label:str='') -> Job:
+        """Run fn(job) in the background, or join the same computation already running."""
+        ident = (game_hash, kind, key)
+        with self.lock:
+            job = self.jobs.get(ident)
+            if job is None or job.cancelled:
+                job = Job(ident, label)
+                self.jobs[ident] = job
+                job.future = self.executor.submit(self._run, job, fn, persist)
+            job.subscribers += 1
+        return job
+
+    def release(self, job:Job):
+        """A session stops waiting for job: cancelled when nobody else waits."""
+        with self.lock:
+            job.subscribers -= 1
+            if job.subscribers <= 0 and not job.done():
+                job.cancel()
+                if self.jobs.get(job.ident) is job:
+                    del self.jobs[job.ident]
+
+    def _run(self, job:Job, fn:Callable[[Job], Any], persist:bool):
+        job.started = time.time()
+        try:
+            job.check()
+            value = fn(job)
+            job.check()
+            game_hash, kind, key = job.ident
+            job.progress(1.0, job.message)
+            return get_shared_cache().put(game_hash, kind, value, key=key, persist=persist,
+                                          seconds=time.time() - job.started)
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                if self.jobs.get(job.ident) is job:
+                    del self.jobs[job.ident]
+
+    def stats(self) -> dict:
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return {
+            'workers': self.executor._max_workers,
+            'running': sum(j.started is not None for j in jobs),
+            'queued': sum(j.started is None for j in jobs)
+        }
+
+
+@st.cache_resource
+def get_job_pool() -> JobPool:
+    """The process-wide pool (one per server, shared by every session)."""
+    return JobPool()
+
+
+# ---- pages ----
+def background_result(ns:dict, name:str, game_hash:str, kind:str, fn:Callable[[Job], Any], key:Any=None,
+                      persist:bool=False, label:str='', start:bool=True, restart:bool=False,
+                      preview:Callable[[Any], None]=None):
+    """
+    Result of fn(job) for (game_hash, kind, key), computed in the background.
+    Returns None while it runs (rendering its progress), or if it was cancelled
+    or failed (rendering why). The session's jobs live in ns['jobs'] under name,
+    one per name: other settings release the previous job.
+
+    start: submit when nothing was run yet for these settings
+    restart: submit again after a cancelled or failed run (e.g. its button was pressed)
+    preview: renders job.partial while running
+    """
+    jobs = ns.setdefault('jobs', {})
+    # name -> (ident, message) of the last cancelled or failed run
+    stopped = ns.setdefault('stopped_jobs', {})
+    ident = (game_hash, kind, key)
+    pool = get_job_pool()
+
+    job = jobs.get(name)
+    if job is not None and job.ident != ident:
+        pool.release(job)
+        del jobs[name]
+        job = None
+    if job is None:
+        if name in stopped and stopped[name][0] == ident and not restart:
+            st.info(stopped[name][1])
+            return None
+        if not (start or restart):
+            return None
+        stopped.pop(name, None)
+        job = jobs[name] = pool.submit(game_hash, kind, fn, key=key, persist=persist, label=label)
+        wait([job.future], timeout=WAIT_SECONDS)
+
+    if not job.done():
+        _render_job(ns, name, job, preview)
+        return None
+
+    del jobs[name]
+    error = job.error()
+    if isinstance(error, (JobCancelled, CancelledError)):
+        stopped[name] = (ident, f"{job.label or name}: cancelled.")
+    elif error is not None:
+        stopped[name] = (ident, f"{job.label or name} failed: {error}")
+        st.error(stopped[name][1])
+        return None
+    else:
+        return job.result()
+    st.info(stopped[name][1])
+    return None
+
+
+def _cancel(ns:dict, name:str):
+    job = ns['jobs'].pop(name, None)
+    if job is not None:
+        get_job_pool().release(job)
+        ns['stopped_jobs'][name] = (job.ident, f"{job.label or name}: cancelled.")
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _render_job(ns:dict, name:str, job:Job, preview:Callable[[Any], None]=None):
+    """Progress of a running job, refreshed every POLL_SECONDS; reruns the page once it is over."""
+    if ns['jobs'].get(name) is not job or job.done():
+        # finished, cancelled or replaced: the page shows the outcome
+        st.rerun()
+    if job.started is None:
+        text = f"{job.label}: waiting for a worker..."
+    else:
+        text = f"{job.label}: {job.message} ({job.elapsed():.1f}s)" if job.message else \
+            f"{job.label} ({job.elapsed():.1f}s)"
+    with st.container(horizontal=True, vertical_alignment='center'):
+        st.progress(job.fraction, text=text)
+        st.button('Cancel', key=f"job_cancel_{name}", on_click=_cancel, args=(ns, name))
+    if preview is not None and job.partial is not None:
+        preview(job.partial)
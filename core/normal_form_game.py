@@ -1,10 +1,40 @@
 
-from typing import List
+from typing import Iterator, List, Tuple
 
 import numpy as np
+import hashlib
+import importlib
 import json
+import os
+import struct
+
+from core.profiling import timed
+
+# binary format: magic, uint32 header length, json header, float64 payoffs (little-endian, C order)
+BINARY_MAGIC = b'NFG1'
+
+# largest payoff tensor (entries, all players) compact games build as u_mat
+MAX_DENSE_ENTRIES = int(os.environ.get('GTV_MAX_DENSE_ENTRIES', 2**24))
+
+# "format" of to_dict() / binary headers -> (module, class) of that payoff representation
+FORMATS = {
+    'sparse': ('core.sparse_game', 'SparseNFG'),
+    'polymatrix': ('core.polymatrix', 'PolymatrixGame'),
+    'symmetric': ('core.symmetric', 'SymmetricNFG'),
+}
+
+def _format_class(name:str):
+    if name not in FORMATS:
+        raise ValueError(f"unknown game format {name!r}")
+    module, cls = FORMATS[name]
+    # imported on first use: most games are dense
+    return getattr(importlib.import_module(module), cls)
 
 class NFG_Core:
+    # u_mat holds the payoffs. False: another representation holds them and
+    # builds u_mat on access (see FORMATS); prefer get_payoff_vec / deviation_payoffs
+    dense = True
+
     def __init__(
         self,
         n_players:int,
@@ -29,25 +59,11 @@ class NFG_Core:
         self.labels = strategy_labels
         self.title = game_name
 
+    @timed('nfg.get_util')
     def get_util(self,player,sprofile):
-        # Reorder MixedStrategy by player index
-        mixed_by_player = [None] * self.n_players
-        for ms in sprofile:
-            mixed_by_player[ms.pid] = ms
-
-        # Build dense probability vectors
-        prob_vecs = []
-        for p in range(self.n_players):
-            ms = mixed_by_player[p]
-            vec = np.zeros(self.n_strategies[p], dtype=float)
-            for pure, prob in zip(ms.supports, ms.ratios):
-                vec[pure.sid] = prob
-            total = vec.sum()
-            if total > 0:
-                vec /= total
-            else:
-                return 0.0
-            prob_vecs.append(vec)
+        prob_vecs = self.get_prob_vecs(sprofile)
+        if prob_vecs is None:
+            return 0.0
 
         # Start with this player's payoff tensor: shape (s0, s1, ..., s_{n-1})
         res = self.u_mat[player]
@@ -60,6 +76,111 @@ class NFG_Core:
 
         return float(res)
 
+    def get_prob_vecs(self,sprofile):
+        """Dense, normalized probability vector per player (index = pid).
+        Players missing from sprofile get None.
+        Returns None if any given mix has zero total mass."""
+        prob_vecs = [None] * self.n_players
+        for ms in sprofile:
+            vec = np.zeros(self.n_strategies[ms.pid], dtype=float)
+            for pure, prob in zip(ms.supports, ms.ratios):
+                vec[pure.sid] = prob
+            total = vec.sum()
+            if total > 0:
+                vec /= total
+            else:
+                return None
+            prob_vecs[ms.pid] = vec
+        return prob_vecs
+
+    def get_payoff_vec(self,player,prob_vecs):
+        """Expected payoff of each pure strategy of `player`,
+        given the opponents' probability vectors (prob_vecs[player] is ignored)."""
+        # move player's axis to the front, then contract the others from the back.
+        res = np.moveaxis(self.u_mat[player], player, 0)
+        for p in reversed(range(self.n_players)):
+            if p == player:
+                continue
+            res = np.tensordot(res, prob_vecs[p], axes=([-1], [0]))
+        return res
+
+    @timed('nfg.deviation_payoffs')
+    def deviation_payoffs(self,prob_batch):
+        """Batched get_payoff_vec for every player at once.
+        prob_batch: one array per player, shape (Z, n_strategies[p]), a batch of Z profiles.
+        Returns one array per player, shape (Z, n_strategies[p]):
+        expected payoff of each pure strategy against the others' mixes in that profile."""
+        n = self.n_players
+        Z = prob_batch[0].shape[0]
+        out = []
+        for player in range(n):
+            # player's axis first, opponents contracted from the back
+            oppos = [p for p in range(n) if p != player]
+            res = self.u_mat[player].transpose([player] + oppos)
+            if len(oppos) == 0:
+                out.append(np.broadcast_to(res, (Z,) + res.shape).copy())
+                continue
+            # first contraction introduces the batch axis: (Z, n_player, ...)
+            res = res @ prob_batch[oppos[-1]].T
+            res = res.transpose([res.ndim - 1] + list(range(res.ndim - 1)))
+            # the rest are batched mat-vec products
+            for p in reversed(oppos[:-1]):
+                shape = res.shape[:-1]
+                res = (res.reshape(Z, -1, res.shape[-1]) @ prob_batch[p][:, :, None]).reshape(shape)
+            out.append(res)
+        return out
+
+    def exploitability(self,prob_batch,dev_payoffs=None):
+        """Sum over players of the best deviation gain (NashConv), shape (Z,).
+        0 exactly at Nash equilibria."""
+        if dev_payoffs is None:
+            dev_payoffs = self.deviation_payoffs(prob_batch)
+        total = 0.0
+        for x, u in zip(prob_batch, dev_payoffs):
+            total = total + u.max(axis=1) - np.einsum('zs,zs->z', x, u)
+        return total
+
+    def constant_sum(self, tol:float=1e-9):
+        """The constant c if the payoffs of every profile sum to c, else None."""
+        totals = self.u_mat.sum(axis=0)
+        c = float(totals.flat[0])
+        if np.all(np.abs(totals - c) <= tol * max(1.0, abs(c))):
+            return c
+        return None
+
+    def payoff_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Smallest and largest payoff of every player, shape (n_players,) each."""
+        flat = self.u_mat.reshape(self.n_players, -1)
+        return flat.min(axis=1), flat.max(axis=1)
+
+    def payoff_nbytes(self) -> int:
+        return int(self.u_mat.nbytes)
+
+    def set_read_only(self):
+        self.u_mat.setflags(write=False)
+
+    def can_materialize(self) -> bool:
+        """Whether u_mat is available (compact representations refuse huge tensors)."""
+        return True
+
+    def is_zero_sum(self, tol:float=1e-9) -> bool:
+        c = self.constant_sum(tol)
+        return c is not None and abs(c) <= tol
+
+    def game_hash(self) -> str:
+        """Canonical content hash of to_dict(). Equal games hash equally,
+        whether the payoffs were loaded as ints or floats."""
+        if getattr(self, '_hash', None) is None:
+            h = hashlib.sha256()
+            h.update(json.dumps({
+                "n_players": self.n_players,
+                "n_strategies": list(self.n_strategies),
+                "game_name": self.title,
+                "strategy_labels": self.labels,
+            }, sort_keys=True).encode())
+            h.update(np.ascontiguousarray(self.u_mat, dtype=np.float64).tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
 
     def to_dict(self) -> dict:
         return {
@@ -72,6 +193,8 @@ class NFG_Core:
 
     @classmethod
     def from_dict(cls, data: dict) -> "NFG_Core":
+        if "format" in data and cls is NFG_Core:
+            return _format_class(data["format"]).from_dict(data)
         return cls(
             n_players=data["n_players"],
             n_strategies=data["n_strategies"],
@@ -80,6 +203,55 @@ class NFG_Core:
             strategy_labels=data["strategy_labels"],
         )
 
+    def to_bytes(self) -> bytes:
+        """Binary form: no float formatting or parsing, and games can be concatenated."""
+        header = json.dumps({
+            "n_players": self.n_players,
+            "n_strategies": list(self.n_strategies),
+            "game_name": self.title,
+            "strategy_labels": self.labels,
+        }).encode()
+        u = np.ascontiguousarray(self.u_mat, dtype='<f8')
+        return BINARY_MAGIC + struct.pack('<I', len(header)) + header + u.tobytes()
+
+    @classmethod
+    def read_bytes(cls, data:bytes, offset:int=0) -> Tuple["NFG_Core", int]:
+        """The game stored at offset of data, and the offset just past it.
+        Its payoffs are a read-only view of data."""
+        if bytes(data[offset:offset + 4]) != BINARY_MAGIC:
+            raise ValueError(f"no binary game at offset {offset}")
+        (n_header,) = struct.unpack_from('<I', data, offset + 4)
+        start = offset + 8 + n_header
+        if start > len(data):
+            raise ValueError(f"truncated binary game at offset {offset}")
+        header = json.loads(bytes(data[offset + 8:start]))
+        if "format" in header:
+            return _format_class(header["format"])._from_binary(header, data, start)
+        shape = [header["n_players"]] + list(header["n_strategies"])
+        end = start + 8 * int(np.prod(shape))
+        if end > len(data):
+            raise ValueError(f"truncated binary game at offset {offset}")
+        u = np.frombuffer(data, dtype='<f8', count=(end - start) // 8, offset=start).reshape(shape)
+        return cls(
+            n_players=header["n_players"],
+            n_strategies=list(header["n_strategies"]),
+            utility_mat=u,
+            game_name=header.get("game_name", ""),
+            strategy_labels=header["strategy_labels"],
+        ), end
+
+    @classmethod
+    def from_bytes(cls, data:bytes) -> "NFG_Core":
+        return cls.read_bytes(data)[0]
+
+    @classmethod
+    def iter_bytes(cls, data:bytes) -> Iterator["NFG_Core"]:
+        """Every game of concatenated to_bytes() outputs."""
+        offset = 0
+        while offset < len(data):
+            game, offset = cls.read_bytes(data, offset)
+            yield game
+
     @staticmethod
     def load_from_json(fp) -> "NFG_Core":
         data = json.load(fp)
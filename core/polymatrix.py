@@ -0,0 +1,302 @@
+"""
+Polymatrix (graphical) games: each player plays a two-player game with each
+of its neighbors and gets the sum of those payoffs. Storage is one matrix per
+edge, linear in the number of edges, so games with hundreds of players fit.
+
+    game = PolymatrixGame.from_graph([3] * 60, ring_graph(60, 4), A)   # A on every edge
+    game.deviation_payoffs(batch)          # sum over neighbors of mat-vec products
+    dense_game = game.to_dense()           # only while n_players * prod(n_strategies) is small
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import hashlib
+import json
+import struct
+
+import numpy as np
+
+from core.normal_form_game import BINARY_MAGIC, MAX_DENSE_ENTRIES, NFG_Core
+from core.profiling import timed
+
+
+def ring_graph(n_players:int, degree:int=2) -> List[Tuple[int, int]]:
+    """Undirected edges of a ring where every player is linked to its degree nearest players."""
+    return sorted({tuple(sorted((p, (p + d) % n_players)))
+                   for p in range(n_players) for d in range(1, degree // 2 + 1) if d % n_players != 0})
+
+
+def _pair_weights(mass:np.ndarray):
+    """
+    mass: (Z, n_players) total probability of each player's mix. Returns
+    weight(p, q), the product of the masses of every player but p and q,
+    shape (Z,): the factor of A_pq's term in the multilinear payoff, as the
+    dense tensor contracts it. 1 for normalized mixes; unnormalized ones
+    (the QRE corrector's) need it for u_p(x with q pure t) to be du_p/dx_q(t).
+    """
+    zero = mass == 0
+    safe = np.where(zero, 1.0, mass)
+    total = safe.prod(axis=1)
+    n_zero = zero.sum(axis=1)
+
+    def weight(p:int, q:int) -> np.ndarray:
+        out = total / (safe[:, p] * safe[:, q])
+        out[n_zero - zero[:, p] - zero[:, q] > 0] = 0.0
+        return out
+    return weight
+
+
+class PolymatrixGame(NFG_Core):
+    """
+    NFG_Core with payoffs as a sum of pairwise terms. edges maps (p, q) to the
+    matrix A_pq, shape (n_strategies[p], n_strategies[q]): player p's payoff
+    from its game with neighbor q, so that
+
+        u_p(s) = sum over neighbors q of p of A_pq[s_p, s_q].
+
+    A bimatrix game (A, B) between p (rows) and q (columns) is the two edges
+    (p, q): A and (q, p): B.T. An edge may go one way only: q then affects p's
+    payoff but not the reverse. The neighbors define the game's graph (a
+    graphical game whose local games are pairwise).
+
+    Every expected payoff is a sum of matrix-vector products, e.g. the payoff
+    vector of p is sum_q A_pq @ x_q. get_util, get_payoff_vec,
+    deviation_payoffs (so exploitability and the learning dynamics),
+    constant_sum and payoff_bounds are exact and never build u_mat. u_mat
+    (LH, the simplex solvers, the payoff tables) is materialized on first
+    access, and only up to MAX_DENSE_ENTRIES entries: ValueError beyond.
+    """
+    dense = False
+
+    def __init__(self, n_players:int, n_strategies:List[int], edges:Dict[Tuple[int, int], np.ndarray],
+                 game_name:str='', strategy_labels:List[List[str]]=None):
+        assert (len(n_strategies) == n_players)
+        if strategy_labels is None:
+            strategy_labels = [[f"s{i}" for i in range(n)] for n in n_strategies]
+        assert ([len(per_player_label) for per_player_label in strategy_labels] == n_strategies)
+        self.n_players = n_players
+        self.n_strategies = n_strategies
+        self.labels = strategy_labels
+        self.title = game_name
+
+        # canonical order of the edges, for hashing and serialization
+        self.edges:Dict[Tuple[int, int], np.ndarray] = {}
+        for (p, q) in sorted(edges):
+            p, q = int(p), int(q)
+            if p == q or not (0 <= p < n_players and 0 <= q < n_players):
+                raise ValueError(f"edge ({p}, {q}) is not between two distinct players")
+            A = np.asarray(edges[(p, q)], dtype=float)
+            if A.shape != (n_strategies[p], n_strategies[q]):
+                raise ValueError(f"edge ({p}, {q}) has shape {A.shape}, expected "
+                                 f"{(n_strategies[p], n_strategies[q])}")
+            self.edges[(p, q)] = A
+        # neighbors[p]: players whose strategy enters p's payoff
+        self.neighbors:List[List[int]] = [[] for _ in range(n_players)]
+        for (p, q) in self.edges:
+            self.neighbors[p].append(q)
+        self._dense:np.ndarray = None
+
+    @classmethod
+    def from_graph(cls, n_strategies:List[int], graph, A, B=None,
+                   game_name:str='', strategy_labels:List[List[str]]=None) -> "PolymatrixGame":
+        """The bimatrix game (A, B) on every undirected edge (p, q) of graph, p
+        as the row player. B None: the symmetric game B = A.T (each endpoint
+        gets A[own strategy, neighbor's strategy])."""
+        A = np.asarray(A, dtype=float)
+        B = A.T if B is None else np.asarray(B, dtype=float)
+        edges = {}
+        for p, q in graph:
+            if (p, q) in edges or (q, p) in edges:
+                raise ValueError(f"edge ({p}, {q}) given twice")
+            edges[(p, q)] = A
+            edges[(q, p)] = B.T
+        return cls(len(n_strategies), list(n_strategies), edges, game_name, strategy_labels)
+
+    @property
+    def n_entries(self) -> float:
+        """Entries of the dense tensor, all players (a float: it overflows int64 quickly)."""
+        return self.n_players * float(np.prod(self.n_strategies, dtype=float))
+
+    # ---- dense ----
+    def can_materialize(self) -> bool:
+        return self.n_entries <= MAX_DENSE_ENTRIES
+
+    @property
+    def u_mat(self) -> np.ndarray:
+        if self._dense is None:
+            if not self.can_materialize():
+                raise ValueError(
+                    f"{self.n_players}-player polymatrix game: the payoff tensor would have "
+                    f"{self.n_entries:.3g} entries (limit {MAX_DENSE_ENTRIES}, GTV_MAX_DENSE_ENTRIES)")
+            n = self.n_players
+            u = np.zeros([n] + list(self.n_strategies))
+            for (p, q), A in self.edges.items():
+                # A_pq broadcast along every axis but p's and q's
+                shape = [1] * n
+                shape[p], shape[q] = A.shape
+                u[p] += (A if p < q else A.T).reshape(shape)
+            u.setflags(write=False)
+            self._dense = u
+        return self._dense
+
+    def to_dense(self) -> NFG_Core:
+        return NFG_Core(self.n_players, list(self.n_strategies), np.array(self.u_mat),
+                        self.title, self.labels)
+
+    # ---- utilities ----
+    @timed('nfg.get_util')
+    def get_util(self, player, sprofile):
+        prob_vecs = self.get_prob_vecs(sprofile)
+        if prob_vecs is None:
+            return 0.0
+        return float(prob_vecs[player] @ self.get_payoff_vec(player, prob_vecs))
+
+    def get_payoff_vec(self, player, prob_vecs):
+        # (prob_vecs[player] is ignored, and may be None)
+        mass = np.array([[1.0 if r == player else float(np.sum(prob_vecs[r])) for r in range(self.n_players)]])
+        weight = _pair_weights(mass)
+        out = np.zeros(self.n_strategies[player])
+        for q in self.neighbors[player]:
+            out += weight(player, q)[0] * (self.edges[(player, q)] @ prob_vecs[q])
+        return out
+
+    @timed('nfg.deviation_payoffs')
+    def deviation_payoffs(self, prob_batch):
+        Z = prob_batch[0].shape[0]
+        weight = _pair_weights(np.stack([x.sum(axis=1) for x in prob_batch], axis=1))
+        out = [np.zeros((Z, k)) for k in self.n_strategies]
+        for (p, q), A in self.edges.items():
+            out[p] += weight(p, q)[:, None] * (prob_batch[q] @ A.T)
+        return out
+
+    def _pair_sums(self) -> Dict[Tuple[int, int], np.ndarray]:
+        """Per unordered pair p < q: both players' payoff terms summed, shape (n_p, n_q)."""
+        pairs = {}
+        for (p, q), A in self.edges.items():
+            key, M = ((p, q), A) if p < q else ((q, p), A.T)
+            pairs[key] = pairs[key] + M if key in pairs else M
+        return pairs
+
+    def constant_sum(self, tol:float=1e-9):
+        # the total is a sum of pairwise terms: it is constant iff, with each
+        # term split into mean + row effect + column effect + interaction,
+        # every interaction vanishes and every player's row/column effects cancel
+        c = 0.0
+        main = [np.zeros(k) for k in self.n_strategies]
+        for (p, q), M in self._pair_sums().items():
+            m = M.mean()
+            rows, cols = M.mean(axis=1) - m, M.mean(axis=0) - m
+            if np.any(np.abs(M - m - rows[:, None] - cols[None, :]) > tol * max(1.0, abs(m))):
+                return None
+            c += m
+            main[p] += rows
+            main[q] += cols
+        if all(np.all(np.abs(effect) <= tol * max(1.0, abs(c))) for effect in main):
+            return float(c)
+        return None
+
+    def payoff_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        # neighbors choose independently: the extremes of each term add up
+        lo, hi = np.zeros(self.n_players), np.zeros(self.n_players)
+        for p in range(self.n_players):
+            row_lo, row_hi = np.zeros(self.n_strategies[p]), np.zeros(self.n_strategies[p])
+            for q in self.neighbors[p]:
+                A = self.edges[(p, q)]
+                row_lo += A.min(axis=1)
+                row_hi += A.max(axis=1)
+            lo[p], hi[p] = row_lo.min(), row_hi.max()
+        return lo, hi
+
+    def payoff_nbytes(self) -> int:
+        return int(sum(A.nbytes for A in self.edges.values()))
+
+    def set_read_only(self):
+        for A in self.edges.values():
+            A.setflags(write=False)
+
+    # ---- serialization ----
+    def _header(self) -> dict:
+        return {
+            "format": "polymatrix",
+            "n_players": self.n_players,
+            "n_strategies": list(self.n_strategies),
+            "game_name": self.title,
+            "strategy_labels": self.labels,
+        }
+
+    def game_hash(self) -> str:
+        if getattr(self, '_hash', None) is None:
+            h = hashlib.sha256()
+            h.update(json.dumps({**self._header(), "edges": [list(e) for e in self.edges]},
+                                sort_keys=True).encode())
+            for A in self.edges.values():
+                h.update(np.ascontiguousarray(A, dtype=np.float64).tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return {**self._header(), "edges": [[p, q, A.tolist()] for (p, q), A in self.edges.items()]}
+
+    @classmethod
+    def from_dict(cls, data:dict) -> "PolymatrixGame":
+        return cls(
+            n_players=data["n_players"],
+            n_strategies=data["n_strategies"],
+            edges={(p, q): np.array(A, dtype=float) for p, q, A in data["edges"]},
+            game_name=data.get("game_name", ""),
+            strategy_labels=data.get("strategy_labels"),
+        )
+
+    def to_bytes(self) -> bytes:
+        """NFG_Core binary format with a polymatrix header: the edge matrices, in header order."""
+        header = json.dumps({**self._header(), "edges": [list(e) for e in self.edges]}).encode()
+        return (BINARY_MAGIC + struct.pack('<I', len(header)) + header
+                + b''.join(np.ascontiguousarray(A, dtype='<f8').tobytes() for A in self.edges.values()))
+
+    @classmethod
+    def _from_binary(cls, header:dict, data:bytes, start:int) -> Tuple["PolymatrixGame", int]:
+        n_strategies = list(header["n_strategies"])
+        edges = {}
+        end = start
+        for p, q in header["edges"]:
+            shape = (n_strategies[p], n_strategies[q])
+            if end + 8 * shape[0] * shape[1] > len(data):
+                raise ValueError(f"truncated binary game at offset {start}")
+            edges[(p, q)] = np.frombuffer(data, dtype='<f8', count=shape[0] * shape[1], offset=end).reshape(shape)
+            end += 8 * shape[0] * shape[1]
+        return cls(header["n_players"], n_strategies, edges,
+                   header.get("game_name", ""), header["strategy_labels"]), end
+
+
+def random_polymatrix(n_players:int, n_strategies:int=3, degree:int=4, seed=None) -> PolymatrixGame:
+    """Uniform [0, 1) bimatrix games on the edges of ring_graph(n_players, degree)."""
+    rng = np.random.default_rng(seed)
+    edges = {}
+    for p, q in ring_graph(n_players, degree):
+        edges[(p, q)] = rng.random((n_strategies, n_strategies))
+        edges[(q, p)] = rng.random((n_strategies, n_strategies))
+    return PolymatrixGame(n_players, [n_strategies] * n_players, edges,
+                          f"polymatrix {n_players}x{n_strategies} (degree {degree})")
+
+
+if __name__ == "__main__":
+    import time
+
+    # dense and polymatrix agree where both fit
+    game = random_polymatrix(5, 3, degree=2, seed=0)
+    dense = game.to_dense()
+    rng = np.random.default_rng(0)
+    batch = [rng.dirichlet(np.ones(3), 64) for _ in range(5)]
+    assert all(np.allclose(a, b) for a, b in zip(game.deviation_payoffs(batch), dense.deviation_payoffs(batch)))
+    # unnormalized mixes too, some of them zero
+    batch = [x * rng.integers(0, 3, (64, 1)) for x in batch]
+    assert all(np.allclose(a, b) for a, b in zip(game.deviation_payoffs(batch), dense.deviation_payoffs(batch)))
+    assert all(np.allclose(a, b) for a, b in zip(game.payoff_bounds(), dense.payoff_bounds()))
+    assert NFG_Core.from_bytes(game.to_bytes()).game_hash() == game.game_hash()
+
+    game = random_polymatrix(100, 3, degree=6, seed=0)
+    batch = [rng.dirichlet(np.ones(3), 1024) for _ in range(100)]
+    start = time.perf_counter()
+    game.deviation_payoffs(batch)
+    print(f"{game.title}: {len(game.edges)} edges, {game.payoff_nbytes()} payoff bytes "
+          f"(dense: {8 * game.n_entries:.3g}), deviation_payoffs of 1024 profiles "
+          f"in {time.perf_counter() - start:.4f}s")
@@ -0,0 +1,161 @@
+"""
+Lightweight timers and counters, to see where a rerun's time goes
+(solver pivots, utilities, viz edits, figure building, each render_*).
+
+    with timer('lh.pivot'): ...
+    @timed('su.render_plot')
+    def render_plot(): ...
+    count('figure.hit')
+
+Recording happens only between begin_rerun() and end_rerun() on the same
+thread (Streamlit runs a session's script in its own thread; app.py opens
+a record per rerun when the sidebar toggle is on). Otherwise timer returns
+a shared no-op context manager, and count / timed wrappers return after
+checking one module global (while no session is profiling) or one
+thread-local attribute.
+Timings are inclusive: a timer around code holding other timers counts
+their time too.
+"""
+from __future__ import annotations
+from contextlib import nullcontext
+from functools import wraps
+from typing import Dict, List
+import json
+import os
+import threading
+import time
+
+# initial state of the sidebar toggle
+ENABLED_BY_DEFAULT = os.environ.get('GTV_PROFILE', '') not in ('', '0')
+
+
+class _Local(threading.local):
+    # open record of the thread
+    profile = None
+
+
+_local = _Local()
+_NULL = nullcontext()
+# records open in any thread: when 0, no thread-local lookup at all
+_open = 0
+_open_lock = threading.Lock()
+
+
+class RerunProfile:
+    """Timers (calls, total and max seconds) and counters of one rerun."""
+    def __init__(self, label:str=''):
+        self.label:str = label
+        self.started:float = time.time()
+        self.seconds:float = None
+        self._start = time.perf_counter()
+        # name -> [calls, total seconds, max seconds]
+        self.timers:Dict[str, List[float]] = {}
+        self.counters:Dict[str, int] = {}
+
+    def add_time(self, name:str, seconds:float):
+        rec = self.timers.get(name)
+        if rec is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            rec[0] += 1
+            rec[1] += seconds
+            if seconds > rec[2]:
+                rec[2] = seconds
+
+    def close(self):
+        self.seconds = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            'label': self.label,
+            'started': self.started,
+            'seconds': self.seconds,
+            'timers': {
+                name: {'calls': int(calls), 'total': total, 'max': longest}
+                for name, (calls, total, longest) in sorted(self.timers.items(), key=lambda kv: -kv[1][1])
+            },
+            'counters': dict(sorted(self.counters.items()))
+        }
+
+
+class _Timer:
+    __slots__ = ('profile', 'name', 'start')
+
+    def __init__(self, profile:RerunProfile, name:str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def current() -> RerunProfile:
+    """The open record of this thread, or None."""
+    return _local.profile
+
+
+def timer(name:str):
+    if not _open:
+        return _NULL
+    profile = _local.profile
+    if profile is None:
+        return _NULL
+    return _Timer(profile, name)
+
+
+def count(name:str, n:int=1):
+    if not _open:
+        return
+    profile = _local.profile
+    if profile is not None:
+        profile.counters[name] = profile.counters.get(name, 0) + n
+
+
+def timed(name:str):
+    """Decorator: time every call of the function under name."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _open:
+                return fn(*args, **kwargs)
+            profile = _local.profile
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def begin_rerun(label:str='') -> RerunProfile:
+    global _open
+    with _open_lock:
+        if _local.profile is None:
+            _open += 1
+        _local.profile = RerunProfile(label)
+    return _local.profile
+
+
+def end_rerun() -> RerunProfile:
+    """Close this thread's record (None if none is open)."""
+    global _open
+    profile = _local.profile
+    if profile is None:
+        return None
+    with _open_lock:
+        _local.profile = None
+        _open -= 1
+    profile.close()
+    return profile
+
+
+def to_json(profiles:List[RerunProfile]) -> str:
+    return json.dumps([p.to_dict() for p in profiles], indent=1)
@@ -0,0 +1,308 @@
+"""
+Persistent store of solver results (equilibria, LH traces, QRE paths, ...)
+shared by every process: a local SQLite file keyed by (game hash, kind,
+solver configuration), the same keys as GameCache, which consults it on
+misses for the kinds the pages persist.
+
+    python -m core.result_store warm [paths]     # solve the data/ library ahead of time
+    python -m core.result_store stats
+    python -m core.result_store clear [--kind lh_trace]
+
+Values are pickled (zlib) objects, timed when computed. Writes are
+buffered and inserted in batches, in WAL mode, so readers in other
+processes never wait for them. Pickles are tied to the code that wrote
+them: rows carry their kind's version (KIND_VERSIONS, bumped when a
+solver's results change form) and rows at another version, or that no
+longer load, are misses, recomputed and replaced.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import atexit
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import warnings
+import zlib
+
+# '' disables the store
+DEFAULT_PATH = os.environ.get(
+    'GTV_RESULT_DB', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'results.sqlite3'))
+# bumped when the schema changes: older files are rebuilt
+SCHEMA_VERSION = 2
+# bumped when a kind's stored values change form; kinds not listed are at 1
+KIND_VERSIONS:Dict[str, int] = {
+    # starting labels by index instead of by name
+    'lh_trace': 2,
+    'lh_equilibria': 2,
+    'symmetric_lh': 2,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    game_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    config TEXT NOT NULL,
+    value BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    seconds REAL,
+    created REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (game_hash, kind, config)
+) WITHOUT ROWID
+"""
+
+
+def config_key(key:Any) -> str:
+    """Canonical text of a solver configuration (GameCache key: option, float, tuple of items...)."""
+    return json.dumps(key, sort_keys=True, default=str)
+
+
+class ResultStore:
+    def __init__(self, path:str=DEFAULT_PATH, batch_size:int=32, flush_seconds:float=2.0):
+        self.path:str = path
+        self.batch_size:int = batch_size
+        self.flush_seconds:float = flush_seconds
+        # not yet inserted (always at the current versions):
+        # (game_hash, kind, config) -> (blob, seconds, created); and hit counts
+        self.pending:Dict[Tuple[str, str, str], Tuple[bytes, float, float]] = {}
+        self.pending_hits:Dict[Tuple[str, str, str], int] = {}
+        self.lock = threading.RLock()
+        self._timer:threading.Timer = None
+        # sqlite connections can't cross threads: one per thread
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            with conn:
+                conn.execute('DROP TABLE IF EXISTS results')
+                conn.execute(_SCHEMA)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        atexit.register(self.flush)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL: durable at checkpoints, no fsync per commit
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ---- entries ----
+    def get(self, game_hash:str, kind:str, key:Any=None, default=None):
+        row_key = (game_hash, kind, config_key(key))
+        with self.lock:
+            entry = self.pending.get(row_key)
+        if entry is not None:
+            blob = entry[0]
+        else:
+            row = self._conn().execute(
+                'SELECT value, version FROM results WHERE game_hash=? AND kind=? AND config=?', row_key).fetchone()
+            if row is None or row[1] != KIND_VERSIONS.get(kind, 1):
+                # a stale version is replaced by the next put
+                return default
+            blob = row[0]
+        try:
+            value = pickle.loads(zlib.decompress(blob))
+        except Exception:
+            # written by other code (renamed class, ...): recompute
+            self.delete(game_hash, kind, key)
+            return default
+        with self.lock:
+            self.pending_hits[row_key] = self.pending_hits.get(row_key, 0) + 1
+        return value
+
+    def has(self, game_hash:str, kind:str, key:Any=None) -> bool:
+        row_key = (game_hash, kind, config_key(key))
+        with self.lock:
+            if row_key in self.pending:
+                return True
+        return self._conn().execute(
+            'SELECT 1 FROM results WHERE game_hash=? AND kind=? AND config=? AND version=?',
+            (*row_key, KIND_VERSIONS.get(kind, 1))).fetchone() is not None
+
+    def put(self, game_hash:str, kind:str, value, key:Any=None, seconds:float=None):
+        """Buffer value for insertion (flushed once batch_size entries wait, or after flush_seconds)."""
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        with self.lock:
+            self.pending[(game_hash, kind, config_key(key))] = (blob, seconds, time.time())
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return value
+
+    def flush(self):
+        """Insert the buffered entries (and hit counts) in one transaction."""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows = [(*k, blob, KIND_VERSIONS.get(k[1], 1), seconds, created)
+                    for k, (blob, seconds, created) in self.pending.items()]
+            hits = [(n, *k) for k, n in self.pending_hits.items()]
+            self.pending.clear()
+            self.pending_hits.clear()
+            if len(rows) == 0 and len(hits) == 0:
+                return
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO results (game_hash, kind, config, value, version, seconds, created) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                conn.executemany(
+                    'UPDATE results SET hits = hits + ? WHERE game_hash=? AND kind=? AND config=?', hits)
+
+    def delete(self, game_hash:str=None, kind:str=None, key:Any=None):
+        """Drop one entry, or every entry of a game / kind (None matches all)."""
+        self.flush()
+        where, args = [], []
+        for column, v in (('game_hash', game_hash), ('kind', kind)):
+            if v is not None:
+                where.append(f'{column}=?')
+                args.append(v)
+        if key is not None:
+            where.append('config=?')
+            args.append(config_key(key))
+        conn = self._conn()
+        with conn:
+            n = conn.execute('DELETE FROM results' + (' WHERE ' + ' AND '.join(where) if where else ''),
+                             args).rowcount
+        return n
+
+    def stats(self) -> List[dict]:
+        """Per kind: entries, stored bytes, total hits and solve seconds."""
+        self.flush()
+        rows = self._conn().execute(
+            'SELECT kind, COUNT(*), SUM(LENGTH(value)), SUM(hits), SUM(seconds) FROM results GROUP BY kind'
+        ).fetchall()
+        return [
+            {'kind': kind, 'entries': n, 'nbytes': nbytes or 0, 'hits': hits or 0, 'seconds': seconds or 0.0}
+            for kind, n, nbytes, hits, seconds in rows
+        ]
+
+
+_store: ResultStore | None = None
+_store_lock = threading.Lock()
+
+def get_result_store() -> ResultStore | None:
+    """The process-wide store at DEFAULT_PATH (None when disabled or unusable)."""
+    global _store
+    with _store_lock:
+        if _store is None and DEFAULT_PATH:
+            try:
+                _store = ResultStore(DEFAULT_PATH)
+            except (OSError, sqlite3.Error) as e:
+                # read-only checkout etc.: run without persistence
+                warnings.warn(f"result store disabled ({DEFAULT_PATH}): {e}")
+                return None
+    return _store
+
+
+# ---- warm-up ----
+def _json_files(paths:List[str]) -> List[str]:
+    out = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                out += [os.path.join(root, f) for f in sorted(files) if f.endswith('.json')]
+        else:
+            out.append(path)
+    return out
+
+
+def warm(paths:List[str], lam_max:float=1e6, precision:float=1e-8) -> List[dict]:
+    """
+    Solve every game under paths into the store, under the kinds and keys
+    the pages use (their default settings). Games already stored are skipped.
+    """
+    import numpy as np
+    from core.game_cache import get_shared_cache
+    from lemke_howson.solver import LH_solver, lh_equilibria
+    from solvers.correlated import CESolver
+    from solvers.qre import LogitQRE
+    from solvers.simpdiv import SimplicialSubdivision
+    from solvers.zero_sum import ZeroSumSolver
+
+    def qre_result(game):
+        # as render_qre stores it
+        model = LogitQRE(game, lam_max=lam_max)
+        lambdas, path = [], []
+        for lam, mix in model.trace():
+            lambdas.append(lam)
+            path.append(np.concatenate(mix))
+        return dict(lambdas=np.array(lambdas), path=np.stack(path), state=model.get_state())
+
+    cache = get_shared_cache()
+    report = []
+    for path in _json_files(paths):
+        try:
+            _, game = cache.load_json_file(path)
+        except (ValueError, KeyError, AssertionError) as e:
+            print(f"skipped {path}: {e}")
+            continue
+        jobs = []
+        if game.n_players == 2:
+            jobs += [('lh_trace', label, lambda i=label: LH_solver(game=game).run_trace(i, max_steps=31))
+                     for label in range(sum(game.n_strategies))]
+            jobs.append(('lh_equilibria', None, lambda: lh_equilibria(game)))
+            if game.constant_sum() is not None:
+                jobs.append(('zero_sum', None, lambda: ZeroSumSolver(game).solve()))
+        jobs.append(('ce_welfare', None, lambda: CESolver(game).solve()))
+        jobs.append(('qre', float(lam_max), lambda: qre_result(game)))
+        jobs.append(('simpdiv', float(precision),
+                     lambda: SimplicialSubdivision(game, precision=precision).solve().get_state()))
+
+        start = time.perf_counter()
+        solved, failed = 0, []
+        for kind, key, compute in jobs:
+            if cache.store.has(game.game_hash(), kind, key):
+                continue
+            try:
+                cache.get_or_compute(game.game_hash(), kind, compute, key=key, persist=True)
+                solved += 1
+            except (ValueError, np.linalg.LinAlgError) as e:
+                # e.g. LH on payoffs that aren't positive: the page hits the same error
+                failed.append(f"{kind}[{key}]: {e}")
+        report.append(dict(path=path, game=game.title, solved=solved, failed=failed,
+                           stored=len(jobs) - solved - len(failed), seconds=time.perf_counter() - start))
+        print(f"{path}: {solved} solved, {report[-1]['stored']} already stored, {len(failed)} failed "
+              f"({report[-1]['seconds']:.2f}s)")
+        for line in failed:
+            print(f"    {line}")
+    cache.store.flush()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Persistent store of solver results.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_warm = sub.add_parser('warm', help='solve games (default: the data/ library) into the store')
+    p_warm.add_argument('paths', nargs='*', default=['data'])
+    sub.add_parser('stats', help='entries, size and hits per kind')
+    p_clear = sub.add_parser('clear', help='delete entries')
+    p_clear.add_argument('--kind', default=None)
+    p_clear.add_argument('--game', default=None, help='game hash')
+    args = parser.parse_args()
+
+    store = get_result_store()
+    if store is None:
+        raise SystemExit("the result store is disabled (GTV_RESULT_DB='')")
+    if args.command == 'warm':
+        warm(args.paths)
+    elif args.command == 'stats':
+        print(f"{store.path} ({os.path.getsize(store.path) / 2**10:.0f} KiB)")
+        for rec in store.stats():
+            print(f"{rec['kind']:>14}: {rec['entries']:>5} entries {rec['nbytes'] / 2**10:9.1f} KiB "
+                  f"{rec['hits']:>7} hits, {rec['seconds']:.2f}s of solving stored")
+    else:
+        print(f"deleted {store.delete(game_hash=args.game, kind=args.kind)} entries")
@@ -0,0 +1,266 @@
+from __future__ import annotations
+from typing import Callable, Dict
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from core.game_cache import estimate_nbytes
+from core.normal_form_game import NFG_Core
+
+# global budget for per-session state of this process, overridable by env vars
+DEFAULT_BUDGET_BYTES = int(os.environ.get('GTV_SESSION_BUDGET_BYTES', 512 * 2**20))
+# sessions idle for longer than this are spilled to disk regardless of the budget
+DEFAULT_IDLE_SECONDS = float(os.environ.get('GTV_SESSION_IDLE_SECONDS', 15 * 60))
+# sessions are never spilled under budget pressure before being idle this long
+MIN_IDLE_SECONDS = float(os.environ.get('GTV_SESSION_MIN_IDLE_SECONDS', 60))
+SPILL_DIR = os.environ.get('GTV_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'gtv_spill'))
+
+
+def dump_compact(data:dict, path:str):
+    """Compact on-disk form of a to_dict(): gzipped json without whitespace."""
+    with gzip.open(path, 'wt', compresslevel=6) as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def load_compact(path:str) -> dict:
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+def remove_files(paths):
+    for path in list(paths):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _state_nbytes(value) -> int:
+    # games are shared across sessions (see GameCache), don't charge them to one session
+    if isinstance(value, NFG_Core):
+        return 0
+    if hasattr(value, 'game') and hasattr(value, 'to_dict'):
+        total = 0
+        for attr in vars(value).values():
+            if isinstance(attr, NFG_Core):
+                continue
+            # caches holding the game report their own size
+            total += attr.nbytes() if callable(getattr(attr, 'nbytes', None)) else estimate_nbytes(attr)
+        return total
+    return estimate_nbytes(value)
+
+
+class SessionNamespace(dict):
+    """
+    One page's session state (e.g. st.session_state.su) that can be spilled to disk.
+
+    Spilled entries are written in compact form and transparently restored
+    on the next access (ns['viz'], 'viz' in ns, ns.get('viz')), so fragment
+    reruns never see a missing viz. Reads and writes count as activity of the
+    session (last_access), fragment reruns included.
+    restorers: key -> function rebuilding the value from its to_dict()
+    """
+    def __init__(self, name:str, restorers:Dict[str, Callable[[dict], object]]=None):
+        super().__init__()
+        self.name:str = name
+        self.restorers = restorers or {}
+        # key -> spill file path
+        self.spilled:Dict[str, str] = {}
+        self.last_access:float = time.time()
+        self.lock = threading.RLock()
+        weakref.finalize(self, remove_files, self.spilled.values())
+
+    def __getitem__(self, key):
+        self.last_access = time.time()
+        with self.lock:
+            if key in self.spilled:
+                self._restore(key)
+            return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self.last_access = time.time()
+        super().__setitem__(key, value)
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.spilled
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        self.last_access = time.time()
+        with self.lock:
+            if key in self.spilled:
+                self._restore(key)
+            return super().pop(key, *default)
+
+    def _restore(self, key):
+        path = self.spilled.pop(key)
+        super().__setitem__(key, self.restorers[key](load_compact(path)))
+        remove_files([path])
+
+    def nbytes(self) -> int:
+        return sum(_state_nbytes(v) for v in list(self.values()))
+
+    def spill(self, spill_dir:str) -> int:
+        """Move restorable entries to disk and drop rebuildable caches. Returns freed bytes (estimate)."""
+        freed = 0
+        with self.lock:
+            for key in list(self.restorers.keys()):
+                if not super().__contains__(key):
+                    continue
+                value = super().__getitem__(key)
+                freed += _state_nbytes(value)
+                path = os.path.join(spill_dir, f"{self.name}_{id(self):x}_{key}.json.gz")
+                dump_compact(value.to_dict(), path)
+                super().__delitem__(key)
+                self.spilled[key] = path
+            # rendered figures are only a cache
+            if super().__contains__('figs'):
+                freed += _state_nbytes(super().__getitem__('figs'))
+                super().__setitem__('figs', {})
+        return freed
+
+    def spill_inactive(self, spill_dir:str) -> int:
+        """Spill the parts of the state not currently shown (e.g. other players' perspectives)."""
+        freed = 0
+        with self.lock:
+            for value in list(super().values()):
+                if hasattr(value, 'spill_inactive'):
+                    before = _state_nbytes(value)
+                    value.spill_inactive(spill_dir)
+                    freed += before - _state_nbytes(value)
+        return freed
+
+
+class _SessionRecord:
+    def __init__(self):
+        self.namespaces = weakref.WeakValueDictionary()  # name -> SessionNamespace
+        self.nbytes:Dict[str, int] = {}
+        self.created:float = time.time()
+
+    @property
+    def last_seen(self) -> float:
+        # latest access to any of the session's namespaces, full runs and fragment reruns alike
+        return max((ns.last_access for ns in list(self.namespaces.values())), default=self.created)
+
+
+class SessionStore:
+    """
+    Memory accounting and spilling of per-session state, for the whole process.
+
+    Every page run checks its namespace in. Sessions idle for idle_seconds are
+    spilled to disk; when the total estimate exceeds budget_bytes, inactive
+    players' data and then least-recently-seen sessions are spilled as well.
+    Closed sessions drop out automatically (namespaces are weakly referenced).
+    """
+    def __init__(self, budget_bytes:int=DEFAULT_BUDGET_BYTES,
+                 idle_seconds:float=DEFAULT_IDLE_SECONDS, spill_dir:str=SPILL_DIR,
+                 min_idle_seconds:float=MIN_IDLE_SECONDS):
+        self.budget_bytes:int = budget_bytes
+        self.idle_seconds:float = idle_seconds
+        self.min_idle_seconds:float = min_idle_seconds
+        self.spill_dir:str = spill_dir
+        os.makedirs(spill_dir, exist_ok=True)
+        self.sessions:Dict[str, _SessionRecord] = {}
+        self.lock = threading.RLock()
+
+    def checkin(self, session_id:str, ns:SessionNamespace):
+        """Called at the start of a page run: account the namespace and enforce the budget."""
+        with self.lock:
+            record = self.sessions.setdefault(session_id, _SessionRecord())
+            record.namespaces[ns.name] = ns
+            ns.last_access = time.time()
+        nbytes = ns.nbytes()
+        with self.lock:
+            record.nbytes[ns.name] = nbytes
+        self.enforce(current=session_id)
+
+    def total_nbytes(self) -> int:
+        with self.lock:
+            return sum(sum(r.nbytes.values()) for r in self.sessions.values())
+
+    def enforce(self, current:str=None):
+        now = time.time()
+        with self.lock:
+            # forget sessions whose state was released by streamlit
+            for sid in [sid for sid, r in self.sessions.items() if len(r.namespaces) == 0]:
+                del self.sessions[sid]
+            # least recently seen first
+            others = sorted(
+                [(sid, r) for sid, r in self.sessions.items() if sid != current],
+                key=lambda item: item[1].last_seen
+            )
+
+        # 1. idle sessions always go to disk
+        for sid, record in others:
+            if now - record.last_seen > self.idle_seconds:
+                self._spill(record, inactive_only=False)
+
+        # 2. over budget: inactive players first, then whole sessions, oldest first
+        for inactive_only in (True, False):
+            for sid, record in others:
+                if self.total_nbytes() <= self.budget_bytes:
+                    return
+                if now - record.last_seen > self.min_idle_seconds:
+                    self._spill(record, inactive_only)
+
+        # 3. still over: only the current session's hidden parts are left
+        if current in self.sessions and self.total_nbytes() > self.budget_bytes:
+            self._spill(self.sessions[current], inactive_only=True)
+
+    def _spill(self, record:_SessionRecord, inactive_only:bool):
+        for name, ns in list(record.namespaces.items()):
+            if inactive_only:
+                ns.spill_inactive(self.spill_dir)
+            else:
+                ns.spill(self.spill_dir)
+            with self.lock:
+                record.nbytes[name] = ns.nbytes()
+
+    def report(self) -> list:
+        """Per-session memory use (bytes, estimated) and what is on disk."""
+        now = time.time()
+        with self.lock:
+            return [
+                {
+                    'session': sid,
+                    'nbytes': dict(r.nbytes),
+                    'total': sum(r.nbytes.values()),
+                    'spilled': {name: sorted(ns.spilled.keys()) for name, ns in r.namespaces.items()},
+                    'idle_seconds': round(now - r.last_seen, 1),
+                }
+                for sid, r in self.sessions.items()
+            ]
+
+
+_store: SessionStore | None = None
+_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+    return _store
+
+
+def session_namespace(name:str, restorers:Dict[str, Callable[[dict], object]]=None) -> SessionNamespace:
+    """
+    st.session_state.<name> as a SessionNamespace, checked in with the store.
+    Call at the start of every page run.
+    """
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ns = getattr(st.session_state, name, None)
+    if not isinstance(ns, SessionNamespace):
+        old = ns or {}
+        ns = SessionNamespace(name, restorers)
+        ns.update(old)
+        setattr(st.session_state, name, ns)
+    ctx = get_script_run_ctx()
+    get_session_store().checkin(ctx.session_id if ctx is not None else 'local', ns)
+    return ns
@@ -0,0 +1,160 @@
+"""
+Payoff tensors in shared memory for process-pool workers. The parent
+publishes a game once and hands workers a small picklable handle, instead
+of pickling u_mat into every task (or every worker's initializer).
+
+    with share_game(game) as handle:            # parent, around the pool's work
+        pool.submit(task, handle, ...)
+    game = attach(handle)                       # worker: u_mat is a read-only view, no copy
+
+Compact games (polymatrix, symmetric, sparse: not game.dense) are published
+in their own binary form (to_bytes()), never as u_mat, which they may refuse
+to build; attach() reads them back through the FORMATS dispatch of
+NFG_Core.read_bytes, their arrays read-only views of the segment as well.
+
+Segments belong to the publishing process and are refcounted per game
+hash. The segment is unlinked when the last lease ends, whether the job
+finished, raised, or lost a worker (BrokenProcessPool). Segments still
+leased at exit are unlinked then. If the parent is killed, the
+multiprocessing resource tracker unlinks them. Workers only map segments.
+attach() keeps the last few mapped, so tasks on the same game don't remap
+it.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Tuple
+import secrets
+import threading
+import weakref
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+# segments a worker keeps mapped
+ATTACHED_MAX = 8
+
+
+class SharedGameHandle:
+    """Everything but the payoffs, plus where to find them. Pickles to a few hundred bytes."""
+    def __init__(self, name:str, game:NFG_Core, nbytes:int):
+        self.name:str = name
+        # dense games: the segment is u_mat; compact ones: it is game.to_bytes()
+        self.dense:bool = game.dense
+        self.dtype:str = game.u_mat.dtype.str if game.dense else None
+        self.shape:Tuple[int, ...] = game.u_mat.shape if game.dense else None
+        self.n_players:int = game.n_players
+        self.n_strategies:List[int] = list(game.n_strategies)
+        self.title:str = game.title
+        self.labels:List[List[str]] = game.labels
+        self.game_hash:str = game.game_hash()
+        self.nbytes:int = nbytes
+
+
+def _unlink_all(segments:Dict[str, list]):
+    for shm, _, _ in segments.values():
+        try:
+            shm.close()
+            shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+    segments.clear()
+
+
+class SharedGames:
+    """Segments published by this process, one per game hash, refcounted by leases."""
+    def __init__(self):
+        # game hash -> [SharedMemory, handle, leases]
+        self.segments:Dict[str, list] = {}
+        self.lock = threading.Lock()
+        # unlinks whatever is left when the registry goes away, at exit at the latest
+        weakref.finalize(self, _unlink_all, self.segments)
+
+    def acquire(self, game:NFG_Core) -> SharedGameHandle:
+        key = game.game_hash()
+        with self.lock:
+            entry = self.segments.get(key)
+            if entry is None:
+                # dense payoffs are copied straight in, without a bytes copy in between
+                payload = game.u_mat if game.dense else np.frombuffer(game.to_bytes(), dtype=np.uint8)
+                shm = shared_memory.SharedMemory(
+                    name=f"gtv_{key[:12]}_{secrets.token_hex(4)}", create=True, size=max(payload.nbytes, 1))
+                np.ndarray(payload.shape, dtype=payload.dtype, buffer=shm.buf)[...] = payload
+                entry = self.segments[key] = [shm, SharedGameHandle(shm.name, game, payload.nbytes), 0]
+            entry[2] += 1
+            return entry[1]
+
+    def release(self, handle:SharedGameHandle):
+        with self.lock:
+            entry = self.segments.get(handle.game_hash)
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] <= 0:
+                del self.segments[handle.game_hash]
+                _unlink_all({handle.game_hash: entry})
+
+    @contextmanager
+    def lease(self, game:NFG_Core) -> Iterator[SharedGameHandle]:
+        handle = self.acquire(game)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def nbytes(self) -> int:
+        with self.lock:
+            return sum(entry[1].nbytes for entry in self.segments.values())
+
+    def close(self):
+        with self.lock:
+            _unlink_all(self.segments)
+
+
+_published = SharedGames()
+
+def share_game(game:NFG_Core):
+    """Context manager: a handle of game's payoffs in shared memory, released on exit."""
+    return _published.lease(game)
+
+
+# ---- workers ----
+# segment name -> (SharedMemory, game), most recently used last
+_attached:"OrderedDict[str, Tuple[shared_memory.SharedMemory, NFG_Core]]" = OrderedDict()
+
+def _open(name:str) -> shared_memory.SharedMemory:
+    try:
+        # the publisher owns it: don't let this process's exit unlink it
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before 3.13 attaching registers with the resource tracker too; pool
+        # workers share their parent's tracker, where the name is already registered
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(handle:SharedGameHandle) -> NFG_Core:
+    """The shared game of handle, its u_mat (or compact arrays) a read-only view of the segment."""
+    entry = _attached.get(handle.name)
+    if entry is not None:
+        _attached.move_to_end(handle.name)
+        return entry[1]
+    shm = _open(handle.name)
+    if handle.dense:
+        u = np.ndarray(handle.shape, dtype=handle.dtype, buffer=shm.buf)
+        u.flags.writeable = False
+        game = NFG_Core(handle.n_players, list(handle.n_strategies), u, handle.title, handle.labels)
+    else:
+        # the segment may be longer than the game (page rounding): read_bytes stops at its end
+        game = NFG_Core.from_bytes(shm.buf.toreadonly())
+    game._hash = handle.game_hash
+    _attached[handle.name] = (shm, game)
+    while len(_attached) > ATTACHED_MAX:
+        _, (old, _) = _attached.popitem(last=False)
+        try:
+            old.close()
+        except BufferError:
+            # a caller still holds a view: unmapped when that is collected
+            pass
+    return game
@@ -0,0 +1,245 @@
+"""
+Sparse payoffs: games whose payoffs are mostly a per-player default value
+(security games, network games) stored as the few profiles that differ.
+
+    game = SparseNFG.from_dense(dense_game)          # default: each player's most common payoff
+    game.deviation_payoffs(batch)                    # O(Z * nnz), never touches the dense tensor
+    dense_game = game.to_dense()
+"""
+from __future__ import annotations
+from typing import List, Tuple
+import hashlib
+import json
+import struct
+
+import numpy as np
+
+from core.normal_form_game import BINARY_MAGIC, NFG_Core
+from core.profiling import timed
+
+# (Z profiles x entries) products, and (entries x strategies) indicators,
+# evaluated at a time in deviation_payoffs
+_BLOCK = 2**22
+
+
+class SparseNFG(NFG_Core):
+    """
+    NFG_Core with payoffs in coordinate (COO) form: coords (nnz, n_players)
+    holds the strategy profiles whose payoffs differ from default, and values
+    (n_players, nnz) the payoffs there. Memory scales with nnz, not with the
+    product of the strategy counts.
+
+    With delta = values - default, every expected payoff is a sum over the
+    entries, for example E u_p(x) = default_p + sum_k delta[p, k] prod_q x_q[coords[k, q]].
+    get_util, get_payoff_vec, deviation_payoffs (so exploitability and the
+    learning dynamics), constant_sum and payoff_bounds all evaluate it that
+    way. Code written against u_mat (LH, the simplex solvers, the payoff
+    table) gets the dense tensor instead, built on first access and kept.
+    game_hash() hashes the sparse form, so it differs from the dense game's
+    hash.
+    """
+    dense = False
+
+    def __init__(self, n_players:int, n_strategies:List[int], coords:np.ndarray, values:np.ndarray,
+                 default=0.0, game_name:str='', strategy_labels:List[List[str]]=None):
+        assert (len(n_strategies) == n_players)
+        assert ([len(per_player_label) for per_player_label in strategy_labels] == n_strategies)
+        self.n_players = n_players
+        self.n_strategies = n_strategies
+        self.labels = strategy_labels
+        self.title = game_name
+
+        coords = np.asarray(coords, dtype=np.int64).reshape(-1, n_players)
+        values = np.asarray(values, dtype=float).reshape(n_players, -1)
+        if values.shape[1] != coords.shape[0]:
+            raise ValueError(f"{coords.shape[0]} coords but {values.shape[1]} values per player")
+        if np.any(coords < 0) or np.any(coords >= np.asarray(n_strategies)):
+            raise ValueError("coords out of range of n_strategies")
+        # canonical order (C order of the dense tensor), for hashing and duplicate checks
+        order = np.lexsort(coords.T[::-1])
+        coords, values = coords[order], values[:, order]
+        if len(coords) > 1 and np.any(np.all(coords[1:] == coords[:-1], axis=1)):
+            raise ValueError("duplicate coords")
+        self.coords:np.ndarray = coords
+        self.values:np.ndarray = values
+        self.default:np.ndarray = np.broadcast_to(np.asarray(default, dtype=float), (n_players,)).copy()
+        self.delta:np.ndarray = values - self.default[:, None]
+
+        # (entries x strategies) indicator of each entry's strategy, per player and block
+        self._scatter:dict = {}
+        self._dense:np.ndarray = None
+
+    @property
+    def nnz(self) -> int:
+        return int(self.coords.shape[0])
+
+    @property
+    def n_profiles(self) -> int:
+        return int(np.prod(self.n_strategies, dtype=float))
+
+    # ---- dense ----
+    @property
+    def u_mat(self) -> np.ndarray:
+        if self._dense is None:
+            u = np.empty([self.n_players] + list(self.n_strategies))
+            for p in range(self.n_players):
+                u[p] = self.default[p]
+                u[p][tuple(self.coords.T)] = self.values[p]
+            u.setflags(write=False)
+            self._dense = u
+        return self._dense
+
+    def to_dense(self) -> NFG_Core:
+        return NFG_Core(self.n_players, list(self.n_strategies), np.array(self.u_mat),
+                        self.title, self.labels)
+
+    @classmethod
+    def from_dense(cls, game:NFG_Core, default=None) -> "SparseNFG":
+        """Sparse copy of game. default: payoff per player (or one for all) left out;
+        None takes each player's most common payoff."""
+        u = np.asarray(game.u_mat, dtype=float)
+        if default is None:
+            default = []
+            for p in range(game.n_players):
+                vals, counts = np.unique(u[p], return_counts=True)
+                default.append(vals[np.argmax(counts)])
+        default = np.broadcast_to(np.asarray(default, dtype=float), (game.n_players,))
+        differs = np.any(u != default.reshape((-1,) + (1,) * (u.ndim - 1)), axis=0)
+        coords = np.argwhere(differs)
+        return cls(game.n_players, list(game.n_strategies), coords, u[(slice(None),) + tuple(coords.T)],
+                   default, game.title, game.labels)
+
+    # ---- utilities ----
+    def _weights(self, prob_vecs, skip:int=None) -> np.ndarray:
+        """prod over players q != skip of prob_vecs[q][coords[:, q]], per entry."""
+        w = np.ones(self.nnz)
+        for q, vec in enumerate(prob_vecs):
+            if q != skip:
+                w *= vec[self.coords[:, q]]
+        return w
+
+    @timed('nfg.get_util')
+    def get_util(self, player, sprofile):
+        prob_vecs = self.get_prob_vecs(sprofile)
+        if prob_vecs is None:
+            return 0.0
+        return float(self.default[player] + self.delta[player] @ self._weights(prob_vecs))
+
+    def get_payoff_vec(self, player, prob_vecs):
+        contrib = self.delta[player] * self._weights(prob_vecs, skip=player)
+        return self.default[player] + np.bincount(
+            self.coords[:, player], weights=contrib, minlength=self.n_strategies[player])
+
+    @timed('nfg.deviation_payoffs')
+    def deviation_payoffs(self, prob_batch):
+        Z = prob_batch[0].shape[0]
+        n = self.n_players
+        out = [np.full((Z, self.n_strategies[p]), self.default[p]) for p in range(n)]
+        block = max(1, _BLOCK // max(Z, max(self.n_strategies), 1))
+        for start in range(0, self.nnz, block):
+            stop = min(self.nnz, start + block)
+            coords = self.coords[start:stop]
+            # gathered[q]: (Z, entries) probability of each entry's strategy of player q
+            gathered = [x[:, coords[:, q]] for q, x in enumerate(prob_batch)]
+            # prefix / suffix products: each player's product over the others in O(n)
+            prefix = [np.ones((Z, stop - start))]
+            for q in range(n - 1):
+                prefix.append(prefix[-1] * gathered[q])
+            suffix = np.ones((Z, stop - start))
+            for p in reversed(range(n)):
+                contrib = prefix[p] * suffix * self.delta[p, start:stop]
+                suffix = suffix * gathered[p]
+                # sum the entries of each strategy of p: a matrix product, faster than any scatter
+                out[p] += contrib @ self._indicator(p, start, stop)
+        return out
+
+    def _indicator(self, p:int, start:int, stop:int) -> np.ndarray:
+        key = (p, start, stop)
+        m = self._scatter.get(key)
+        if m is None:
+            m = np.zeros((stop - start, self.n_strategies[p]))
+            m[np.arange(stop - start), self.coords[start:stop, p]] = 1.0
+            # kept only while they stay small
+            if sum(a.nbytes for a in self._scatter.values()) + m.nbytes <= 8 * _BLOCK:
+                self._scatter[key] = m
+        return m
+
+    def constant_sum(self, tol:float=1e-9):
+        totals = self.values.sum(axis=0)
+        if self.nnz < self.n_profiles:
+            # the default profiles take part too
+            totals = np.append(totals, self.default.sum())
+        if len(totals) == 0:
+            return None
+        c = float(totals[-1])
+        if np.all(np.abs(totals - c) <= tol * max(1.0, abs(c))):
+            return c
+        return None
+
+    def payoff_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        lo = self.values.min(axis=1, initial=np.inf)
+        hi = self.values.max(axis=1, initial=-np.inf)
+        if self.nnz < self.n_profiles:
+            lo, hi = np.minimum(lo, self.default), np.maximum(hi, self.default)
+        return lo, hi
+
+    def payoff_nbytes(self) -> int:
+        return int(self.coords.nbytes + self.values.nbytes + self.delta.nbytes)
+
+    def set_read_only(self):
+        for a in (self.coords, self.values, self.default, self.delta):
+            a.setflags(write=False)
+
+    # ---- serialization ----
+    def _header(self) -> dict:
+        return {
+            "format": "sparse",
+            "n_players": self.n_players,
+            "n_strategies": list(self.n_strategies),
+            "game_name": self.title,
+            "strategy_labels": self.labels,
+            "default": self.default.tolist(),
+        }
+
+    def game_hash(self) -> str:
+        if getattr(self, '_hash', None) is None:
+            h = hashlib.sha256()
+            h.update(json.dumps(self._header(), sort_keys=True).encode())
+            h.update(np.ascontiguousarray(self.coords, dtype=np.int64).tobytes())
+            h.update(np.ascontiguousarray(self.values, dtype=np.float64).tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return {**self._header(), "coords": self.coords.tolist(), "values": self.values.tolist()}
+
+    @classmethod
+    def from_dict(cls, data:dict) -> "SparseNFG":
+        n_players = data["n_players"]
+        return cls(
+            n_players=n_players,
+            n_strategies=data["n_strategies"],
+            coords=np.array(data["coords"], dtype=np.int64).reshape(-1, n_players),
+            values=np.array(data["values"], dtype=float).reshape(n_players, -1),
+            default=data.get("default", 0.0),
+            game_name=data.get("game_name", ""),
+            strategy_labels=data["strategy_labels"],
+        )
+
+    def to_bytes(self) -> bytes:
+        """NFG_Core binary format with a sparse header: int64 coords, then float64 values."""
+        header = json.dumps({**self._header(), "nnz": self.nnz}).encode()
+        return (BINARY_MAGIC + struct.pack('<I', len(header)) + header
+                + np.ascontiguousarray(self.coords, dtype='<i8').tobytes()
+                + np.ascontiguousarray(self.values, dtype='<f8').tobytes())
+
+    @classmethod
+    def _from_binary(cls, header:dict, data:bytes, start:int) -> Tuple["SparseNFG", int]:
+        n, nnz = header["n_players"], header["nnz"]
+        end = start + 8 * nnz * n * 2
+        if end > len(data):
+            raise ValueError(f"truncated binary game at offset {start}")
+        coords = np.frombuffer(data, dtype='<i8', count=nnz * n, offset=start).reshape(nnz, n)
+        values = np.frombuffer(data, dtype='<f8', count=nnz * n, offset=start + 8 * nnz * n).reshape(n, nnz)
+        return cls(n, list(header["n_strategies"]), coords, values, header["default"],
+                   header.get("game_name", ""), header["strategy_labels"]), end
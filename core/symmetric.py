@@ -0,0 +1,349 @@
+"""
+Symmetric games: every player has the same strategies, and a player's payoff
+depends only on its own strategy and on how many of the others play each
+strategy (not on who plays what). One table of size
+k x C(n + k - 2, k - 1) holds the whole game, polynomial in the number of
+players n instead of the n * k^n entries of u_mat.
+
+    is_symmetric(game)                           # permutation invariance of u_mat
+    game = SymmetricNFG.from_dense(dense_game)   # ValueError if it is not symmetric
+    game = SymmetricNFG.from_function(50, 2, lambda own, counts: ...)
+    game.symmetric_payoff_vecs(X)                # everyone playing the rows of X
+"""
+from __future__ import annotations
+from typing import Callable, List, Tuple
+import hashlib
+import json
+import math
+import struct
+
+import numpy as np
+
+from core.normal_form_game import BINARY_MAGIC, MAX_DENSE_ENTRIES, NFG_Core
+from core.profiling import timed
+
+
+def is_symmetric(game:NFG_Core, tol:float=1e-9) -> bool:
+    """
+    Whether relabeling the players leaves the game unchanged: swapping players
+    i and j swaps their payoffs and their strategy axes. Swaps of player 0
+    with each other player generate every permutation, so n - 1 whole-tensor
+    comparisons decide it. Compact games too large to materialize count as
+    not symmetric (SymmetricNFG is, by construction).
+    """
+    if isinstance(game, SymmetricNFG):
+        return True
+    n = game.n_players
+    if len(set(game.n_strategies)) > 1 or not game.can_materialize():
+        return False
+    u = game.u_mat
+    atol = tol * max(1.0, float(np.abs(u).max(initial=0.0)))
+    for i in range(1, n):
+        swap = list(range(n))
+        swap[0], swap[i] = i, 0
+        # player p's payoffs become player swap[p]'s, seen with axes 0 and i exchanged
+        if not np.allclose(u[swap].transpose([0] + [1 + a for a in swap]), u, rtol=0.0, atol=atol):
+            return False
+    return True
+
+
+def _compositions(total:int, k:int) -> np.ndarray:
+    """Every count vector of k strategies summing to total, lexicographic order, shape (S, k)."""
+    if k == 1:
+        return np.array([[total]], dtype=np.int64)
+    parts = []
+    for first in range(total + 1):
+        rest = _compositions(total - first, k - 1)
+        parts.append(np.column_stack([np.full(len(rest), first, dtype=np.int64), rest]))
+    return np.concatenate(parts)
+
+
+class _CountIndex:
+    """
+    Rank of count vectors (k strategies, summing to total) in the order of
+    _compositions(total, k), vectorized: for the i-th count, skip every
+    vector that agrees before i and has a smaller i-th count,
+    C(T_i + r, r) - C(T_i - c_i + r, r) of them, with T_i the rest of the
+    total and r = k - 1 - i.
+    """
+    def __init__(self, total:int, k:int):
+        self.total:int = total
+        self.k:int = k
+        # binom[t, r] = C(t + r, r): all at most the number of count vectors
+        binom = np.ones((total + 1, k), dtype=np.int64)
+        for t in range(1, total + 1):
+            for r in range(1, k):
+                binom[t, r] = binom[t - 1, r] + binom[t, r - 1]
+        self.binom:np.ndarray = binom
+
+    @property
+    def size(self) -> int:
+        return math.comb(self.total + self.k - 1, self.k - 1)
+
+    def rank(self, counts:np.ndarray) -> np.ndarray:
+        counts = np.asarray(counts, dtype=np.int64)
+        left = self.total - np.cumsum(counts, axis=-1) + counts
+        r = np.arange(self.k - 1, -1, -1)
+        return (self.binom[left, r] - self.binom[left - counts, r])[..., :-1].sum(axis=-1)
+
+
+class SymmetricNFG(NFG_Core):
+    """
+    NFG_Core of a symmetric game: table[s, j] is the payoff of a player
+    playing s while the other n - 1 players' strategy counts are the j-th
+    vector of _compositions(n - 1, k). Every player's payoff is read from the
+    same table.
+
+    Expected payoffs need the distribution of the others' counts. When the
+    others all play the same mix x it is multinomial (closed form): the
+    symmetric fast path of get_payoff_vec, deviation_payoffs and
+    symmetric_payoff_vecs. Otherwise the distribution is built one player at
+    a time over the count vectors, still polynomial. u_mat is materialized
+    on first access, only up to MAX_DENSE_ENTRIES entries.
+    """
+    dense = False
+
+    def __init__(self, n_players:int, n_strategies:int, table:np.ndarray,
+                 game_name:str='', strategy_labels:List[List[str]]=None):
+        self.n_players = n_players
+        self.n_strategies = [int(n_strategies)] * n_players
+        if strategy_labels is None:
+            strategy_labels = [[f"s{i}" for i in range(n_strategies)]] * n_players
+        assert ([len(per_player_label) for per_player_label in strategy_labels] == self.n_strategies)
+        self.labels = strategy_labels
+        self.title = game_name
+
+        self.k:int = int(n_strategies)
+        # count vectors of the others, and of every player
+        self.index = _CountIndex(n_players - 1, self.k)
+        self.table:np.ndarray = np.asarray(table, dtype=float)
+        if self.table.shape != (self.k, self.index.size):
+            raise ValueError(f"table has shape {self.table.shape}, expected {(self.k, self.index.size)} "
+                             f"({n_players} players, {self.k} strategies)")
+        # log multinomial coefficients of the others' count vectors
+        log_fact = np.array([math.lgamma(c + 1) for c in range(n_players)])
+        self._counts:np.ndarray = _compositions(n_players - 1, self.k)
+        self._log_coef:np.ndarray = log_fact[n_players - 1] - log_fact[self._counts].sum(axis=1)
+        # per number of players m: index in level m + 1 of each level-m count vector plus one strategy
+        self._successors:List[np.ndarray] = []
+        self._dense:np.ndarray = None
+
+    @classmethod
+    def from_dense(cls, game:NFG_Core, tol:float=1e-9) -> "SymmetricNFG":
+        if not is_symmetric(game, tol):
+            raise ValueError(f"{game.title or 'game'} is not symmetric")
+        n, k = game.n_players, game.n_strategies[0]
+        counts = _compositions(n - 1, k)
+        # one profile of the others per count vector: its strategies in ascending order
+        reps = np.stack([np.repeat(np.arange(k), c) for c in counts]).reshape(len(counts), n - 1)
+        table = np.asarray(game.u_mat[0], dtype=float)[(slice(None),) + tuple(reps.T)]
+        return cls(n, k, table, game.title, game.labels)
+
+    @classmethod
+    def from_function(cls, n_players:int, n_strategies:int, fn:Callable[[int, np.ndarray], float],
+                      game_name:str='', strategy_labels:List[List[str]]=None) -> "SymmetricNFG":
+        """fn(own strategy, the others' counts, shape (k,)) -> payoff."""
+        counts = _compositions(n_players - 1, n_strategies)
+        table = np.array([[fn(s, c) for c in counts] for s in range(n_strategies)], dtype=float)
+        return cls(n_players, n_strategies, table, game_name, strategy_labels)
+
+    # ---- dense ----
+    @property
+    def n_entries(self) -> float:
+        return self.n_players * float(self.k) ** self.n_players
+
+    def can_materialize(self) -> bool:
+        return self.n_entries <= MAX_DENSE_ENTRIES
+
+    @property
+    def u_mat(self) -> np.ndarray:
+        if self._dense is None:
+            if not self.can_materialize():
+                raise ValueError(
+                    f"{self.n_players}-player symmetric game: the payoff tensor would have "
+                    f"{self.n_entries:.3g} entries (limit {MAX_DENSE_ENTRIES}, GTV_MAX_DENSE_ENTRIES)")
+            n, k = self.n_players, self.k
+            profiles = np.indices([k] * n).reshape(n, -1).T
+            counts = np.zeros((len(profiles), k), dtype=np.int64)
+            for p in range(n):
+                counts[np.arange(len(profiles)), profiles[:, p]] += 1
+            u = np.empty([n] + [k] * n)
+            for p in range(n):
+                own = profiles[:, p]
+                others = counts.copy()
+                others[np.arange(len(profiles)), own] -= 1
+                u[p] = self.table[own, self.index.rank(others)].reshape([k] * n)
+            u.setflags(write=False)
+            self._dense = u
+        return self._dense
+
+    def to_dense(self) -> NFG_Core:
+        return NFG_Core(self.n_players, list(self.n_strategies), np.array(self.u_mat),
+                        self.title, self.labels)
+
+    # ---- utilities ----
+    def symmetric_payoff_vecs(self, X:np.ndarray) -> np.ndarray:
+        """(Z, k) payoff of each pure strategy while the other n - 1 players all play row z of X."""
+        X = np.asarray(X, dtype=float)
+        # sum_t c_t log x_t: log 0 as a huge finite negative keeps 0 * log 0 = 0
+        log_x = np.log(X, out=np.full_like(X, -1e300), where=X > 0)
+        dist = np.exp(self._log_coef[None] + log_x @ self._counts.T)
+        return dist @ self.table.T
+
+    def _successor(self, m:int) -> np.ndarray:
+        # (S_m, k): index among the count vectors of m + 1 players of c + e_t
+        while len(self._successors) <= m:
+            level = len(self._successors)
+            counts = _compositions(level, self.k)
+            bumped = counts[:, None, :] + np.eye(self.k, dtype=np.int64)[None]
+            self._successors.append(_CountIndex(level + 1, self.k).rank(bumped))
+        return self._successors[m]
+
+    def _count_dist(self, mixes:List[np.ndarray]) -> np.ndarray:
+        """(Z, S) distribution of the count vector of independent players with these (Z, k) mixes."""
+        dist = np.ones((mixes[0].shape[0], 1))
+        for m, x in enumerate(mixes):
+            succ = self._successor(m)
+            new = np.zeros((dist.shape[0], math.comb(m + self.k, self.k - 1)))
+            for t in range(self.k):
+                # c -> c + e_t is one-to-one: plain fancy-index accumulation is safe
+                new[:, succ[:, t]] += dist * x[:, t:t + 1]
+            dist = new
+        return dist
+
+    def _others_payoffs(self, mixes:List[np.ndarray]) -> np.ndarray:
+        if all(x is mixes[0] or np.array_equal(x, mixes[0]) for x in mixes[1:]):
+            return self.symmetric_payoff_vecs(mixes[0])
+        return self._count_dist(mixes) @ self.table.T
+
+    @timed('nfg.get_util')
+    def get_util(self, player, sprofile):
+        prob_vecs = self.get_prob_vecs(sprofile)
+        if prob_vecs is None:
+            return 0.0
+        return float(prob_vecs[player] @ self.get_payoff_vec(player, prob_vecs))
+
+    def get_payoff_vec(self, player, prob_vecs):
+        others = [np.asarray(prob_vecs[q], dtype=float)[None] for q in range(self.n_players) if q != player]
+        if len(others) == 0:
+            return self.table[:, 0].copy()
+        return self._others_payoffs(others)[0]
+
+    @timed('nfg.deviation_payoffs')
+    def deviation_payoffs(self, prob_batch):
+        Z = prob_batch[0].shape[0]
+        if self.n_players == 1:
+            return [np.broadcast_to(self.table[:, 0], (Z, self.k)).copy()]
+        if all(np.array_equal(x, prob_batch[0]) for x in prob_batch[1:]):
+            # symmetric profiles: one evaluation serves every player
+            u = self.symmetric_payoff_vecs(prob_batch[0])
+            return [u] + [u.copy() for _ in range(self.n_players - 1)]
+        return [self._others_payoffs([x for q, x in enumerate(prob_batch) if q != p])
+                for p in range(self.n_players)]
+
+    def constant_sum(self, tol:float=1e-9):
+        # total payoff of every count vector of all n players
+        counts = _compositions(self.n_players, self.k)
+        totals = np.zeros(len(counts))
+        for t in range(self.k):
+            playing = counts[:, t] > 0
+            others = counts[playing].copy()
+            others[:, t] -= 1
+            totals[playing] += counts[playing, t] * self.table[t, self.index.rank(others)]
+        c = float(totals[0])
+        if np.all(np.abs(totals - c) <= tol * max(1.0, abs(c))):
+            return c
+        return None
+
+    def payoff_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (np.full(self.n_players, float(self.table.min())),
+                np.full(self.n_players, float(self.table.max())))
+
+    def payoff_nbytes(self) -> int:
+        return int(self.table.nbytes)
+
+    def set_read_only(self):
+        self.table.setflags(write=False)
+
+    # ---- serialization ----
+    def _header(self) -> dict:
+        return {
+            "format": "symmetric",
+            "n_players": self.n_players,
+            "n_strategies": list(self.n_strategies),
+            "game_name": self.title,
+            "strategy_labels": self.labels,
+        }
+
+    def game_hash(self) -> str:
+        if getattr(self, '_hash', None) is None:
+            h = hashlib.sha256()
+            h.update(json.dumps(self._header(), sort_keys=True).encode())
+            h.update(np.ascontiguousarray(self.table, dtype=np.float64).tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return {**self._header(), "table": self.table.tolist()}
+
+    @classmethod
+    def from_dict(cls, data:dict) -> "SymmetricNFG":
+        return cls(
+            n_players=data["n_players"],
+            n_strategies=data["n_strategies"][0],
+            table=np.array(data["table"], dtype=float),
+            game_name=data.get("game_name", ""),
+            strategy_labels=data.get("strategy_labels"),
+        )
+
+    def to_bytes(self) -> bytes:
+        """NFG_Core binary format with a symmetric header, then the table."""
+        header = json.dumps(self._header()).encode()
+        return (BINARY_MAGIC + struct.pack('<I', len(header)) + header
+                + np.ascontiguousarray(self.table, dtype='<f8').tobytes())
+
+    @classmethod
+    def _from_binary(cls, header:dict, data:bytes, start:int) -> Tuple["SymmetricNFG", int]:
+        n, k = header["n_players"], header["n_strategies"][0]
+        size = math.comb(n + k - 2, k - 1)
+        end = start + 8 * k * size
+        if end > len(data):
+            raise ValueError(f"truncated binary game at offset {start}")
+        table = np.frombuffer(data, dtype='<f8', count=k * size, offset=start).reshape(k, size)
+        return cls(n, k, table, header.get("game_name", ""), header["strategy_labels"]), end
+
+
+def public_goods(n_players:int, multiplier:float=2.0, cost:float=1.0) -> SymmetricNFG:
+    """
+    Public goods game (strategy 0 keep, 1 contribute): contributions are
+    multiplied and shared by everyone, u = multiplier * cost * contributors / n
+    - cost * [contributes]. Keeping is dominant for multiplier < n.
+    """
+    def payoff(own:int, counts:np.ndarray) -> float:
+        contributors = counts[1] + own
+        return multiplier * cost * contributors / n_players - cost * own
+    return SymmetricNFG.from_function(n_players, 2, payoff, f"Public Goods ({n_players} players)",
+                                      [['keep', 'contribute']] * n_players)
+
+
+if __name__ == "__main__":
+    import time
+    from core.generators import generate
+
+    for kind, shape in (('rps', [3, 3]), ('prisoners_dilemma', [2] * 4), ('coordination', [3] * 3)):
+        dense = generate(kind, shape, 1, seed=0)[0]
+        print(f"{kind} {shape}: symmetric={is_symmetric(dense)}")
+    dense = generate('prisoners_dilemma', [2] * 6, 1, seed=0)[0]
+    game = SymmetricNFG.from_dense(dense)
+    assert np.array_equal(game.u_mat, dense.u_mat)
+    rng = np.random.default_rng(0)
+    batch = [rng.dirichlet(np.ones(2), 64) for _ in range(6)]
+    assert all(np.allclose(a, b) for a, b in zip(game.deviation_payoffs(batch), dense.deviation_payoffs(batch)))
+    assert game.constant_sum() == dense.constant_sum()
+
+    game = public_goods(200)
+    X = rng.dirichlet(np.ones(2), 1024)
+    start = time.perf_counter()
+    game.symmetric_payoff_vecs(X)
+    print(f"{game.title}: {game.payoff_nbytes()} payoff bytes (dense: {8 * game.n_entries:.3g}), "
+          f"symmetric payoffs of 1024 mixes in {time.perf_counter() - start:.4f}s")
@@ -0,0 +1,31 @@
+from __future__ import annotations
+from typing import Dict, List
+
+
+def _cell(value) -> str:
+    return str(value).replace('|', '\\|').replace('\n', ' ')
+
+
+def markdown_table(rows:List[dict]) -> str:
+    """
+    GitHub-flavored markdown table (for st.markdown) of rows sharing their keys,
+    columns in first-seen order. st.table would import pandas (and pyarrow),
+    about half a second on a cold page.
+    """
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    lines = [
+        '| ' + ' | '.join(_cell(c) for c in columns) + ' |',
+        '|' + '---|' * len(columns),
+    ]
+    for row in rows:
+        lines.append('| ' + ' | '.join(_cell(row.get(c, '')) for c in columns) + ' |')
+    return '\n'.join(lines)
+
+
+def columns_table(columns:Dict[str, Dict[str, object]], index_name:str='') -> str:
+    """markdown_table of named columns of {row label: value}, e.g. one mix per player."""
+    labels = list(dict.fromkeys(label for col in columns.values() for label in col))
+    return markdown_table([
+        {index_name: label, **{name: col.get(label, '') for name, col in columns.items()}}
+        for label in labels
+    ])
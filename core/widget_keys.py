@@ -0,0 +1,39 @@
+from __future__ import annotations
+import hashlib
+import json
+
+from core.profiling import count, timer
+
+
+def content_id(data:dict) -> str:
+    """Short deterministic id for a json-able dict (e.g. a viz at load time)."""
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True).encode()
+    ).hexdigest()[:12]
+
+
+def widget_key(*parts) -> str:
+    """
+    Deterministic widget key from content, e.g. (viz id, element, index).
+    Same parts -> same key on every rerun, so Streamlit diffs the widget
+    instead of tearing it down and rebuilding it.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f"{parts[1] if len(parts) > 1 else parts[0]}_{digest}"
+
+
+def cached_figure(store:dict, key:str, version, build):
+    """
+    Return the figure stored under key, rebuilding it with build()
+    only when the figure spec version changed.
+    store: per-session dict, e.g. st.session_state.su['figs']
+    """
+    entry = store.get(key)
+    if entry is None or entry[0] != version:
+        count('figure.build')
+        with timer('figure.build'):
+            entry = (version, build())
+        store[key] = entry
+    else:
+        count('figure.hit')
+    return entry[1]
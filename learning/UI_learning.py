@@ -0,0 +1,377 @@
+from __future__ import annotations
+import streamlit as st
+import numpy as np
+import json
+
+from core.game_cache import get_shared_cache
+from core.jobs import Job, background_result
+from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.session_store import SessionNamespace, session_namespace
+from core.symmetric import is_symmetric
+from core.tables import columns_table, markdown_table
+from core.widget_keys import widget_key, cached_figure
+from learning.dynamics import DYNAMICS
+
+DEFAULT_GAMES = {
+    '3-Player Example': "data/learning/example_game_3p.json",
+    'Rock-Paper-Scissors': "data/pr/viz2_Rock-Paper-Scissors.json",
+    "Prisoner's Dilemma": "data/pr/viz2_Prisoner's Dilemma.json",
+    'Sidewalk Coordination': "data/pr/viz2_Sidewalk Coordination.json",
+}
+# points per plotted trajectory
+MAX_RECORDED = 300
+# progress updates of a dynamics run every this many iterations
+PROGRESS_EVERY = 20
+
+
+def reset_session_state(load_if_exist=False):
+    """Reset session states."""
+    if not load_if_exist:
+        st.session_state.ln = SessionNamespace('ln')
+    # memory-accounted session state (only figures are dropped when idle)
+    session_namespace('ln')
+
+def main():
+    reset_session_state(load_if_exist=True)
+    if 'figs' not in st.session_state.ln:
+        # built figures by widget key, reused while their spec version is unchanged
+        st.session_state.ln['figs'] = {}
+
+    render_page_header()
+    render_game_loader()
+
+    game:NFG_Core = st.session_state.ln['game']
+    st.write(f"### Game: [{game.title}]")
+    config, run = render_controls(game)
+    render_results(game, config, run)
+    render_qre(game)
+    render_simpdiv(game)
+
+
+@timed('ln.render_page_header')
+def render_page_header():
+    """Render title and description"""
+    st.write("### Learning Dynamics")
+    st.write(
+        """Fictitious play, replicator dynamics and smoothed best response for games with any number of players
+            (and single-population replicator dynamics for symmetric games).
+            Many starting profiles are run at once; each one stops when its exploitability
+            (the total gain of the players' best deviations) drops below epsilon.
+            Trajectories are drawn on every player's simplex."""
+    )
+
+@timed('ln.render_game_loader')
+def render_game_loader():
+    with st.container(horizontal=True):
+        game_file = st.file_uploader(
+            label="Load Game", type='json',
+            accept_multiple_files=False,
+            on_change=reset_session_state
+        )
+        default = st.selectbox(
+            'Default game', list(DEFAULT_GAMES.keys()),
+            key='ln_default_game_selectbox',
+            on_change=reset_session_state
+        )
+
+    if 'game' in st.session_state.ln:
+        return
+
+    # one shared read-only copy per distinct game across sessions
+    cache = get_shared_cache()
+    if game_file is not None:
+        # game json, or a viz json holding one
+        data = json.load(game_file)
+        st.session_state.ln['game'] = cache.intern_game(NFG_Core.from_dict(data.get('game', data)))
+    else:
+        _, st.session_state.ln['game'] = cache.load_json_file(DEFAULT_GAMES[default])
+
+
+@timed('ln.render_controls')
+def render_controls(game:NFG_Core):
+    """(dynamics settings, whether Run was pressed)"""
+    # symmetric-only rules are offered for symmetric games
+    symmetric = get_shared_cache().get_or_compute(game.game_hash(), 'symmetric', lambda: is_symmetric(game))
+    rules = [name for name, cls in DYNAMICS.items() if symmetric or not cls.symmetric]
+    with st.form('ln_controls_form', border=True):
+        rule = st.selectbox('Dynamics', rules, key='ln_rule_selectbox')
+        cols = st.columns(4)
+        config = dict(
+            rule=rule,
+            n_starts=cols[0].number_input('Starting points', 1, 4096, 32, key='ln_n_starts'),
+            max_iters=cols[1].number_input('Max iterations', 1, 100000, 2000, key='ln_max_iters'),
+            eps=cols[2].number_input('Epsilon', 0.0, 10.0, 1e-3, format='%.4f', key='ln_eps'),
+            seed=cols[3].number_input('Seed', 0, 2**31-1, 0, key='ln_seed'),
+        )
+        cols = st.columns(2)
+        if rule in ('Replicator Dynamics', 'Symmetric Replicator'):
+            config['step_size'] = cols[0].number_input('Step size', 1e-4, 1.0, 0.1, format='%.4f', key='ln_step')
+        elif rule == 'Smoothed Best Response':
+            config['temperature'] = cols[0].number_input(
+                'Temperature', 1e-4, 10.0, 0.05, format='%.4f', key='ln_temperature')
+            # 0 -> 1/(t+2)
+            step = cols[1].number_input(
+                'Step size (0: 1/t)', 0.0, 1.0, 0.0, format='%.4f', key='ln_sbr_step')
+            config['step_size'] = step if step > 0 else None
+        run = st.form_submit_button('Run')
+    return config, run
+
+
+def run_dynamics(game:NFG_Core, config:dict, job:Job=None):
+    kwargs = dict(config)
+    cls = DYNAMICS[kwargs.pop('rule')]
+    max_iters = int(kwargs.pop('max_iters'))
+    kwargs['n_starts'] = int(kwargs['n_starts'])
+    kwargs['seed'] = int(kwargs['seed'])
+    kwargs['record_every'] = max(1, max_iters // MAX_RECORDED)
+
+    def on_update(model):
+        if model.t % PROGRESS_EVERY == 0:
+            job.check()
+            converged = int(np.sum(model.converged_at >= 0))
+            job.progress(model.t / max_iters, f"iteration {model.t}, {converged}/{model.n_starts} converged")
+    return cls(game, **kwargs).run(max_iters=max_iters, on_update=None if job is None else on_update)
+
+
+@timed('ln.render_results')
+def render_results(game:NFG_Core, config:dict, run:bool=False):
+    key = tuple(sorted(config.items()))
+    # same game and settings -> same run, for every session
+    model = get_shared_cache().get(game.game_hash(), 'learning', key)
+    if model is None:
+        model = background_result(
+            st.session_state.ln, 'learning', game.game_hash(), 'learning',
+            lambda job: run_dynamics(game, config, job), key=key, label=config['rule'], restart=run)
+        if model is None:
+            return
+
+    state = model.get_state()
+    best = model.best()
+    converged = int(np.sum(state['converged_at'] >= 0))
+    with st.container(horizontal=True):
+        st.metric('Iterations', state['t'])
+        st.metric('Converged', f"{converged}/{model.n_starts}")
+        st.metric('Best exploitability', f"{state['exploitability'][best]:.2e}")
+
+    n_shown = st.slider(
+        'Trajectories shown', 1, model.n_starts, min(model.n_starts, 16), key='ln_n_shown')
+    cols = st.columns(min(game.n_players, 3))
+    for pid in range(game.n_players):
+        with cols[pid % len(cols)]:
+            fig_key = widget_key(game.game_hash()[:12], 'simplex', pid)
+            fig = cached_figure(
+                st.session_state.ln['figs'], fig_key, (key, n_shown),
+                lambda: _build_simplex_figure(game, model, pid, n_shown)
+            )
+            st.plotly_chart(fig, width='stretch', key=fig_key)
+
+    st.write(f"**Lowest exploitability profile** (starting point {best})")
+    st.markdown(columns_table({
+        f"P{pid}": {label: round(float(p), 4) for label, p in zip(game.labels[pid], state['mix'][pid][best])}
+        for pid in range(game.n_players)
+    }))
+
+
+@timed('ln.render_qre')
+def render_qre(game:NFG_Core):
+    st.write("#### Logit QRE path")
+    st.write(
+        """Logit quantal response equilibria from uniform play (lambda = 0) to nearly
+            rational play; the end of the path approximates the Nash equilibrium it selects."""
+    )
+    with st.form('ln_qre_form', border=True):
+        lam_max = st.number_input('Max lambda', 1.0, 1e8, 1e6, format='%.0f', key='ln_qre_lam_max')
+        traced = st.form_submit_button('Trace')
+
+    key = float(lam_max)
+    result = get_shared_cache().get(game.game_hash(), 'qre', key, persist=True)
+    if result is None:
+        # the path so far is redrawn while it is traced
+        result = background_result(
+            st.session_state.ln, 'qre', game.game_hash(), 'qre', lambda job: trace_qre(game, lam_max, job),
+            key=key, persist=True, label='Tracing', start=traced, restart=traced,
+            preview=lambda model: _render_qre_preview(game, model))
+        if result is None:
+            return
+
+    fig_key = widget_key(game.game_hash()[:12], 'qre')
+    fig = cached_figure(
+        st.session_state.ln['figs'], fig_key, key,
+        lambda: _build_qre_figure(game, result['lambdas'], result['path'])
+    )
+    st.plotly_chart(fig, width='stretch', key=fig_key)
+
+    state = result['state']
+    with st.container(horizontal=True):
+        st.metric('Lambda', f"{state['lam']:.3g}")
+        st.metric('Steps', state['steps'])
+        st.metric('Exploitability', f"{state['exploitability']:.2e}")
+    st.markdown(columns_table({
+        f"P{pid}": {label: round(float(p), 4) for label, p in zip(game.labels[pid], state['mix'][pid])}
+        for pid in range(game.n_players)
+    }))
+
+
+@timed('ln.render_simpdiv')
+def render_simpdiv(game:NFG_Core):
+    st.write("#### Nash equilibrium by simplicial subdivision")
+    st.write(
+        """Follows completely labeled simplices on ever finer grids over the players'
+            simplices, restarting each grid from the previous solution, until no player
+            gains more than the precision by deviating."""
+    )
+    with st.form('ln_simpdiv_form', border=True):
+        precision = st.number_input(
+            'Precision', 1e-12, 1.0, 1e-8, format='%.1e', key='ln_simpdiv_precision')
+        solved = st.form_submit_button('Solve')
+
+    key = float(precision)
+    state = get_shared_cache().get(game.game_hash(), 'simpdiv', key, persist=True)
+    if state is None:
+        state = background_result(
+            st.session_state.ln, 'simpdiv', game.game_hash(), 'simpdiv',
+            lambda job: solve_simpdiv(game, precision, job),
+            key=key, persist=True, label='Solving', start=solved, restart=solved)
+        if state is None:
+            return
+
+    with st.container(horizontal=True):
+        st.metric('Max regret', f"{state['regret']:.2e}")
+        st.metric('Refinements', len(state['refinements']))
+    if not state['done']:
+        st.warning("Stopped before reaching the precision: a refinement ran out of pivots.")
+    st.markdown(columns_table({
+        f"P{pid}": {label: round(float(p), 6) for label, p in zip(game.labels[pid], state['mix'][pid])}
+        for pid in range(game.n_players)
+    }))
+    st.write("**Refinements**")
+    st.markdown(markdown_table([
+        {'mesh': rec['mesh'], 'pivots': rec['pivots'],
+         'time (ms)': round(rec['seconds'] * 1000, 1), 'max regret': f"{rec['regret']:.2e}"}
+        for rec in state['refinements']
+    ]))
+
+
+def trace_qre(game:NFG_Core, lam_max:float, job:Job) -> dict:
+    # solver modules load on first use, not with the page
+    from solvers.qre import LogitQRE
+    model = LogitQRE(game, lam_max=lam_max)
+    # lambda / (1 + lambda), the chart's x axis, measures progress
+    end = lam_max / (1.0 + lam_max)
+    job.partial = model
+
+    def on_point(lam, mix):
+        job.check()
+        job.progress(lam / (1.0 + lam) / end, f"lambda {lam:.3g}")
+    model.solve(on_point=on_point)
+    return dict(lambdas=np.array(model.lambdas), path=np.stack(model.path), state=model.get_state())
+
+
+def _render_qre_preview(game:NFG_Core, model):
+    # the path is appended after the lambdas
+    n = len(model.path)
+    if n > 0:
+        st.plotly_chart(_build_qre_figure(game, model.lambdas[:n], model.path[:n]), width='stretch')
+
+
+def solve_simpdiv(game:NFG_Core, precision:float, job:Job) -> dict:
+    from solvers.simpdiv import SimplicialSubdivision
+    model = SimplicialSubdivision(game, precision=precision)
+
+    def on_progress(mesh, pivots):
+        job.check()
+        # digits of precision reached so far
+        if model.regret < 1.0 and precision < 1.0:
+            job.progress(np.log(max(model.regret, precision)) / np.log(precision),
+                         f"mesh 1/{mesh}, regret {model.regret:.1e}")
+        else:
+            job.progress(0.0, f"mesh 1/{mesh}, {pivots} pivots")
+    return model.solve(on_progress=on_progress).get_state()
+
+
+@timed('ln._build_qre_figure')
+def _build_qre_figure(game:NFG_Core, lambdas, path):
+    import plotly.graph_objects as go
+    lambdas = np.asarray(lambdas)
+    path = np.asarray(path)
+    # lambda / (1 + lambda) maps the whole path [0, inf) onto [0, 1)
+    x = lambdas / (1.0 + lambdas)
+    fig = go.Figure()
+    col = 0
+    for pid in range(game.n_players):
+        for label in game.labels[pid]:
+            fig.add_trace(go.Scatter(
+                x=x, y=path[:, col], mode='lines', name=f"P{pid}: {label}"))
+            col += 1
+    fig.update_layout(
+        xaxis=dict(title='lambda / (1 + lambda)', range=[0, 1]),
+        yaxis=dict(title='Probability', range=[0, 1]),
+        margin=dict(l=40, r=20, t=20, b=40),
+    )
+    return fig
+
+
+@timed('ln._build_simplex_figure')
+def _build_simplex_figure(game:NFG_Core, model, pid:int, n_shown:int):
+    import plotly.graph_objects as go
+    # (T, Z, n) recorded mixes of player pid
+    traj = np.stack(model.trajectory[pid])[:, :n_shown]
+    labels = game.labels[pid]
+    n = game.n_strategies[pid]
+    fig = go.Figure()
+
+    if n == 2:
+        # 1-simplex: probability of the first strategy over time
+        for z in range(traj.shape[1]):
+            fig.add_trace(go.Scatter(
+                x=model.recorded_t, y=traj[:, z, 0], mode='lines',
+                name=f"start {z}", showlegend=False))
+        fig.update_layout(
+            xaxis=dict(title='Iteration'),
+            yaxis=dict(title=f"P({labels[0]})", range=[0, 1]))
+
+    elif n == 3:
+        for z in range(traj.shape[1]):
+            fig.add_trace(go.Scatterternary(
+                a=traj[:, z, 0], b=traj[:, z, 1], c=traj[:, z, 2],
+                mode='lines', name=f"start {z}", showlegend=False))
+        fig.add_trace(go.Scatterternary(
+            a=traj[-1, :, 0], b=traj[-1, :, 1], c=traj[-1, :, 2],
+            mode='markers', marker=dict(color='black', size=7), name='end'))
+        fig.update_layout(ternary=dict(
+            aaxis=dict(title=labels[0]),
+            baxis=dict(title=labels[1]),
+            caxis=dict(title=labels[2])))
+
+    else:
+        # project the simplex onto a regular polygon through its vertices
+        angles = np.pi / 2 + 2 * np.pi * np.arange(n) / n
+        vertices = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        outline = np.vstack([vertices, vertices[:1]])
+        fig.add_trace(go.Scatter(
+            x=outline[:, 0], y=outline[:, 1], mode='lines',
+            line=dict(color='gray'), hoverinfo='skip', showlegend=False))
+        fig.add_trace(go.Scatter(
+            x=vertices[:, 0] * 1.1, y=vertices[:, 1] * 1.1, mode='text',
+            text=labels, showlegend=False))
+        points = traj @ vertices
+        for z in range(points.shape[1]):
+            fig.add_trace(go.Scatter(
+                x=points[:, z, 0], y=points[:, z, 1], mode='lines',
+                name=f"start {z}", showlegend=False))
+        fig.add_trace(go.Scatter(
+            x=points[-1, :, 0], y=points[-1, :, 1],
+            mode='markers', marker=dict(color='black', size=7), name='end'))
+        fig.update_layout(
+            xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor='x'))
+
+    fig.update_layout(
+        title=f"Player {pid}",
+        margin=dict(l=40, r=20, t=40, b=40),
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+from typing import Callable, List
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+from core.symmetric import SymmetricNFG
+
+
+def random_profiles(game:NFG_Core, n_starts:int, seed=None) -> List[np.ndarray]:
+    """n_starts mixed profiles drawn uniformly from the product of simplices.
+    One array per player, shape (n_starts, n_strategies[p])."""
+    rng = np.random.default_rng(seed)
+    return [rng.dirichlet(np.ones(n), size=n_starts) for n in game.n_strategies]
+
+
+def payoff_scale(game:NFG_Core) -> np.ndarray:
+    """Payoff range per player (1 for constant payoffs), so step sizes
+    and temperatures don't depend on the units of the game."""
+    lo, hi = game.payoff_bounds()
+    scale = hi - lo
+    return np.where(scale > 0, scale, 1.0)
+
+
+class LearningDynamics:
+    """
+    Iterative learning rule run on a batch of starting profiles in lockstep.
+
+    x[p] has shape (Z, n_strategies[p]): row z is starting point z's current
+    mix of player p. Every update evaluates all deviation payoffs of the
+    still-running rows with one batched contraction per player.
+    Rows whose exploitability falls below eps are frozen (checked every
+    check_every updates); run() stops once every row is frozen.
+    """
+    name = ''
+    # True: symmetric games only
+    symmetric = False
+
+    def __init__(self, game:NFG_Core, initial:List[np.ndarray]=None, n_starts:int=16,
+                 seed=None, eps:float=1e-3, check_every:int=10, record_every:int=1):
+        self.game:NFG_Core = game
+        if initial is None:
+            initial = random_profiles(game, n_starts, seed)
+        self.x = [np.array(x, dtype=float) for x in initial]
+        self.n_starts:int = self.x[0].shape[0]
+        self.scale = payoff_scale(game)
+
+        self.eps:float = eps
+        self.check_every:int = max(1, check_every)
+        self.record_every:int = record_every
+
+        self.t:int = 0
+        # iteration at which each row converged (-1: still running)
+        self.converged_at = np.full(self.n_starts, -1)
+        self.exploit = game.exploitability(self.x, self._deviation_payoffs(self.x))
+        self.done:bool = False
+
+        # trajectory[p]: recorded (Z, n_strategies[p]) snapshots of player p
+        self.trajectory = [[x.copy()] for x in self.x] if record_every > 0 else None
+        self.recorded_t = [0] if record_every > 0 else None
+
+    def _deviation_payoffs(self, x:List[np.ndarray]) -> List[np.ndarray]:
+        return self.game.deviation_payoffs(x)
+
+    def step(self, x:List[np.ndarray], dev:List[np.ndarray]) -> List[np.ndarray]:
+        """New mixes of the running rows, given their deviation payoffs."""
+        raise NotImplementedError
+
+    def update(self):
+        if self.done:
+            return
+        running = self.converged_at < 0
+        x = [xp[running] for xp in self.x]
+        dev = self._deviation_payoffs(x)
+
+        if self.t % self.check_every == 0:
+            exploit = self.game.exploitability(x, dev)
+            self.exploit[running] = exploit
+            converged = exploit < self.eps
+            if np.any(converged):
+                rows = np.flatnonzero(running)[converged]
+                self.converged_at[rows] = self.t
+                keep = ~converged
+                x = [xp[keep] for xp in x]
+                dev = [u[keep] for u in dev]
+                running[rows] = False
+            if not np.any(running):
+                self.done = True
+                return
+
+        new_x = self.step(x, dev)
+        for p in range(self.game.n_players):
+            self.x[p][running] = new_x[p]
+        self.t += 1
+
+        if self.record_every > 0 and self.t % self.record_every == 0:
+            for p in range(self.game.n_players):
+                self.trajectory[p].append(self.x[p].copy())
+            self.recorded_t.append(self.t)
+
+    def run(self, max_iters:int=1000, on_update:Callable[["LearningDynamics"], None]=None) -> "LearningDynamics":
+        """on_update(self) after every update (e.g. progress; raising stops the run)."""
+        for _ in range(max_iters):
+            if self.done:
+                break
+            self.update()
+            if on_update is not None:
+                on_update(self)
+        # final exploitability of every row
+        self.exploit = self.game.exploitability(self.x, self._deviation_payoffs(self.x))
+        return self
+
+    def best(self) -> int:
+        """Row with the lowest exploitability."""
+        return int(np.argmin(self.exploit))
+
+    def get_state(self):
+        return {
+            'mix': self.x,
+            'exploitability': self.exploit,
+            'converged_at': self.converged_at,
+            't': self.t,
+            'done': self.done
+        }
+
+
+class FictitiousPlay(LearningDynamics):
+    """Discrete simultaneous fictitious play: x is each player's empirical
+    average play, everyone best-responds to the others' averages."""
+    name = 'Fictitious Play'
+
+    def step(self, x, dev):
+        out = []
+        for xp, u in zip(x, dev):
+            br = np.zeros_like(xp)
+            br[np.arange(len(xp)), u.argmax(axis=1)] = 1.0
+            # the initial mix counts as the first observation
+            out.append(xp + (br - xp) / (self.t + 2))
+        return out
+
+
+class ReplicatorDynamics(LearningDynamics):
+    """Euler steps of the replicator equation x' = x (u - x.u)."""
+    name = 'Replicator Dynamics'
+
+    def __init__(self, game:NFG_Core, step_size:float=0.1, **kwargs):
+        super().__init__(game, **kwargs)
+        self.step_size:float = step_size
+
+    def step(self, x, dev):
+        out = []
+        for p, (xp, u) in enumerate(zip(x, dev)):
+            avg = np.einsum('zs,zs->z', xp, u)[:, None]
+            xp = xp + self.step_size / self.scale[p] * xp * (u - avg)
+            # guard against leaving the simplex with large steps
+            xp = np.clip(xp, 0.0, None)
+            out.append(xp / xp.sum(axis=1, keepdims=True))
+        return out
+
+
+class SymmetricReplicator(ReplicatorDynamics):
+    """
+    Replicator dynamics of a single population in a symmetric game: every
+    player holds the same mix x and x' = x (u - x.u), with u the payoffs
+    against n - 1 copies of x. Finds symmetric equilibria. Payoffs come from
+    the game's count table (SymmetricNFG), once per step for all players.
+    initial: player 0's mixes are everyone's. ValueError for asymmetric games.
+    """
+    name = 'Symmetric Replicator'
+    symmetric = True
+
+    def __init__(self, game:NFG_Core, step_size:float=0.1, initial:List[np.ndarray]=None,
+                 n_starts:int=16, seed=None, **kwargs):
+        self.table_game:SymmetricNFG = game if isinstance(game, SymmetricNFG) else SymmetricNFG.from_dense(game)
+        if initial is None:
+            initial = [np.random.default_rng(seed).dirichlet(np.ones(game.n_strategies[0]), size=n_starts)]
+        initial = [initial[0]] * game.n_players
+        super().__init__(game, step_size=step_size, initial=initial, **kwargs)
+
+    def _deviation_payoffs(self, x):
+        u = self.table_game.symmetric_payoff_vecs(x[0])
+        return [u] * self.game.n_players
+
+    def step(self, x, dev):
+        return super().step(x[:1], dev[:1]) * self.game.n_players
+
+
+class SmoothedBestResponse(LearningDynamics):
+    """Move towards the logit (softmax) best response with a given temperature.
+    step_size None: 1/(t+2), i.e. smooth fictitious play."""
+    name = 'Smoothed Best Response'
+
+    def __init__(self, game:NFG_Core, temperature:float=0.05, step_size:float=None, **kwargs):
+        super().__init__(game, **kwargs)
+        self.temperature:float = temperature
+        self.step_size = step_size
+
+    def step(self, x, dev):
+        eta = self.step_size if self.step_size is not None else 1 / (self.t + 2)
+        out = []
+        for p, (xp, u) in enumerate(zip(x, dev)):
+            z = u / (self.temperature * self.scale[p])
+            z = np.exp(z - z.max(axis=1, keepdims=True))
+            sbr = z / z.sum(axis=1, keepdims=True)
+            out.append(xp + eta * (sbr - xp))
+        return out
+
+
+DYNAMICS = {
+    cls.name: cls for cls in (FictitiousPlay, ReplicatorDynamics, SymmetricReplicator, SmoothedBestResponse)
+}
+
+
+if __name__ == "__main__":
+    with open("data/learning/example_game_3p.json",'r') as f:
+        game = NFG_Core.load_from_json(f)
+
+    for cls in DYNAMICS.values():
+        if cls.symmetric:
+            continue
+        model = cls(game, n_starts=64, seed=0).run(max_iters=2000)
+        state = model.get_state()
+        i = model.best()
+        print(f"{cls.name}: t={state['t']}, converged={np.sum(state['converged_at'] >= 0)}/{model.n_starts}, "
+              f"best exploitability={state['exploitability'][i]:.4f}")
+        print([np.round(x[i], 3).tolist() for x in state['mix']])
@@ -0,0 +1,171 @@
+from __future__ import annotations
+from typing import Callable, List
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+
+class RegretMatching:
+    """
+    Regret matching (Hart & Mas-Colell) and regret matching+ for normal-form games.
+
+    Every iteration all players update simultaneously from one batched
+    evaluation of their deviation payoffs. Cumulative regrets are kept per
+    player; the average strategy is updated incrementally (uniform weights
+    for RM, linear weights for RM+), so it converges to a coarse correlated
+    equilibrium in general and to a Nash equilibrium in 2-player zero-sum games.
+
+    Runs can be saved with save_checkpoint() and resumed with load_checkpoint().
+    """
+    def __init__(self, game:NFG_Core, plus:bool=False, metrics_every:int=1000,
+                 on_metrics:Callable[[dict], None]=None):
+        self.game:NFG_Core = game
+        self.plus:bool = plus
+        self.metrics_every:int = max(1, metrics_every)
+        self.on_metrics = on_metrics
+
+        self.t:int = 0
+        # cumulative regret of each pure strategy, per player
+        self.regrets:List[np.ndarray] = [np.zeros(n) for n in game.n_strategies]
+        # weighted average of the played strategies
+        self.avg:List[np.ndarray] = [np.full(n, 1.0/n) for n in game.n_strategies]
+        self.weight_sum:float = 0.0
+        # emitted metrics, one dict per metrics_every iterations
+        self.metrics:List[dict] = []
+
+    def current_strategy(self) -> List[np.ndarray]:
+        """Play proportional to positive cumulative regret (uniform if none)."""
+        out = []
+        for r in self.regrets:
+            pos = np.maximum(r, 0.0)
+            total = pos.sum()
+            out.append(pos / total if total > 0 else np.full(len(r), 1.0/len(r)))
+        return out
+
+    def update(self):
+        x = self.current_strategy()
+        dev = self.game.deviation_payoffs([xp[None, :] for xp in x])
+        self.t += 1
+        weight = float(self.t) if self.plus else 1.0
+        self.weight_sum += weight
+        for p in range(self.game.n_players):
+            u = dev[p][0]
+            self.regrets[p] += u - x[p] @ u
+            if self.plus:
+                np.maximum(self.regrets[p], 0.0, out=self.regrets[p])
+            self.avg[p] += weight / self.weight_sum * (x[p] - self.avg[p])
+
+        if self.t % self.metrics_every == 0:
+            self.emit_metrics()
+
+    def emit_metrics(self) -> dict:
+        """Exploitability of the average strategy and the largest average regret.
+        Costs one deviation-payoff evaluation, independent of t."""
+        exploit = self.game.exploitability([a[None, :] for a in self.avg])[0]
+        metrics = {
+            't': self.t,
+            'exploitability': float(exploit),
+            'max_avg_regret': float(max(np.max(r) for r in self.regrets)) / max(self.t, 1),
+            'time': time.time(),
+        }
+        self.metrics.append(metrics)
+        if self.on_metrics is not None:
+            self.on_metrics(metrics)
+        return metrics
+
+    def run(self, n_iters:int, eps:float=0.0, checkpoint_path:str=None,
+            checkpoint_every:int=None) -> "RegretMatching":
+        """
+        Run n_iters more iterations. Stops early once the exploitability at a
+        metrics step falls below eps. With checkpoint_path, the state is saved
+        every checkpoint_every iterations and at the end.
+        """
+        last = self.t + n_iters
+        while self.t < last:
+            self.update()
+            if checkpoint_path is not None and checkpoint_every and self.t % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path)
+            if self.t % self.metrics_every == 0 and self.metrics[-1]['exploitability'] < eps:
+                break
+        if checkpoint_path is not None:
+            self.save_checkpoint(checkpoint_path)
+        return self
+
+    def get_state(self):
+        return {
+            'mix': self.avg,
+            'regrets': self.regrets,
+            't': self.t,
+            'metrics': self.metrics
+        }
+
+    # ---- checkpoints ----
+    def save_checkpoint(self, path:str):
+        """Atomically write the full state (a preempted write never corrupts the last checkpoint)."""
+        arrays = {}
+        for p in range(self.game.n_players):
+            arrays[f'regrets_{p}'] = self.regrets[p]
+            arrays[f'avg_{p}'] = self.avg[p]
+        meta = {
+            'game_hash': self.game.game_hash(),
+            'plus': self.plus,
+            't': self.t,
+            'weight_sum': self.weight_sum,
+            'metrics_every': self.metrics_every,
+            'metrics': self.metrics,
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load_checkpoint(cls, path:str, game:NFG_Core, on_metrics=None) -> "RegretMatching":
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['game_hash'] != game.game_hash():
+                raise ValueError(f"checkpoint {path} was written for a different game")
+            out = cls(game, plus=meta['plus'], metrics_every=meta['metrics_every'], on_metrics=on_metrics)
+            out.regrets = [data[f'regrets_{p}'].copy() for p in range(game.n_players)]
+            out.avg = [data[f'avg_{p}'].copy() for p in range(game.n_players)]
+        out.t = meta['t']
+        out.weight_sum = meta['weight_sum']
+        out.metrics = meta['metrics']
+        return out
+
+
+if __name__ == "__main__":
+    # long runs: python -m learning.regret game.json --iters 5000000 --checkpoint run.npz
+    # rerun the same command after a preemption to resume
+    parser = argparse.ArgumentParser(description='Regret matching on a normal-form game.')
+    parser.add_argument('game', nargs='?', default='data/learning/example_game_3p.json',
+                        help='game json (or a viz json holding one)')
+    parser.add_argument('--iters', type=int, default=100000, help='total iterations')
+    parser.add_argument('--plus', action='store_true', help='regret matching+')
+    parser.add_argument('--metrics-every', type=int, default=10000)
+    parser.add_argument('--eps', type=float, default=0.0, help='stop below this exploitability')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file (.npz), resumed if present')
+    parser.add_argument('--checkpoint-every', type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(args.game, 'r') as f:
+        data = json.load(f)
+    game = NFG_Core.from_dict(data.get('game', data))
+
+    def print_metrics(m):
+        print(f"t={m['t']:>10} exploitability={m['exploitability']:.6f} max avg regret={m['max_avg_regret']:.6f}")
+
+    if args.checkpoint is not None and os.path.exists(args.checkpoint):
+        model = RegretMatching.load_checkpoint(args.checkpoint, game, on_metrics=print_metrics)
+        print(f"resumed from {args.checkpoint} at t={model.t}")
+    else:
+        model = RegretMatching(game, plus=args.plus, metrics_every=args.metrics_every, on_metrics=print_metrics)
+
+    model.run(max(args.iters - model.t, 0), eps=args.eps,
+              checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every)
+    print([np.round(a, 4).tolist() for a in model.avg])
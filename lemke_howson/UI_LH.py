@@ -1,31 +1,32 @@
 from __future__ import annotations
+from typing import TYPE_CHECKING
 import streamlit as st
-import plotly.graph_objects as go
-from fractions import Fraction
 import numpy as np
 
+from core.game_cache import get_shared_cache
+from core.jobs import Job, background_result
 from core.normal_form_game import NFG_Core
-from lemke_howson.solver import LH_solver
-
-# temporary uid
-class uid:
-    id=0
-    @staticmethod       
-    def get():
-        uid.id += 1
-        return uid.id
-    
+from core.profiling import timed
+from core.session_store import SessionNamespace, session_namespace
+from core.tables import markdown_table
+from core.widget_keys import widget_key, cached_figure
+
+if TYPE_CHECKING:
+    from lemke_howson.solver import LH_solver
+
 def reset_session_state(load_if_exist=False):
     """Reset session states."""
     if not load_if_exist:
-        st.session_state.lh = {}
-    else:
-        if not hasattr(st.session_state, 'lh'):
-            st.session_state.lh = {}
+        st.session_state.lh = SessionNamespace('lh')
+    # memory-accounted session state (only figures are dropped when idle)
+    session_namespace('lh')
 
 def main():
     # set session states
     reset_session_state(load_if_exist=True)
+    if 'figs' not in st.session_state.lh:
+        # built figures by widget key, reused while their spec version is unchanged
+        st.session_state.lh['figs'] = {}
     
     # render title, description
     render_page_header()
@@ -37,6 +38,7 @@ def main():
     render_content()
     
 
+@timed('lh.render_page_header')
 def render_page_header():
     """Render title and description"""
     st.write("### Step-by-step Visualization of Lemke-Howson Algorithm")
@@ -46,6 +48,7 @@ def render_page_header():
             evolving mixed-strategy profile on the players' simplices until a Nash equilibrium is reached."""
         )
 
+@timed('lh.render_game_loader')
 def render_game_loader():
     game_file = st.file_uploader(
         label="Load Game", type='json',
@@ -59,7 +62,9 @@ def render_game_loader():
 
     # if game loaded -> load game to session
     if game_file is not None:
-        st.session_state.lh['game'] = NFG_Core.load_from_json(game_file)
+        # one shared read-only copy per distinct game across sessions
+        st.session_state.lh['game'] = get_shared_cache().intern_game(
+            NFG_Core.load_from_json(game_file))
         # For LH viz, game must be 2 player, max 3 actions each.
         game:NFG_Core = st.session_state.lh['game']
         if game.n_players != 2:
@@ -79,9 +84,83 @@ def render_game_loader():
     # if no game loaded -> load default game to session
     if game_file is None:
         default_game = "data/lh/example_game_LH.json"
-        with open(default_game) as f:
-            st.session_state.lh['game'] = NFG_Core.load_from_json(f)
+        _, st.session_state.lh['game'] = get_shared_cache().load_json_file(default_game)
+
+@timed('lh.render_zero_sum_note')
+def render_zero_sum_note(game:NFG_Core):
+    """Constant-sum games are solved directly by one LP (minimax)."""
+    total = game.constant_sum()
+    if total is None:
+        return
+    # solver modules load on first use, not with the page
+    from solvers.zero_sum import ZeroSumSolver
+    try:
+        model = get_shared_cache().get_or_compute(
+            game.game_hash(), 'zero_sum', lambda: ZeroSumSolver(game).solve(), persist=True)
+    except ValueError as e:
+        # the LP ran out of pivots: no minimax strategies to show
+        st.warning(f"The minimax linear program was not solved: {e}")
+        return
+    kind = 'zero-sum' if game.is_zero_sum() else f'constant-sum ({total:g})'
+    mix = [[round(float(p),3) for p in model.mix[pid]] for pid in range(2)]
+    st.info(
+        f"This game is {kind}, so its minimax strategies solve a single linear program:  \n"+
+        f"value ${[round(float(v),3) for v in model.value]}$, strategies ${mix}$ "+
+        f"({model.lp.n_pivots} simplex pivots).  \n"+
+        "Every Nash equilibrium of a constant-sum game has this value."
+    )
 
+@timed('lh.render_symmetric_note')
+def render_symmetric_note(game:NFG_Core):
+    """Symmetric games: their symmetric equilibria solve the k x k symmetric LCP."""
+    # solver modules load on first use, not with the page
+    from core.symmetric import is_symmetric
+    from lemke_howson.solver import label_names, symmetric_lh_equilibria
+    cache = get_shared_cache()
+    if not cache.get_or_compute(game.game_hash(), 'symmetric', lambda: is_symmetric(game)):
+        return
+    found = cache.get_or_compute(
+        game.game_hash(), 'symmetric_lh', lambda: symmetric_lh_equilibria(game), persist=True)
+    k = game.n_strategies[0]
+    names = label_names(game)
+    st.info(
+        f"This game is symmetric, so its symmetric equilibria $(x, x)$ solve one {k}x{k} "+
+        f"complementarity problem instead of the {2*k}x{2*k} one of both players:  \n"+
+        '  \n'.join(
+            f"${[round(float(p),3) for p in eq['mix'][0]]}$ (from {', '.join(names[i] for i in eq['labels'])})"
+            for eq in found
+        )
+    )
+
+@timed('lh.render_equilibria')
+def render_equilibria(game:NFG_Core):
+    """Every equilibrium LH reaches from some starting label (stored across sessions and restarts)."""
+    from lemke_howson.solver import label_names
+    found = get_shared_cache().get(game.game_hash(), 'lh_equilibria', persist=True)
+    if found is None:
+        # one LH run per label: large games take a while, the page stays usable meanwhile
+        found = background_result(
+            st.session_state.lh, 'lh_equilibria', game.game_hash(), 'lh_equilibria',
+            lambda job: _enumerate_equilibria(game, job), persist=True, label='Enumerating equilibria')
+        if found is None:
+            return
+    names = label_names(game)
+    with st.expander(f"Equilibria reached from the {len(names)} starting labels: {len(found)}"):
+        st.markdown(markdown_table([
+            {**{f"P{pid}": ', '.join(f"{p:.3g}" for p in eq['mix'][pid]) for pid in range(2)},
+             'starting labels': ', '.join(names[i] for i in eq['labels'])}
+            for eq in found
+        ]))
+
+def _enumerate_equilibria(game:NFG_Core, job:Job):
+    from lemke_howson.solver import lh_equilibria
+
+    def on_label(done, total, found):
+        job.check()
+        job.progress(done / total, f"{done}/{total} labels, {len(found)} equilibria")
+    return lh_equilibria(game, on_label=on_label)
+
+@timed('lh.render_content')
 def render_content():
     # Here is the payoff mat of the game {title}. 
     # PAYOFF MAT
@@ -90,8 +169,12 @@ def render_content():
         f"Below is the payoff matrix for the game [{game.title}]."
     )
     render_payoff_matrix()
+    render_zero_sum_note(game)
+    render_symmetric_note(game)
+    render_equilibria(game)
 
     # init LH solver model
+    from lemke_howson.solver import LH_solver
     game = st.session_state.lh['game']
     model = LH_solver(game=game)
 
@@ -100,7 +183,7 @@ def render_content():
         "The Lemke-Howson algorithm begins at the origin, a point where both players assign probability 0 to all pure strategies.   "+
         "Geometrically, this corresponds to the corner in each player's strategy diagram."
     )
-    _render_diagram(model)
+    _render_diagram(model, step=0)
 
     # initial LCP
     st.write(
@@ -115,21 +198,29 @@ def render_content():
         "This determines the first pivot of the Lemke-Howson path."
     )
 
-    options = model.get_init_options()
+    # labels by index: both players may use the same strategy names
+    names = model.label_names()
     selected_option = st.selectbox(
         "How would you like to start algorithm",
-        options,
+        range(len(names)),
+        format_func=names.__getitem__,
         index=None,
         placeholder="Select an action"
     )
 
     # if an option is selected, roll out full algorithm
     if selected_option is not None:
-        info = model.update(initial=selected_option, log_info=True)
+        # the pivot sequence only depends on (game, start): shared across sessions
+        trace = get_shared_cache().get_or_compute(
+            game.game_hash(), 'lh_trace',
+            lambda: LH_solver(game=game).run_trace(selected_option, max_steps=31),
+            key=selected_option, persist=True
+        )
+        info, model = trace[0]
 
         # ?? is selected, so x? must enter. 
         st.write(
-            f"You selected ${selected_option}$, so the corresponding variable ${info['enter_var']}$ must enter the basis."
+            f"You selected {names[selected_option]}, so the corresponding variable ${info['enter_var']}$ must enter the basis."
         )
         # clashes and min ratio test
         if len(info['clashes']) == 1:
@@ -177,12 +268,12 @@ def render_content():
         st.write(
             "This point corresponds to the following location in the strategy diagram:"
         )
-        _render_diagram(model)
+        _render_diagram(model, step=1, start=selected_option)
 
-        for _ in range(30):
+        for step in range(2, 32):
             # IF NOT DONE
             if not info['done']:
-                info = model.update(log_info=True)
+                info, model = trace[step-1]
                               
                 st.write(
                     f"The basis is missing label ${info['enter_var']}$, so it must enter in the next pivot."
@@ -221,7 +312,7 @@ def render_content():
                 st.write(
                     "This pivot moves us to the next point in the diagram:"
                 )
-                _render_diagram(model)
+                _render_diagram(model, step=step, start=selected_option)
 
             # IF DONE
             else:
@@ -237,6 +328,7 @@ def render_content():
         # render if needed after LH is done
 
 
+@timed('lh._render_LCP')
 def _render_LCP(model: LH_solver):
     # issue: convert float coef to fraction 
     """
@@ -248,6 +340,8 @@ def _render_LCP(model: LH_solver):
     -C[LHS]*VAR[LHS] = C[~LHS]*VAR[~LHS]
     """
     # helper ----
+    from fractions import Fraction
+
     def float_to_tex(val):
         if val == 0: return ""
         
@@ -298,9 +392,11 @@ def _render_LCP(model: LH_solver):
     
     st.latex(out)
 
-def _render_diagram(model:LH_solver):
+@timed('lh._render_diagram')
+def _render_diagram(model:LH_solver, step:int, start:int=None):
     """
     plot diagram for player 0 and 1, side by side.
+    (start label index, step) identify the pivot, so figures and keys are stable across reruns.
     
     For each plot:
     if n_strategies <= 2: 2D plot
@@ -318,6 +414,9 @@ def _render_diagram(model:LH_solver):
             can be caculated given player's mix and opponent's u_mat.
 
     """
+    import plotly.graph_objects as go
+    from fractions import Fraction
+
     # helper
     def _get_annotation(pid, mix, labels, u_mat):
         """
@@ -355,99 +454,117 @@ def _render_diagram(model:LH_solver):
 
     # -----------------------------
 
-    figs = [
-        go.Figure(),
-        go.Figure()
-    ]
-    for pid in range(2):
-        na = model.game.n_strategies[pid]
-        mix = model.mix[pid]
-        labels = model.game.labels[pid]
-        fig = figs[pid]
-
-        # 2D or 3D
-        if na <= 2: # 2D
-            # plot dot
-            fig.add_trace(
-                go.Scatter(
-                    x=mix[0:1], y=mix[1:2],
-                    mode='markers',
-                    marker=dict(size=10),
-                    name="Mixed Strategy",
-                    showlegend=False
+    def build_figs():
+        figs = [
+            go.Figure(),
+            go.Figure()
+        ]
+        for pid in range(2):
+            na = model.game.n_strategies[pid]
+            mix = model.mix[pid]
+            labels = model.game.labels[pid]
+            fig = figs[pid]
+
+            # 2D or 3D
+            if na <= 2: # 2D
+                # plot dot
+                fig.add_trace(
+                    go.Scatter(
+                        x=mix[0:1], y=mix[1:2],
+                        mode='markers',
+                        marker=dict(size=10),
+                        name="Mixed Strategy",
+                        showlegend=False
+                    )
                 )
-            )
-            # plot triangle
-            fig.add_trace(
-                go.Scatter(
-                    x=[0,0,1,0], y=[0,1,0,0],
-                    mode="lines", line=dict(color="black", width=2),
-                    showlegend=False
+                # plot triangle
+                fig.add_trace(
+                    go.Scatter(
+                        x=[0,0,1,0], y=[0,1,0,0],
+                        mode="lines", line=dict(color="black", width=2),
+                        showlegend=False
+                    )
                 )
-            )
-            # label axes
-            fig.update_xaxes(
-                title=labels[0],
-                range=[-.05,1.05],
-                zeroline=True, zerolinecolor='black', zerolinewidth=1, 
-            )
-            fig.update_yaxes(
-                title=labels[1],
-                range=[-.05,1.05],
-                zeroline=True, zerolinecolor='black', zerolinewidth=1, 
-            )
-            # add annotation
-            fig.add_annotation(
-                x=mix[0], y=mix[1],
-                text=_get_annotation(
-                    pid, mix, model.game.labels,model.game.u_mat)
-            )
-        elif na == 3: # 3D
-            # plot dot + annotation
-            fig.add_trace(
-                go.Scatter3d(
-                    x=mix[0:1], y=mix[1:2], z=mix[2:3],
-                    mode='markers+text',
-                    marker=dict(size=4),
+                # label axes
+                fig.update_xaxes(
+                    title=labels[0],
+                    range=[-.05,1.05],
+                    zeroline=True, zerolinecolor='black', zerolinewidth=1, 
+                )
+                fig.update_yaxes(
+                    title=labels[1],
+                    range=[-.05,1.05],
+                    zeroline=True, zerolinecolor='black', zerolinewidth=1, 
+                )
+                # add annotation
+                fig.add_annotation(
+                    x=mix[0], y=mix[1],
                     text=_get_annotation(
-                        pid, mix, model.game.labels,model.game.u_mat),
-                    textposition="top center",
-                    name="Mixed Strategy",
-                    showlegend=False
+                        pid, mix, model.game.labels,model.game.u_mat)
+                )
+            elif na == 3: # 3D
+                # plot dot + annotation
+                fig.add_trace(
+                    go.Scatter3d(
+                        x=mix[0:1], y=mix[1:2], z=mix[2:3],
+                        mode='markers+text',
+                        marker=dict(size=4),
+                        text=_get_annotation(
+                            pid, mix, model.game.labels,model.game.u_mat),
+                        textposition="top center",
+                        name="Mixed Strategy",
+                        showlegend=False
+                    )
+                )
+                # plot xyz
+                line_range = [0,1] 
+                fig.add_trace(go.Scatter3d(x=[0, 0], y=line_range, z=[0, 0],
+                                        mode="lines", line=dict(color="black", width=2),
+                                        showlegend=False))
+                fig.add_trace(go.Scatter3d(x=line_range, y=[0, 0], z=[0, 0],
+                                        mode="lines", line=dict(color="black", width=2),
+                                        showlegend=False)) 
+                fig.add_trace(go.Scatter3d(x=[0, 0], y=[0, 0], z=line_range,
+                                        mode="lines", line=dict(color="black", width=2),
+                                        showlegend=False)) 
+
+                # label axes
+                graphic_config = dict(showgrid=False, ticks="outside", showticklabels=True, zeroline=False)
+                fig.update_scenes(    
+                    xaxis=dict(**graphic_config, title=labels[0]),
+                    yaxis=dict(**graphic_config, title=labels[1]),
+                    zaxis=dict(**graphic_config, title=labels[2]),
                 )
-            )
-            # plot xyz
-            line_range = [0,1] 
-            fig.add_trace(go.Scatter3d(x=[0, 0], y=line_range, z=[0, 0],
-                                    mode="lines", line=dict(color="black", width=2),
-                                    showlegend=False))
-            fig.add_trace(go.Scatter3d(x=line_range, y=[0, 0], z=[0, 0],
-                                    mode="lines", line=dict(color="black", width=2),
-                                    showlegend=False)) 
-            fig.add_trace(go.Scatter3d(x=[0, 0], y=[0, 0], z=line_range,
-                                    mode="lines", line=dict(color="black", width=2),
-                                    showlegend=False)) 
-
-            # label axes
-            graphic_config = dict(showgrid=False, ticks="outside", showticklabels=True, zeroline=False)
-            fig.update_scenes(    
-                xaxis=dict(**graphic_config, title=labels[0]),
-                yaxis=dict(**graphic_config, title=labels[1]),
-                zaxis=dict(**graphic_config, title=labels[2]),
-            )
 
-        else:
-            # above 3D - skip
-            continue
+            else:
+                # above 3D - skip
+                continue
+        return figs
+
+    game_hash = model.game.game_hash()
+    keys = [widget_key(game_hash,'diagram',start,step,pid) for pid in range(2)]
+    # the pivot sequence is fixed by (game, start), so figures never go stale
+    figs = cached_figure(st.session_state.lh['figs'], keys[0], (start, step), build_figs)
 
     # render
     with st.container(horizontal=True):
-        st.plotly_chart(figs[0], width='stretch',key=uid.get())
-        st.plotly_chart(figs[1], width='stretch',key=uid.get())
+        st.plotly_chart(figs[0], width='stretch',key=keys[0])
+        st.plotly_chart(figs[1], width='stretch',key=keys[1])
 
+@timed('lh.render_payoff_matrix')
 def render_payoff_matrix():
     game:NFG_Core = st.session_state.lh['game']
-    
+    key = widget_key(game.game_hash(),'payoff_matrix')
+    fig = cached_figure(
+        st.session_state.lh['figs'], key, game.game_hash(),
+        lambda: _build_payoff_matrix_figure(game)
+    )
+    st.plotly_chart(fig, width='stretch', key=key)
+
+
+@timed('lh._build_payoff_matrix_figure')
+def _build_payoff_matrix_figure(game:NFG_Core):
+    import plotly.graph_objects as go
     # mat[col][row], as in plotly
     mat = []
     for a1 in range(game.n_strategies[1]):
@@ -486,7 +603,7 @@ def render_payoff_matrix():
         autosize=False
     )
 
-    st.plotly_chart(fig, width='stretch', key=uid.get())
+    return fig
 
 
 if __name__ == "__main__":
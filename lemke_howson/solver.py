@@ -1,12 +1,25 @@
 from __future__ import annotations
+import copy
+from typing import List
 
 import numpy as np
 
 from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.symmetric import is_symmetric
 
 class LH_solver:
-    def __init__(self, game:NFG_Core):
+    """
+    Lemke-Howson on the LCP of a bimatrix game, one pivot per update().
+    lexicographic: break ties of the minimum-ratio test lexicographically
+    (constants, then the initial slacks' columns), so paths on degenerate
+    games cannot cycle. Off by default: the page teaches the plain test.
+    """
+    def __init__(self, game:NFG_Core, lexicographic:bool=False):
+        if game.n_players != 2:
+            raise ValueError(f"LH needs a 2-player game, got {game.n_players} players")
         self.game: NFG_Core = game
+        self.lexicographic:bool = lexicographic
         
         # lcp
         m = sum(game.n_strategies)
@@ -20,6 +33,8 @@ class LH_solver:
             np.zeros(self.game.n_strategies[1])
         ]
         self.a = np.zeros(2)
+        # column of the var that left the basis in the last pivot
+        self.last_left = None
 
         self.done = False
 
@@ -65,6 +80,11 @@ class LH_solver:
         options = self.game.labels[0] + self.game.labels[1]
         return options
 
+    def label_names(self) -> List[str]:
+        """Display name of each label index (get_init_options, with the player
+        appended to names both players use, e.g. 's0 (P1)')."""
+        return label_names(self.game)
+
     def get_state(self):
         return {
             'coef': self.c,
@@ -74,6 +94,7 @@ class LH_solver:
             'done':self.done
         }
 
+    @timed('lh.pivot')
     def update(self, initial=None, log_info=False):
         
         # 1. pick/find entering var (what to enter)
@@ -89,27 +110,37 @@ class LH_solver:
         if not self.done:
             na0, na1 = self.game.n_strategies
 
-            # pick / find enter var
-            enter_var = None
+            # pick / find enter var (column in self.c)
+            # initial: a label index (0..na0+na1-1, player 0's first) or, for old callers,
+            # a label name (its first occurrence: ambiguous when both players share names)
+            enter_col = None
             options = self.get_init_options()
             try:
-                enter_var = options.index(initial)
+                if isinstance(initial, (int, np.integer)):
+                    if not 0 <= initial < na0+na1:
+                        raise IndexError(f"label index {initial} out of range ({na0+na1} labels)")
+                    enter_col = 1+na0+na1+int(initial)
+                else:
+                    enter_col = 1+na0+na1+options.index(initial)
             except ValueError:
-                # find entering var
-                LHS_id = (self.LHS - 1) % (na0+na1)
-                for i in range(na0+na1):
-                    if i not in LHS_id:
-                        enter_var = i
-                        break
+                # complementary pivoting: the complement of the var that just left enters
+                # (x_i left -> r_i enters, r_i left -> x_i enters)
+                if self.last_left is None:
+                    enter_col = 1+na0+na1
+                elif self.last_left >= 1+na0+na1:
+                    enter_col = self.last_left - (na0+na1)
+                else:
+                    enter_col = self.last_left + (na0+na1)
             
-            # print(f"enter var = {enter_var}")
+            # print(f"enter var = {enter_col}")
 
             # find leaving slack variable
             clashes = []
             for i in range(na0+na1):
                 # if enter var has nonzero coef -> means it exists in RHS
-                if self.c[i,1+na0+na1+enter_var] != 0:
+                if self.c[i,enter_col] != 0:
                     clashes.append(i)
+            if log_info: clash_names = [self._var_id2name(self.LHS[i]) for i in clashes]
 
             # print(f"clash={clashes}")
             
@@ -118,8 +149,12 @@ class LH_solver:
             ratio = np.inf
             leave_var = None
             for i in clashes:
-                q = self.c[i,1+na0+na1+enter_var]
+                q = self.c[i,enter_col]
                 cst = self.c[i,0]
+                # only rows where the entering var decreases the basic var bound it
+                if q >= 0:
+                    if log_info: ratios.append(np.inf)
+                    continue
                 r = np.abs(cst/q) # ratio is the opposite of what is written in slide p.12
                 if r < ratio:
                     ratio = r
@@ -128,11 +163,24 @@ class LH_solver:
                 if log_info: ratios.append(r)
 
             # print(f"leave var = {leave_var}")
+            if self.lexicographic and leave_var is not None:
+                # ties: smallest (constant, -initial slack coefficients) / |q|, i.e.
+                # the rows of (B^-1 q, B^-1) scaled by the pivot, compared lexicographically
+                bounding = [i for i in clashes if self.c[i,enter_col] < 0]
+                keys = np.column_stack([self.c[bounding,0], -self.c[bounding,1:1+na0+na1]])
+                keys /= -self.c[bounding,enter_col][:,None]
+                leave_var = bounding[np.lexsort(keys.T[::-1])[0]]
+
+            if leave_var is None:
+                # nothing bounds the entering var (the tableau assumes positive payoffs)
+                raise ValueError(f"no leaving variable for {self._var_id2name(enter_col)}: "
+                                 "Lemke-Howson needs positive payoffs")
             
-            # leave leave_var, enter enter_var
-            q = -self.c[leave_var,1+na0+na1+enter_var]
+            # leave leave_var, enter enter_col
+            q = -self.c[leave_var,enter_col]
             self.c[leave_var] /= q
-            self.LHS[leave_var] = 1+na0+na1+enter_var
+            self.last_left = self.LHS[leave_var]
+            self.LHS[leave_var] = enter_col
             
             # print(f"q = {q}")
             # print(self.c[leave_var])
@@ -142,12 +190,19 @@ class LH_solver:
                 if row == leave_var:
                     continue
 
-                q = self.c[row,1+na0+na1+enter_var]
+                q = self.c[row,enter_col]
                 self.c[row] += self.c[leave_var]*q
 
                 # print(f"row={row}")
                 # print(self.c[row])
 
+            if self.lexicographic:
+                # snap the pivot's roundoff to exact zeros, else a basis revisited along
+                # the path can carry different near-zero entries and break ties differently
+                rows = self.c[clashes]
+                rows[np.abs(rows) < 1e-12] = 0
+                self.c[clashes] = rows
+
             # find 'a'
             c_p0 = np.zeros(na0)
             c_p1 = np.zeros(na1)
@@ -177,16 +232,15 @@ class LH_solver:
 
             # all var found in lhs and mix is not 0: done
             LHS_id = (self.LHS - 1) % (na0+na1)
-            if np.sum(np.arange(na0+na1) - LHS_id) == 0:
+            if np.array_equal(np.sort(LHS_id), np.arange(na0+na1)):
                 if np.any(self.mix[0] > 0) and np.any(self.mix[1] > 0):
                     self.done = True
 
         if log_info:
             info = dict(
-                enter_var=self._var_id2name(1+na0+na1+enter_var),
-                leave_var=self._var_id2name(1+leave_var),
-                clashes=', '.join([
-                    self._var_id2name(1+c) for c in clashes]),
+                enter_var=self._var_id2name(enter_col),
+                leave_var=self._var_id2name(self.last_left),
+                clashes=', '.join(clash_names),
                 ratio=', '.join(
                     [f"{r:.3f}" for r in ratios]
                 ),
@@ -199,6 +253,132 @@ class LH_solver:
 
     def _var_id2name(self,var_id):
         return self.var_names[var_id]
+
+    def snapshot(self) -> "LH_solver":
+        """Copy of the current pivot state (tableau, basis, mix), sharing the game."""
+        out = copy.copy(self)
+        out.c = self.c.copy()
+        out.LHS = self.LHS.copy()
+        out.mix = [m.copy() for m in self.mix]
+        out.a = self.a.copy()
+        return out
+
+    def run_trace(self, initial, max_steps:int=30):
+        """
+        Run from the current state, starting by introducing `initial` (a label index).
+        Returns [(info, snapshot)] for every pivot, until done or max_steps pivots.
+        """
+        trace = []
+        info = self.update(initial=initial, log_info=True)
+        trace.append((info, self.snapshot()))
+        while not info['done'] and len(trace) < max_steps:
+            info = self.update(log_info=True)
+            trace.append((info, self.snapshot()))
+        return trace
+
+
+def label_names(game:NFG_Core) -> List[str]:
+    """
+    Display names of LH's labels 0..n0+n1-1 (player 0's strategies, then
+    player 1's). Generated and example games often reuse one name list for
+    both players: shared names get the player appended, e.g. 's0 (P1)'.
+    """
+    names = [list(game.labels[0]), list(game.labels[1])]
+    shared = set(names[0]) & set(names[1])
+    return [f"{name} (P{pid})" if name in shared else name
+            for pid in range(2) for name in names[pid]]
+
+def lh_equilibria(game:NFG_Core, max_pivots:int=10000, on_label=None):
+    """
+    Equilibria reached by LH from every starting label, duplicates merged:
+    [{'mix': [x0, x1], 'labels': [indices of the starting labels reaching it]}]
+    (label_names(game) names the indices).
+    Labels whose path fails (no leaving variable) or runs past max_pivots are left out.
+    on_label(done, total, found) between labels (raising stops the enumeration).
+    ValueError unless the game has 2 players.
+    """
+    if game.n_players != 2:
+        raise ValueError(f"LH needs a 2-player game, got {game.n_players} players")
+    found = []
+    n_labels = sum(game.n_strategies)
+    for label in range(n_labels):
+        if on_label is not None and label > 0:
+            on_label(label, n_labels, found)
+        model = LH_solver(game)
+        try:
+            model.update(initial=label)
+            pivots = 1
+            while not model.done and pivots < max_pivots:
+                model.update()
+                pivots += 1
+        except ValueError:
+            continue
+        if not model.done:
+            continue
+        for eq in found:
+            if all(np.allclose(a, b, atol=1e-9) for a, b in zip(eq['mix'], model.mix)):
+                eq['labels'].append(label)
+                break
+        else:
+            found.append({'mix': [m.copy() for m in model.mix], 'labels': [label]})
+    return found
+
+def symmetric_lh(game:NFG_Core, label:int=0, max_pivots:int=10000):
+    """
+    A symmetric equilibrium (x, x) of a symmetric 2-player game, by
+    complementary pivoting on the symmetric LCP
+        r = 1 - A z >= 0,  z >= 0,  z.r = 0,  z != 0,    x = z / sum(z)
+    with A = u_mat[0] shifted to positive payoffs: one k x k system, where
+    LH_solver pivots on the 2k x 2k one of both players. Starts by raising
+    z[label]; the path ends when label's r or z leaves the basis.
+    Returns x, or None if the path runs past max_pivots.
+    ValueError if the game is not a symmetric 2-player game.
+    """
+    if game.n_players != 2 or not is_symmetric(game):
+        raise ValueError("symmetric LH needs a symmetric 2-player game")
+    k = game.n_strategies[0]
+    A = np.asarray(game.u_mat[0], dtype=float)
+    A = A - A.min() + 1.0
+    # tableau of r + A z = 1: columns r (0..k-1), z (k..2k-1), constants
+    T = np.hstack([np.eye(k), A, np.ones((k, 1))])
+    basis = np.arange(k)
+    enter = k + label
+    for _ in range(max_pivots):
+        col = T[:, enter]
+        rows = np.flatnonzero(col > 1e-12)
+        if len(rows) == 0:
+            raise ValueError(f"no leaving variable for label {label}")
+        # lexicographic minimum ratio (constants, then the basis inverse): no cycling
+        ratios = T[rows][:, [2 * k] + list(range(k))] / col[rows, None]
+        row = rows[np.lexsort(ratios.T[::-1])[0]]
+        T[row] /= T[row, enter]
+        T -= np.outer(T[:, enter], T[row]) * (np.arange(k) != row)[:, None]
+        left, basis[row] = basis[row], enter
+        if left % k == label:
+            z = np.zeros(k)
+            in_z = basis >= k
+            z[basis[in_z] - k] = T[in_z, 2 * k]
+            return z / z.sum()
+        # the complement of the variable that left enters
+        enter = left + k if left < k else left - k
+    return None
+
+
+def symmetric_lh_equilibria(game:NFG_Core, max_pivots:int=10000):
+    """symmetric_lh from every label, duplicates merged, in lh_equilibria's form:
+    [{'mix': [x, x], 'labels': [indices of the starting labels reaching it]}]."""
+    found = []
+    for label in range(game.n_strategies[0]):
+        x = symmetric_lh(game, label, max_pivots)
+        if x is None:
+            continue
+        for eq in found:
+            if np.allclose(eq['mix'][0], x, atol=1e-9):
+                eq['labels'].append(label)
+                break
+        else:
+            found.append({'mix': [x, x.copy()], 'labels': [label]})
+    return found
 # from fractions import Fraction
 
 # def _render_LCP_foo(model: LH_solver):
@@ -284,11 +464,10 @@ if __name__ == "__main__":
     state = model.get_state()
     print(state)
 
-    options = model.get_init_options()
+    options = model.label_names()
     print(f"options: {options}")
-    i = int(input("select: "))
-    selected = options[i]
-    print(f"selected {selected}")
+    selected = int(input("select: "))
+    print(f"selected {options[selected]}")
 
     model.update(initial=selected)
     state = model.get_state()
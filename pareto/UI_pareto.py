@@ -1,28 +1,35 @@
 from __future__ import annotations
 import streamlit as st
-import plotly.graph_objects as go
 import json
 
+from core.fragments import rerun_dependents
+from core.game_cache import get_shared_cache
 from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.session_store import session_namespace
+from core.tables import markdown_table
+from core.widget_keys import content_id, widget_key, cached_figure
 from pareto.viz_components import ParetoViz, MixedStrategyProfile
 
-# temporary uid
-class uid:
-    id=0
-    @staticmethod       
-    def get():
-        uid.id += 1
-        return uid.id
+# fragment key -> viz state it reads.
+# callbacks rerun only the fragments reading what they changed;
+# uploaders and tables only rerun with the full page.
+FRAGMENT_DEPS = {
+    'pr_chart': {'structure', 'visibility'},
+    'pr_legend': {'structure'},
+    'pr_edit': {'structure'},
+}
 
 def main():
-    if not hasattr(st.session_state,'pr'):
-        st.session_state.pr = {}
+    # memory-accounted session state, may be spilled to disk while idle
+    session_namespace('pr', restorers={'viz': restore_viz})
     if 'tmp' not in st.session_state.pr:
         st.session_state.pr['tmp'] = {}
+    if 'figs' not in st.session_state.pr:
+        # built figures by widget key, reused while their spec version is unchanged
+        st.session_state.pr['figs'] = {}
     # render headers, load game and viz
     render_page_header() 
-    game: NFG_Core = st.session_state.pr['game']
-    viz: ParetoViz = st.session_state.pr['viz']
 
     render_game_header()
 
@@ -32,9 +39,16 @@ def main():
     with table_tab:
         render_table()
 
-    render_editor_tabs(viz,game)
+    render_editor_tabs()
+
 
+def restore_viz(data:dict) -> ParetoViz:
+    # rebuild a spilled viz around the shared game
+    game = get_shared_cache().intern_game(NFG_Core.from_dict(data['game']))
+    return ParetoViz.from_dict(data, game=game)
 
+
+@timed('pr.render_page_header')
 def render_page_header():
     # render title description, savefileloader gametitle
     st.write("### Utility vs Strategy Profiles Chart")
@@ -45,6 +59,7 @@ def render_page_header():
     )
     render_file_uploaders()
 
+@timed('pr.render_game_header')
 def render_game_header():
     # render game title, save viz button
     with st.container(horizontal=True):
@@ -54,19 +69,42 @@ def render_game_header():
         #     viz:ParetoViz = st.session_state.pr['viz']
         #     viz.sav
 
+        st.button(
+            'Add Correlated Eq.', on_click=add_correlated_cb,
+            help='Add the correlated equilibrium maximizing the sum of utilities',
+            key='pr_add_ce_btn',
+            # the CE linear program needs the full payoff tensor
+            disabled=not st.session_state.pr['game'].can_materialize()
+        )
+        # deferred: the viz is edited inside fragments after this renders
         st.download_button(
             label='Download Viz',
-            data=st.session_state.pr['viz'].to_json(),
+            data=st.session_state.pr['viz'].to_json,
             file_name=f'viz2_{st.session_state.pr['viz'].game.title}.json',
             mime="text/json",
             icon=":material/download:"
         )
                   
+def add_correlated_cb():
+    # solver modules load on first use, not with the page
+    from solvers.correlated import CESolver
+    viz:ParetoViz = st.session_state.pr['viz']
+    # depends on the game only: shared across sessions
+    try:
+        model = get_shared_cache().get_or_compute(
+            viz.game.game_hash(), 'ce_welfare', lambda: CESolver(viz.game).solve(), persist=True)
+    except ValueError as e:
+        st.toast(f"Correlated equilibrium not found: {e}")
+        return
+    viz.add_correlated(model.joint, label='Welfare-max Correlated Eq.')
+
+@timed('pr.render_file_uploaders')
 def render_file_uploaders():
     # render viz file uploader
     def del_session_viz():
         st.session_state.pr.pop('viz')
         st.session_state.pr.pop('game')
+        st.session_state.pr['figs'] = {}
     # if in session -> session load
     # if no session, has file -> load file
     # if no session, no file --> default file
@@ -75,15 +113,23 @@ def render_file_uploaders():
     
     if 'viz' in st.session_state.pr:
         return
+    # games are shared read-only across sessions, the viz itself is per session
+    cache = get_shared_cache()
     if viz_file is not None:
-        st.session_state.pr['viz'] = ParetoViz.load_from_json(viz_file)
-        st.session_state.pr['game'] = st.session_state.pr['viz'].game
+        data = json.load(viz_file)
+        game = cache.intern_game(NFG_Core.from_dict(data['game']))
     else:
-        with open("data/pr/viz2_Prisoner's Dilemma.json") as f:
-            st.session_state.pr['viz'] = ParetoViz.load_from_json(f)
-        st.session_state.pr['game'] = st.session_state.pr['viz'].game
+        data, game = cache.load_json_file("data/pr/viz2_Prisoner's Dilemma.json")
+    viz = ParetoViz.from_dict(data, game=game)
+    if viz_file is not None:
+        # a re-uploaded download must not take over the live viz's widget keys
+        viz.viz_id = content_id(data)
+    st.session_state.pr['viz'] = viz
+    st.session_state.pr['game'] = viz.game
 
 
+@st.fragment(key='pr_chart')
+@timed('pr.render_plot')
 def render_plot():
     viz: ParetoViz = st.session_state.pr['viz']
     msps = [] # mixed strategy profiles
@@ -97,6 +143,21 @@ def render_plot():
             st.write("No strategies to plot yet.")
         return
 
+    # rebuild only when structure or visibility changed
+    spec_version = (viz.version, tuple(msp.visible for msp in msps))
+    key = widget_key(viz.viz_id,'plot')
+    fig = cached_figure(
+        st.session_state.pr['figs'], key, spec_version,
+        lambda: _build_plot_figure(viz, u_mat, msps)
+    )
+
+    with st.container():
+        st.plotly_chart(fig, width='stretch', key=key)
+
+
+@timed('pr._build_plot_figure')
+def _build_plot_figure(viz:ParetoViz, u_mat, msps):
+    import plotly.graph_objects as go
     # build x axis
     x_values = list(range(viz.game.n_players))
     x_labels = [f'P{i}' for i in x_values]
@@ -135,39 +196,49 @@ def render_plot():
         )
     )
 
-    with st.container():
-        st.plotly_chart(fig, width='stretch')
+    return fig
 
     
+@timed('pr.render_table')
 def render_table():
     game:NFG_Core = st.session_state.pr['game']
 
     if game.n_players == 2:
         for pid in range(game.n_players):
             st.write(f"**Player {pid}'s utility**")
-            st.table(game.u_mat[pid])
+            st.markdown(markdown_table([
+                {'': row_label, **dict(zip(game.labels[1], map(float, row)))}
+                for row_label, row in zip(game.labels[0], game.u_mat[pid])
+            ]))
 
     else:
         st.write("Utility Matrix is only supported for 2 player games")
 
-def render_editor_tabs(viz:ParetoViz, game:NFG_Core):
+@timed('pr.render_editor_tabs')
+def render_editor_tabs():
     # tabs: Legend, Edit Pi, Edit P-i
     tab_legend, tab_edit = st.tabs(
         ('Legend', 'Edit Strategy Profiles')
     )
+    # fragments read the viz from session state on every rerun: it may have
+    # been spilled and restored as a new object since the last full run
     with tab_legend:
-        render_legend_tab(viz)
+        render_legend_tab()
     with tab_edit:
-        render_edit_oppo_tab(viz,game)
+        render_edit_oppo_tab()
 
 
-def render_legend_tab(viz:ParetoViz):
+@st.fragment(key='pr_legend')
+@timed('pr.render_legend_tab')
+def render_legend_tab():
+    viz:ParetoViz = st.session_state.pr['viz']
 
     def toggle_s_po_cb(spid:int):
         viz:ParetoViz = st.session_state.pr['viz']
         current_vis = viz.get_msps()[spid].visible
         viz.set_visible(spid,not current_vis)
-        # reload UI?
+        # the toggle already shows the new state: redraw the chart only
+        rerun_dependents(FRAGMENT_DEPS, ['visibility'])
 
     with st.container(height=250):
         st.write('Mixed Strategy Profiles')
@@ -183,9 +254,13 @@ def render_legend_tab(viz:ParetoViz):
             st.toggle(
                 label=f"{sp.label}", # removed icon
                 value=sp.visible, on_change=toggle_s_po_cb,args=(spid,),
-                key=uid.get())
+                key=widget_key(viz.viz_id,'toggle',viz.version,spid))
 
-def render_edit_oppo_tab(viz:ParetoViz, game:NFG_Core):
+@st.fragment(key='pr_edit')
+@timed('pr.render_edit_oppo_tab')
+def render_edit_oppo_tab():
+    viz:ParetoViz = st.session_state.pr['viz']
+    game:NFG_Core = viz.game
     # callbacks
     def btn_add_cb(msp:MixedStrategyProfile):
         viz:ParetoViz = st.session_state.pr['viz']
@@ -193,6 +268,7 @@ def render_edit_oppo_tab(viz:ParetoViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.pr['tmp'].pop('msp')
         st.session_state['pr_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_mod_cb(spid:int, msp:MixedStrategyProfile):
         viz:ParetoViz = st.session_state.pr['viz']
@@ -200,6 +276,7 @@ def render_edit_oppo_tab(viz:ParetoViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.pr['tmp'].pop('msp')
         st.session_state['pr_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_del_cb(spid:int):
         viz:ParetoViz = st.session_state.pr['viz']
@@ -207,6 +284,7 @@ def render_edit_oppo_tab(viz:ParetoViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.pr['tmp'].pop('msp')
         st.session_state['pr_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def del_ses_msp():
         st.session_state.pr['tmp'].pop('msp')
@@ -252,10 +330,10 @@ def render_edit_oppo_tab(viz:ParetoViz, game:NFG_Core):
             
             # buttons
             if option == 'Add_new':
-                st.button('Add',on_click=btn_add_cb,args=(msp,),key=uid.get())
+                st.button('Add',on_click=btn_add_cb,args=(msp,),key=widget_key(viz.viz_id,'add'))
             else:
-                st.button('Modify',on_click=btn_mod_cb,args=(spid,msp),key=uid.get())
-                st.button('Delete',on_click=btn_del_cb,args=(spid,),key=uid.get())   
+                st.button('Modify',on_click=btn_mod_cb,args=(spid,msp),key=widget_key(viz.viz_id,'mod'))
+                st.button('Delete',on_click=btn_del_cb,args=(spid,),key=widget_key(viz.viz_id,'del'))   
         
         # Mixed Strategies in the profile
         # list all supports for each mixed strategy
@@ -2,7 +2,10 @@ from __future__ import annotations
 from typing import Dict, List
 import random
 import json
+import numpy as np
 from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.widget_keys import content_id
 
 class PureStrategy:
     def __init__(self,pid,sid,visible,icon,label):
@@ -115,6 +118,9 @@ class MixedStrategyProfile:
         self.visible:bool = True
         self.icon:str = ''
         self.label:str = 'New Mixed Strategy Profile -i'
+        # optional correlated distribution over pure profiles (e.g. a correlated equilibrium).
+        # mixed_strats then hold its marginals
+        self.joint:np.ndarray = None
 
         if game is not None:
             self._fill_mixed_strats(game)
@@ -123,6 +129,15 @@ class MixedStrategyProfile:
         for ms in self.mixed_strats:
             ms._normalize()
 
+    def _joint_matches(self) -> bool:
+        """Whether mixed_strats are still the marginals of joint (not edited since)."""
+        n = self.joint.ndim
+        for ms in self.mixed_strats:
+            marginal = self.joint.sum(axis=tuple(q for q in range(n) if q != ms.pid))
+            if not np.allclose(marginal, ms.ratios, atol=1e-6):
+                return False
+        return True
+
     def _fill_mixed_strats(self, game:NFG_Core):
         for player in range(game.n_players):
             self.mixed_strats.append(
@@ -130,12 +145,15 @@ class MixedStrategyProfile:
             )
     
     def to_dict(self) -> Dict:
-        return {
+        out = {
             'mixed_strats':[ms.to_dict() for ms in self.mixed_strats],
             'visible':self.visible,
             'icon':self.icon,
             'label':self.label
         }
+        if self.joint is not None:
+            out['joint'] = self.joint.tolist()
+        return out
     
     @classmethod
     def from_dict(cls, data:dict) -> "MixedStrategyProfile":
@@ -144,31 +162,56 @@ class MixedStrategyProfile:
         out.visible = bool(data['visible'])
         out.icon = data['icon']
         out.label = data['label']
+        if data.get('joint') is not None:
+            out.joint = np.array(data['joint'], dtype=float)
         return out
     
 
 class ParetoViz:
     def __init__(self, game:NFG_Core):
         self.game:NFG_Core = game
+        # identity for widget keys, and structure version (bumped on add/modify/delete)
+        self.viz_id:str = game.game_hash()[:12]
+        self.version:int = 0
         # mixed strategy profiles. each profile includes every player
         self.msps: List[MixedStrategyProfile] = []
         # utility matrice: u[msprofile][player]
         self.u_mat:List[List[float]] = []
 
     
+    def _sprofile_utils(self,sprofile:MixedStrategyProfile):
+        pids = set([ms.pid for ms in sprofile.mixed_strats])
+        if sprofile.joint is not None:
+            # correlated: expectation over the joint distribution
+            return [float((sprofile.joint * self.game.u_mat[player]).sum()) for player in pids]
+        return [
+            self.game.get_util(player, sprofile.mixed_strats)
+            for player in pids
+        ]
+
+    @timed('pr.viz.add_sprofile')
     def _add_sprofile(self,sprofile:MixedStrategyProfile):
+        self.version += 1
         pids = set([ms.pid for ms in sprofile.mixed_strats])
         if len(pids) == self.game.n_players:
             sprofile._normalize()
             self.msps.append(sprofile)
-            self.u_mat.append(
-                [
-                    self.game.get_util(player, sprofile.mixed_strats)
-                    for player in pids
-                ]
-            )
+            self.u_mat.append(self._sprofile_utils(sprofile))
+
+    @timed('pr.viz.add_correlated')
+    def add_correlated(self,joint:np.ndarray,label:str='Correlated Equilibrium'):
+        """Add a distribution over pure profiles (shape n_strategies) as one profile."""
+        msp = MixedStrategyProfile(game=self.game)
+        msp.label = label
+        msp.joint = np.asarray(joint, dtype=float)
+        n = msp.joint.ndim
+        for ms in msp.mixed_strats:
+            ms.ratios = msp.joint.sum(axis=tuple(q for q in range(n) if q != ms.pid)).tolist()
+        self._add_sprofile(msp)
 
+    @timed('pr.viz.modify_sprofile')
     def _modify_sprofile(self,index:int,sprofile:MixedStrategyProfile):
+        self.version += 1
         # validity check - index in range, sprofile includes all players except player i
         # replace opponents strategy profile at self.oppo_sps[index]
         # update self.u_mat[index][:]
@@ -176,13 +219,15 @@ class ParetoViz:
         if len(pids) == self.game.n_players:
             if len(self.msps) > index and index >= 0:
                 sprofile._normalize()
+                # edited marginals: no longer the correlated distribution
+                if sprofile.joint is not None and not sprofile._joint_matches():
+                    sprofile.joint = None
                 self.msps[index] = sprofile
-                self.u_mat[index] = [
-                    self.game.get_util(player,sprofile.mixed_strats)
-                    for player in pids
-                ]
+                self.u_mat[index] = self._sprofile_utils(sprofile)
 
+    @timed('pr.viz.delete_sprofile')
     def _delete_sprofile(self,index:int):
+        self.version += 1
         # validity check - index in range
         # delete opponent strategy profile at self.oppo_sps[index]
         # delete opponent sp visiblity at self.oppo_viz[index]
@@ -191,11 +236,13 @@ class ParetoViz:
             self.msps.pop(index)
             self.u_mat.pop(index)
         
+    @timed('pr.viz.reset_viz')
     def reset_viz(self):
         # initialize to default visualization
         # the game is given
         
         # random sample 3 pure strategy profiles
+        self.version += 1
         self.msps = []
         self.u_mat = []
         for _ in range(3):
@@ -217,22 +264,27 @@ class ParetoViz:
         return json.dumps(self.to_dict())
 
     def to_dict(self) -> dict:
-        print(self)
-        print(self.msps)
         return {
             'game':self.game.to_dict(),
             'msps':[
                 msp.to_dict() for msp in self.msps
             ],
-            'u_mat':self.u_mat
+            'u_mat':self.u_mat,
+            # widget keys of a spilled and restored viz stay the same
+            'viz_id':self.viz_id,
+            'version':self.version
         }
     
     @classmethod
-    def from_dict(cls, data:dict) -> "ParetoViz":
+    def from_dict(cls, data:dict, game:NFG_Core=None) -> "ParetoViz":
+        # game: already parsed (e.g. shared) game of data['game']
         out = cls(
-            game=NFG_Core.from_dict(data['game']))
+            game=NFG_Core.from_dict(data['game']) if game is None else game)
         out.msps = [MixedStrategyProfile.from_dict(msp) for msp in data['msps']]
         out.u_mat = data['u_mat']
+        # viz files from before viz_id was saved: id from their content
+        out.viz_id = data['viz_id'] if 'viz_id' in data else content_id(data)
+        out.version = int(data.get('version', 0))
         return out
 
     @staticmethod
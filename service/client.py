@@ -0,0 +1,42 @@
+"""
+Client of the solver service (service/server.py), standard library only:
+
+    for line in solve(games, 'qre', lam_max=1e4):
+        print(line['index'], line.get('result', line.get('error')))
+"""
+from __future__ import annotations
+from typing import Iterator, List
+from urllib.parse import urlencode
+import json
+import urllib.request
+
+from core.normal_form_game import NFG_Core
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+
+
+def solve(games:List[NFG_Core], solver:str, url:str=DEFAULT_URL, timeout:float=None, **params) -> Iterator[dict]:
+    """Result lines of games (binary upload), as the service finishes them."""
+    request = urllib.request.Request(
+        f"{url}/solve?{urlencode(dict(solver=solver, **params))}",
+        data=b''.join(game.to_bytes() for game in games),
+        headers={'Content-Type': 'application/octet-stream'}, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get(path:str, url:str=DEFAULT_URL, timeout:float=None) -> dict:
+    """GET /health or /solvers."""
+    with urllib.request.urlopen(f"{url}{path}", timeout=timeout) as response:
+        return json.load(response)
+
+
+if __name__ == "__main__":
+    from core.generators import generate
+
+    games = generate('uniform', [3, 3], 20, seed=0) + generate('uniform', [3, 3], 5, seed=0)
+    for line in solve(games, 'lh_equilibria'):
+        print(line['index'], line.get('coalesced'), len(line.get('result', [])), line.get('error', ''))
+    print(get('/health'))
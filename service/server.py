@@ -0,0 +1,264 @@
+"""
+Local HTTP solver service, for tools that want the solvers without Streamlit:
+
+    python -m service.server [--port 8765] [--workers 4]
+
+    POST /solve?solver=qre&lam_max=1e6     body: games, response: JSON Lines
+    GET  /solvers                           solver names and default parameters
+    GET  /health                            counters
+
+Request bodies, by Content-Type:
+    application/json           one NFG_Core.to_dict() (or a viz file holding one), or a list
+    application/x-ndjson       one of them per line
+    application/octet-stream   NFG_Core.to_bytes() outputs, concatenated
+The response streams one line per game as soon as it is solved (in
+completion order): {"index", "game_hash", "solver", "result", "seconds",
+"coalesced"}, or {"index", "error"}.
+
+Solves run in a process pool (service/tasks.py); large games reach the
+workers through shared memory (core/shared_game.py). Identical requests in
+flight at the same time (game hash, solver, parameters) share one solve.
+Small games are queued for up to batch_window seconds and solved
+batch_max at a time in one worker call, so a burst of tiny games costs a
+few round trips to the pool instead of one each. Serves 127.0.0.1 only
+by default; there is no authentication.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from core.normal_form_game import NFG_Core
+from core.result_store import config_key
+from core.shared_game import SharedGames
+from service import tasks
+
+DEFAULT_PORT = int(os.environ.get('GTV_SERVICE_PORT', 8765))
+# largest accepted request body
+MAX_BODY_BYTES = int(os.environ.get('GTV_SERVICE_MAX_BODY_BYTES', 256 * 2**20))
+# games with at most this many payoff entries (float64) are micro-batched
+SMALL_GAME_SIZE = 4096
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            411: 'Length Required', 413: 'Payload Too Large'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status:int, message:str):
+        super().__init__(message)
+        self.status:int = status
+
+
+class SolverService:
+    def __init__(self, workers:int=None, batch_window:float=0.005, batch_max:int=32,
+                 small_size:int=SMALL_GAME_SIZE):
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.batch_window:float = batch_window
+        self.batch_max:int = batch_max
+        self.small_size:int = small_size
+        # payoffs of the large games being solved, mapped by the workers
+        self.shared = SharedGames()
+        # (game_hash, solver, params) -> future of the solve in flight
+        self.inflight:Dict[Tuple[str, str, str], asyncio.Future] = {}
+        # small solves waiting for their batch: (task, future)
+        self.queue:List[Tuple[tuple, asyncio.Future]] = []
+        self._flush_handle:asyncio.TimerHandle = None
+        self.counters:Dict[str, int] = dict(
+            requests=0, games=0, coalesced=0, batches=0, batched_games=0, single_games=0, errors=0)
+        self.started:float = time.time()
+
+    # ---- solving ----
+    async def solve(self, game:NFG_Core, solver:str, params:dict) -> dict:
+        """Solve one game, sharing the solve with identical requests in flight."""
+        key = (game.game_hash(), solver, config_key(params))
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+            return dict(await asyncio.shield(future), coalesced=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            if game.payoff_nbytes() <= 8 * self.small_size:
+                self._enqueue((solver, params, game.to_bytes()), future)
+            else:
+                self.counters['single_games'] += 1
+                try:
+                    with self.shared.lease(game) as handle:
+                        future.set_result(await asyncio.get_running_loop().run_in_executor(
+                            self.pool, tasks.run, solver, params, handle))
+                except Exception as e:
+                    future.set_exception(e)
+            return dict(await asyncio.shield(future), coalesced=False)
+        finally:
+            del self.inflight[key]
+
+    def _enqueue(self, task:tuple, future:asyncio.Future):
+        self.queue.append((task, future))
+        if len(self.queue) >= self.batch_max:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self.queue = self.queue, []
+        if len(batch) > 0:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch:List[Tuple[tuple, asyncio.Future]]):
+        self.counters['batches'] += 1
+        self.counters['batched_games'] += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.pool, tasks.run_batch, [task for task, _ in batch])
+        except Exception as e:
+            # e.g. a worker died: every game of the batch fails
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    # ---- HTTP ----
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        try:
+            method, path, headers = await _read_head(reader)
+            url = urlsplit(path)
+            if url.path == '/solve':
+                if method != 'POST':
+                    raise HTTPError(405, 'POST games to /solve')
+                query = dict(parse_qsl(url.query))
+                solver = query.pop('solver', None)
+                if solver is None:
+                    raise HTTPError(400, f"missing solver= (one of {', '.join(tasks.SOLVERS)})")
+                try:
+                    params = tasks.parse_params(solver, query)
+                except ValueError as e:
+                    raise HTTPError(400, str(e))
+                games = _parse_games(await _read_body(reader, headers), headers.get('content-type', ''))
+                await self._stream_solves(writer, games, solver, params)
+            elif url.path == '/solvers' and method == 'GET':
+                await _respond_json(writer, 200, {name: defaults for name, (_, defaults) in tasks.SOLVERS.items()})
+            elif url.path == '/health' and method == 'GET':
+                await _respond_json(writer, 200, dict(
+                    self.counters, inflight=len(self.inflight), uptime=time.time() - self.started))
+            else:
+                raise HTTPError(404, f"no route {method} {url.path}")
+        except HTTPError as e:
+            await _respond_json(writer, e.status, {'error': str(e)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream_solves(self, writer:asyncio.StreamWriter, games:List[NFG_Core], solver:str, params:dict):
+        self.counters['requests'] += 1
+        self.counters['games'] += len(games)
+
+        async def solve(index:int, game:NFG_Core) -> dict:
+            try:
+                out = await self.solve(game, solver, params)
+            except Exception as e:
+                out = {'error': f"{type(e).__name__}: {e}"}
+            if 'error' in out:
+                self.counters['errors'] += 1
+                return {'index': index, 'game_hash': game.game_hash(), 'error': out['error']}
+            return {'index': index, 'game_hash': game.game_hash(), 'solver': solver, **out}
+
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n'
+                     b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+        for done in asyncio.as_completed([solve(i, g) for i, g in enumerate(games)]):
+            line = (json.dumps(await done) + '\n').encode()
+            writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+
+async def _read_head(reader:asyncio.StreamReader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, 'request head too long')
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, path, headers
+
+
+async def _read_body(reader:asyncio.StreamReader, headers:Dict[str, str]) -> bytes:
+    if 'content-length' not in headers:
+        raise HTTPError(411, 'Content-Length required')
+    try:
+        n = int(headers['content-length'])
+    except ValueError:
+        raise HTTPError(400, f"bad Content-Length {headers['content-length']!r}")
+    if n < 0:
+        raise HTTPError(400, f"bad Content-Length {n}")
+    if n > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body over {MAX_BODY_BYTES} bytes")
+    return await reader.readexactly(n)
+
+
+def _parse_games(body:bytes, content_type:str) -> List[NFG_Core]:
+    try:
+        if content_type.startswith('application/octet-stream'):
+            return list(NFG_Core.iter_bytes(body))
+        if content_type.startswith('application/x-ndjson'):
+            data = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            data = json.loads(body)
+            data = data if isinstance(data, list) else [data]
+        # game json, or a viz json holding one
+        return [NFG_Core.from_dict(d.get('game', d)) for d in data]
+    except (ValueError, KeyError, TypeError, AssertionError) as e:
+        raise HTTPError(400, f"unreadable games: {type(e).__name__}: {e}")
+
+
+async def _respond_json(writer:asyncio.StreamWriter, status:int, data):
+    body = json.dumps(data).encode()
+    writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+
+async def serve(host:str='127.0.0.1', port:int=DEFAULT_PORT, **kwargs):
+    service = SolverService(**kwargs)
+    server = await asyncio.start_server(service.handle, host, port, limit=2**16)
+    print(f"solver service on http://{host}:{port} ({service.pool._max_workers} workers)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.pool.shutdown(cancel_futures=True)
+        service.shared.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local HTTP solver service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--batch-window', type=float, default=0.005, help='seconds small games wait for a batch')
+    parser.add_argument('--batch-max', type=int, default=32, help='small games per worker call')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers,
+                          batch_window=args.batch_window, batch_max=args.batch_max))
+    except KeyboardInterrupt:
+        pass
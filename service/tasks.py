@@ -0,0 +1,101 @@
+"""
+Solves of the HTTP service (service/server.py), run in its worker processes.
+Plain data in and out: games arrive as NFG_Core.to_bytes() or as shared
+memory handles, results leave as JSON-ready dicts.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import time
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+from core.shared_game import SharedGameHandle, attach
+
+
+# solver modules load on first use, not with the worker
+def _lh_equilibria(game:NFG_Core, max_pivots:int):
+    from lemke_howson.solver import lh_equilibria
+    return lh_equilibria(game, max_pivots=max_pivots)
+
+def _symmetric_lh(game:NFG_Core, max_pivots:int):
+    from lemke_howson.solver import symmetric_lh_equilibria
+    return symmetric_lh_equilibria(game, max_pivots=max_pivots)
+
+def _zero_sum(game:NFG_Core):
+    from solvers.zero_sum import ZeroSumSolver
+    state = ZeroSumSolver(game).solve().get_state()
+    return {'mix': state['mix'], 'value': state['value']}
+
+def _ce_welfare(game:NFG_Core):
+    from solvers.correlated import CESolver
+    state = CESolver(game).solve().get_state()
+    return {k: state[k] for k in ('mix', 'utils', 'welfare', 'done')}
+
+def _qre(game:NFG_Core, lam_max:float):
+    from solvers.qre import LogitQRE
+    return LogitQRE(game, lam_max=lam_max).solve(record=False).get_state()
+
+def _simpdiv(game:NFG_Core, precision:float):
+    from solvers.simpdiv import SimplicialSubdivision
+    return SimplicialSubdivision(game, precision=precision).solve().get_state()
+
+
+# name -> (solve(game, **params), default params; query strings are cast to their types)
+SOLVERS:Dict[str, Tuple[Callable[..., Any], Dict[str, Any]]] = {
+    'lh_equilibria': (_lh_equilibria, dict(max_pivots=10000)),
+    'symmetric_lh': (_symmetric_lh, dict(max_pivots=10000)),
+    'zero_sum': (_zero_sum, {}),
+    'ce_welfare': (_ce_welfare, {}),
+    'qre': (_qre, dict(lam_max=1e6)),
+    'simpdiv': (_simpdiv, dict(precision=1e-8)),
+}
+
+
+def parse_params(solver:str, query:Dict[str, str]) -> Dict[str, Any]:
+    """Solver parameters from query strings, defaults filled in. ValueError on unknown names."""
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver {solver!r} (one of {', '.join(SOLVERS)})")
+    params = dict(SOLVERS[solver][1])
+    for name, text in query.items():
+        if name not in params:
+            raise ValueError(f"{solver} takes no parameter {name!r}")
+        params[name] = type(params[name])(float(text))
+    return params
+
+
+def jsonable(value):
+    """numpy arrays and scalars (and containers of them) as builtins."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, float) and not np.isfinite(value):
+        # json has no inf / nan
+        return str(value)
+    return value
+
+
+def run(solver:str, params:Dict[str, Any], game:bytes | SharedGameHandle) -> dict:
+    """
+    {'result': ..., 'seconds': ...}, or {'error': ...} when the solve fails.
+    game: NFG_Core.to_bytes(), or the handle of a game in shared memory (large games).
+    Any exception becomes this game's error: in run_batch one bad game must
+    not fail the others of its batch.
+    """
+    start = time.perf_counter()
+    try:
+        game = attach(game) if isinstance(game, SharedGameHandle) else NFG_Core.from_bytes(game)
+        result = SOLVERS[solver][0](game, **params)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+    return {'result': jsonable(result), 'seconds': time.perf_counter() - start}
+
+
+def run_batch(tasks:List[Tuple[str, Dict[str, Any], bytes]]) -> List[dict]:
+    """run() over many small games in one worker call (one round trip to the pool)."""
+    return [run(*task) for task in tasks]
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+from solvers.simplex import DenseSimplex
+
+
+class IncentiveConstraints:
+    """
+    Correlated-equilibrium incentive constraints  A x <= 0  over the flattened
+    joint distribution x (C order of u_mat[p]), without materializing A.
+
+    One block per player p and strategy pair (s, t), s != t: the expected gain
+    of playing t when recommended s,
+        sum_{a: a_p = s} x(a) (u_p(t, a_-p) - u_p(s, a_-p)).
+    With U_p = u_mat[p] as an (n_p, M) matrix (player p's strategy x the
+    opponents' profiles), every product with A or A^T is a few matmuls per
+    player. Rows are ordered by player, then s, then t.
+    """
+    def __init__(self, game:NFG_Core):
+        self.game:NFG_Core = game
+        self.N:int = int(np.prod(game.n_strategies))
+        profile_ids = np.arange(self.N).reshape(game.n_strategies)
+
+        # per player: U_p (n, M), flat profile id of each (s, k), and its inverse
+        self.U = []
+        self.ids = []
+        self.strat_of = []
+        self.oppo_of = []
+        # row -> (player, s, t)
+        rows = []
+        for p, n in enumerate(game.n_strategies):
+            self.U.append(np.moveaxis(game.u_mat[p], p, 0).reshape(n, -1))
+            ids = np.moveaxis(profile_ids, p, 0).reshape(n, -1)
+            self.ids.append(ids)
+            strat_of = np.empty(self.N, dtype=int)
+            oppo_of = np.empty(self.N, dtype=int)
+            strat_of[ids] = np.arange(n)[:, None]
+            oppo_of[ids] = np.arange(ids.shape[1])[None, :]
+            self.strat_of.append(strat_of)
+            self.oppo_of.append(oppo_of)
+            s, t = np.nonzero(~np.eye(n, dtype=bool))
+            rows.append(np.stack([np.full(len(s), p), s, t], axis=1))
+        self.rows = np.concatenate(rows, axis=0)
+        self.R:int = len(self.rows)
+        # first row of each player's block
+        self.offsets = np.concatenate([[0], np.cumsum([n * (n - 1) for n in game.n_strategies])])
+
+    def gains(self, x:np.ndarray) -> np.ndarray:
+        """A x: expected gain of every deviation (s -> t) under joint x, shape (R,)."""
+        out = []
+        for p, U in enumerate(self.U):
+            # V[s, t] = sum_k x(s, k) U(t, k)
+            V = x[self.ids[p]] @ U.T
+            gain = V - np.diag(V)[:, None]
+            out.append(gain[~np.eye(len(U), dtype=bool)])
+        return np.concatenate(out)
+
+    def transpose_dot(self, y:np.ndarray) -> np.ndarray:
+        """A^T y, shape (N,)."""
+        out = np.zeros(self.N)
+        for p, U in enumerate(self.U):
+            n = len(U)
+            Y = np.zeros((n, n))
+            Y[~np.eye(n, dtype=bool)] = y[self.offsets[p]:self.offsets[p + 1]]
+            # (A^T y)(s, k) = sum_t Y[s, t] (U(t, k) - U(s, k))
+            out[self.ids[p]] += Y @ U - Y.sum(axis=1)[:, None] * U
+        return out
+
+    def submatrix(self, rows:np.ndarray, cols:np.ndarray) -> np.ndarray:
+        """Dense A[rows][:, cols]."""
+        out = np.zeros((len(rows), len(cols)))
+        for p, U in enumerate(self.U):
+            mask = self.rows[rows, 0] == p
+            if not np.any(mask):
+                continue
+            s = self.rows[rows[mask], 1][:, None]
+            t = self.rows[rows[mask], 2][:, None]
+            k = self.oppo_of[p][cols][None, :]
+            recommended = self.strat_of[p][cols][None, :] == s
+            out[mask] = np.where(recommended, U[t, k] - U[s, k], 0.0)
+        return out
+
+    def dense(self) -> np.ndarray:
+        """The full (R, N) matrix, for small games."""
+        return self.submatrix(np.arange(self.R), np.arange(self.N))
+
+
+class CESolver:
+    """
+    Welfare-maximizing correlated equilibrium by one LP on the in-project simplex.
+
+    max  w.x   s.t.  A x <= 0 (incentives),  1.x <= 1,  x >= 0
+    with w the social welfare shifted to be positive, so the optimum puts all
+    mass on the distribution (1.x = 1). weights: per-player welfare weights.
+
+    A has sum_p n_p (n_p - 1) rows and one column per pure profile, too large
+    for a dense tableau on big games. The simplex runs on working sets of rows
+    and columns instead: after each solve, every constraint is checked and
+    every column priced against the duals (a few matmuls), the most violated
+    rows and most improving columns join the working sets, until none is left.
+    Each round continues from the previous round's basis (DenseSimplex warm
+    start): new rows by dual pivots, then new columns by primal pivots, so a
+    round costs the pivots its additions need instead of a whole solve.
+    """
+    def __init__(self, game:NFG_Core, weights=None, batch:int=200):
+        self.game:NFG_Core = game
+        self.weights = np.ones(game.n_players) if weights is None else np.asarray(weights, dtype=float)
+        # rows / columns added per round
+        self.batch:int = batch
+
+        welfare = np.tensordot(self.weights, game.u_mat, axes=([0], [0])).ravel()
+        self.shift:float = float(welfare.min()) - 1.0
+        self.c = welfare - self.shift
+        self.constraints = IncentiveConstraints(game)
+
+        self.lp:DenseSimplex = None
+        self.n_pivots:int = 0
+        self.n_rounds:int = 0
+
+        # joint distribution over pure profiles, shape n_strategies
+        self.joint = np.zeros(game.n_strategies)
+        # expected utility of each player under joint
+        self.utils = np.zeros(game.n_players)
+        self.welfare:float = 0.0
+        self.done = False
+
+    def solve(self) -> "CESolver":
+        A, N = self.constraints, self.constraints.N
+        tol = 1e-9 * max(1.0, float(np.abs(self.c).max()))
+        rows = np.zeros(0, dtype=int)
+        dropped = np.zeros(A.R, dtype=bool)
+        # start from the highest-welfare profiles, constrained by the total mass row 1.x <= 1
+        # (LP constraint 0, working incentive rows after it)
+        cols = np.argsort(-self.c)[:min(N, self.batch)]
+        # almost every b_i is 0: perturb the ratio test against degenerate pivots
+        self.lp = DenseSimplex(self.c[cols], np.ones((1, len(cols))), np.ones(1), perturb=1e-7)
+        while True:
+            self._solve_lp()
+            self.n_rounds += 1
+
+            x = np.zeros(N)
+            x[cols] = self.lp.primal()
+            dual = self.lp.dual()
+            y = np.zeros(A.R)
+            y[rows] = dual[1:]
+
+            # violated constraints and improving columns of the full LP
+            gains = A.gains(x)
+            gains[rows] = -np.inf
+            reduced = self.c - A.transpose_dot(y) - dual[0]
+            reduced[cols] = -np.inf
+            new_rows = self._top(gains, tol)
+            new_cols = self._top(reduced, tol)
+            if len(new_rows) == 0 and len(new_cols) == 0:
+                break
+            # keep the working set small: constraints whose slack is basic don't support
+            # the current optimum and leave it (each at most once, so the loop terminates)
+            slack = self.lp.basic_slacks()[1:] & ~dropped[rows]
+            dropped[rows[slack]] = True
+            self.lp.drop_rows(1 + np.flatnonzero(slack))
+            rows = rows[~slack]
+            # the next LP starts from this basis: new rows by dual pivots, then new columns
+            if len(new_rows) > 0:
+                self.lp.add_rows(A.submatrix(new_rows, cols), np.zeros(len(new_rows)))
+                rows = np.concatenate([rows, new_rows])
+            if len(new_cols) > 0:
+                self._solve_lp()
+                self.lp.add_columns(self.c[new_cols], np.vstack([
+                    np.ones((1, len(new_cols))), A.submatrix(rows, new_cols)]))
+                cols = np.concatenate([cols, new_cols])
+
+        x /= x.sum()
+        self.joint = x.reshape(self.game.n_strategies)
+        self.utils = np.array([float((self.joint * u).sum()) for u in self.game.u_mat])
+        self.welfare = float(self.weights @ self.utils)
+        self.done = True
+        return self
+
+    def _solve_lp(self):
+        before = self.lp.n_pivots
+        self.lp.solve()
+        self.n_pivots += self.lp.n_pivots - before
+        if self.lp.status != 'optimal':
+            raise ValueError(f"correlated equilibrium LP stopped after {self.lp.n_pivots} pivots ({self.lp.status})")
+
+    def _top(self, values:np.ndarray, tol:float) -> np.ndarray:
+        """Indices of the (at most batch) largest values above tol."""
+        candidates = np.flatnonzero(values > tol)
+        if len(candidates) > self.batch:
+            candidates = candidates[np.argpartition(-values[candidates], self.batch)[:self.batch]]
+        return candidates
+
+    def marginals(self):
+        """Each player's marginal mixed strategy of the joint distribution."""
+        n = self.game.n_players
+        return [
+            self.joint.sum(axis=tuple(q for q in range(n) if q != p))
+            for p in range(n)
+        ]
+
+    def max_violation(self) -> float:
+        """Largest incentive gain under joint (<= 0 up to rounding for a CE)."""
+        return float(np.max(self.constraints.gains(self.joint.ravel())))
+
+    def get_state(self):
+        return {
+            'joint': self.joint,
+            'mix': self.marginals(),
+            'utils': self.utils,
+            'welfare': self.welfare,
+            'done': self.done
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    # chicken: the welfare-maximizing CE beats every Nash equilibrium
+    game = NFG_Core(2, [2, 2], np.array([[[6, 2], [7, 0]], [[6, 7], [2, 0]]]), "Chicken",
+                    [['chicken', 'dare'], ['chicken', 'dare']])
+    model = CESolver(game).solve()
+    print(np.round(model.joint, 3), model.utils, model.max_violation())
+
+    rng = np.random.default_rng(0)
+    for shape in ([10, 10, 10, 10], [100, 100]):
+        game = NFG_Core(len(shape), shape, rng.standard_normal([len(shape)] + shape),
+                        f"random {'x'.join(map(str, shape))}",
+                        [[f"s{i}" for i in range(n)] for n in shape])
+        start = time.perf_counter()
+        model = CESolver(game).solve()
+        print(f"{game.title}: welfare={model.welfare:.3f} violation={model.max_violation():.1e} "
+              f"pivots={model.n_pivots} rounds={model.n_rounds} time={time.perf_counter()-start:.2f}s")
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+
+class LogitQRE:
+    """
+    Traces the principal branch of logit quantal response equilibria,
+        x_p(s) proportional to exp(lam * u_p(s, x_-p)),
+    from the centroid (lam = 0) towards lam_max, where it approaches a Nash
+    equilibrium (the one selected by the logit tracing procedure). Works for
+    any number of players.
+
+    Unknowns are the log-probabilities y (one block per player) and lam; the
+    N = sum n_p equations per player are
+        y(s) - y(0) - lam (u(s) - u(0)) = 0   for s >= 1,    sum_s exp(y(s)) = 1.
+    The path is followed by arc length with an Euler predictor along the
+    Jacobian's null vector and a Newton (Gauss-Newton) corrector; the step
+    grows after every accepted step and halves when the corrector stalls or
+    the tangent turns sharply, so the flat stretch at large lam takes few steps.
+    """
+    def __init__(self, game:NFG_Core, lam_max:float=1e6, step:float=0.05,
+                 max_step:float=None, tol:float=1e-10, max_steps:int=100000):
+        self.game:NFG_Core = game
+        self.lam_max:float = lam_max
+        self.step:float = step
+        # unbounded by default: far along the path y moves linearly in lam
+        self.max_step:float = np.inf if max_step is None else max_step
+        self.min_step:float = 1e-12
+        self.tol:float = tol
+        self.max_steps:int = max_steps
+
+        # payoff range: residuals carry lam * u, so does their rounding error
+        lo, hi = game.payoff_bounds()
+        self.scale:float = max(float(hi.max() - lo.min()), 1e-12)
+        self.offsets = np.concatenate([[0], np.cumsum(game.n_strategies)])
+        self.N:int = int(self.offsets[-1])
+        # path point: y (log-probabilities, all players) then lam
+        self.z = np.zeros(self.N + 1)
+        for p, n in enumerate(game.n_strategies):
+            self.z[self.offsets[p]:self.offsets[p + 1]] = -np.log(n)
+        self.tangent:np.ndarray = None
+
+        # recorded path (solve(record=True))
+        self.lambdas:List[float] = []
+        self.path:List[np.ndarray] = []
+        self.n_steps:int = 0
+        self.n_rejected:int = 0
+        self.done = False
+
+    @property
+    def lam(self) -> float:
+        return float(self.z[-1])
+
+    def mix(self, z:np.ndarray=None) -> List[np.ndarray]:
+        z = self.z if z is None else z
+        return [np.exp(z[self.offsets[p]:self.offsets[p + 1]]) for p in range(self.game.n_players)]
+
+    def residual_jacobian(self, z:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """H(z), shape (N,), and dH/dz, shape (N, N+1)."""
+        game, off, N = self.game, self.offsets, self.N
+        x = self.mix(z)
+        lam = z[-1]
+
+        # profile 0 is x; profile 1+off[q]+t is x with player q playing pure t.
+        # deviation payoffs of the batch are u_p(s) and every du_p(s)/dx_q(t)
+        # (u_p is linear in x_q) in one contraction
+        batch = []
+        for p, n in enumerate(game.n_strategies):
+            xp = np.tile(x[p], (N + 1, 1))
+            xp[1 + off[p]:1 + off[p + 1]] = np.eye(n)
+            batch.append(xp)
+        dev = game.deviation_payoffs(batch)
+
+        H = np.empty(N)
+        J = np.zeros((N, N + 1))
+        for p, n in enumerate(game.n_strategies):
+            rows = slice(off[p], off[p] + n - 1)
+            u = dev[p][0]
+            H[rows] = z[off[p] + 1:off[p + 1]] - z[off[p]] - lam * (u[1:] - u[0])
+            H[off[p] + n - 1] = x[p].sum() - 1.0
+
+            J[rows, off[p] + 1:off[p + 1]] = np.eye(n - 1)
+            J[rows, off[p]] = -1.0
+            J[rows, N] = -(u[1:] - u[0])
+            for q in range(game.n_players):
+                if q == p:
+                    continue
+                # du_p(s)/dy_q(t) = du_p(s)/dx_q(t) x_q(t)
+                D = dev[p][1 + off[q]:1 + off[q + 1]].T * x[q][None, :]
+                J[rows, off[q]:off[q + 1]] = -lam * (D[1:] - D[0])
+            J[off[p] + n - 1, off[p]:off[p + 1]] = x[p]
+        return H, J
+
+    def _tangent(self, J:np.ndarray, previous:np.ndarray=None) -> np.ndarray:
+        # null vector of the (N, N+1) Jacobian: last column of the complete QR of J^T
+        Q, _ = np.linalg.qr(J.T, mode='complete')
+        t = Q[:, -1]
+        if previous is None:
+            # start with lam increasing
+            return t if t[-1] > 0 else -t
+        return t if t @ previous >= 0 else -t
+
+    def _correct(self, z:np.ndarray):
+        """Newton corrector from z. Returns (point, Jacobian) or None when it diverges."""
+        norm_prev = np.inf
+        for _ in range(8):
+            H, J = self.residual_jacobian(z)
+            norm = np.linalg.norm(H)
+            if norm <= self.tol * (1.0 + abs(z[-1]) * self.scale):
+                return z, J
+            # contracting too slowly: the predictor left the basin, shrink the step
+            if norm > 0.5 * norm_prev:
+                return None
+            norm_prev = norm
+            # minimum-norm Newton step (orthogonal to the tangent)
+            z = z + np.linalg.lstsq(J, -H, rcond=None)[0]
+        return None
+
+    def trace(self) -> Iterator[Tuple[float, List[np.ndarray]]]:
+        """Follow the path from the current point; yields (lam, mix) per accepted step."""
+        _, J = self.residual_jacobian(self.z)
+        self.tangent = self._tangent(J, self.tangent)
+        yield self.lam, self.mix()
+
+        while self.lam < self.lam_max and self.n_steps < self.max_steps:
+            corrected = self._correct(self.z + self.step * self.tangent)
+            if corrected is None:
+                self.n_rejected += 1
+                self.step /= 2
+                if self.step < self.min_step:
+                    break
+                continue
+            z, J = corrected
+            tangent = self._tangent(J, self.tangent)
+            # the path turned sharply within the step: it may have jumped to another branch
+            if tangent @ self.tangent < 0.9:
+                self.n_rejected += 1
+                self.step /= 2
+                if self.step < self.min_step:
+                    break
+                continue
+            self.z, self.tangent = z, tangent
+            self.n_steps += 1
+            self.step = min(self.step * 1.5, self.max_step)
+            yield self.lam, self.mix()
+        self.done = self.lam >= self.lam_max
+
+    def solve(self, record:bool=True, on_point=None) -> "LogitQRE":
+        """
+        Trace to lam_max. record=False keeps only the current point (constant
+        memory however long the path); on_point(lam, mix) sees every point.
+        """
+        for lam, mix in self.trace():
+            if record:
+                self.lambdas.append(lam)
+                self.path.append(np.concatenate(mix))
+            if on_point is not None:
+                on_point(lam, mix)
+        return self
+
+    def get_state(self):
+        mix = self.mix()
+        return {
+            'lam': self.lam,
+            'mix': mix,
+            'exploitability': float(self.game.exploitability([m[None, :] for m in mix])[0]),
+            'steps': self.n_steps,
+            'done': self.done
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    with open("data/learning/example_game_3p.json", 'r') as f:
+        game = NFG_Core.load_from_json(f)
+    rng = np.random.default_rng(0)
+    games = [game, NFG_Core(2, [30, 30], rng.random((2, 30, 30)), "random 30x30",
+                            [[f"s{i}" for i in range(30)]] * 2)]
+    for game in games:
+        start = time.perf_counter()
+        model = LogitQRE(game).solve(record=False)
+        state = model.get_state()
+        print(f"{game.title}: lam={state['lam']:.3g} steps={state['steps']} rejected={model.n_rejected} "
+              f"exploitability={state['exploitability']:.2e} time={time.perf_counter()-start:.2f}s")
+        print("  ", [np.round(m, 3).tolist() for m in state['mix']])
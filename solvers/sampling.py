@@ -0,0 +1,203 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations_with_replacement
+from math import ceil, comb, log
+from typing import List
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+from core.shared_game import SharedGameHandle, attach, share_game
+
+
+def k_uniform_strategies(n:int, k:int) -> np.ndarray:
+    """All k-uniform mixed strategies over n pure strategies (multisets of size k
+    as frequencies / k), shape (comb(n+k-1, k), n)."""
+    out = np.zeros((comb(n + k - 1, k), n))
+    for row, multiset in enumerate(combinations_with_replacement(range(n), k)):
+        np.add.at(out[row], list(multiset), 1.0)
+    return out / k
+
+
+def lmm_k(n:int, eps:float, n_players:int=2) -> int:
+    """
+    Support size of the Lipton-Markakis-Mehta bound: every game with payoffs in
+    [0, 1] has a k-uniform eps-Nash equilibrium for k >= 12 ln(n) / eps^2
+    (n: most strategies of a player; the n-player version pays a log(n_players) more).
+    Only a guarantee: much smaller k usually suffice in practice.
+    """
+    return int(ceil(12 * log(max(n, 2) * max(n_players - 1, 1)) / eps ** 2))
+
+
+def max_regret(game:NFG_Core, prob_batch:List[np.ndarray]) -> np.ndarray:
+    """Largest gain any single player gets by deviating, per profile of the batch, shape (Z,)."""
+    dev = game.deviation_payoffs(prob_batch)
+    return np.max([
+        u.max(axis=1) - np.einsum('zs,zs->z', x, u)
+        for x, u in zip(prob_batch, dev)
+    ], axis=0)
+
+
+# per-process game, mapped once by the pool initializer instead of pickled with every task
+_worker_game:NFG_Core = None
+
+
+def _init_worker(handle:SharedGameHandle):
+    global _worker_game
+    _worker_game = attach(handle)
+
+
+def _scan(game:NFG_Core, draw, n_batches:int, eps:float):
+    """
+    Evaluate n_batches candidate batches from draw(i) -> (per-player batch, ids).
+    Returns (best regret, best profile, found, candidates evaluated): stops at
+    the first batch holding an eps-equilibrium.
+    """
+    best, best_profile, evaluated = np.inf, None, 0
+    for i in range(n_batches):
+        batch, ids = draw(i)
+        if len(ids) == 0:
+            break
+        regret = max_regret(game, batch)
+        evaluated += len(ids)
+        j = int(np.argmin(regret))
+        if regret[j] < best:
+            best, best_profile = float(regret[j]), [x[j] for x in batch]
+        if best <= eps:
+            return best, best_profile, True, evaluated
+    return best, best_profile, False, evaluated
+
+
+def _enumerate_task(strategies, start:int, stop:int, batch:int, eps:float, game:NFG_Core=None):
+    """Candidates start..stop-1 of the product of the players' k-uniform strategies."""
+    game = _worker_game if game is None else game
+    shape = [len(s) for s in strategies]
+
+    def draw(i):
+        ids = np.arange(start + i * batch, min(stop, start + (i + 1) * batch))
+        index = np.unravel_index(ids, shape)
+        return [s[index[p]] for p, s in enumerate(strategies)], ids
+
+    return _scan(game, draw, -(-(stop - start) // batch), eps)
+
+
+def _sample_task(k:int, seed, n_batches:int, batch:int, eps:float, game:NFG_Core=None):
+    """n_batches batches of random k-uniform profiles (k draws per player from the
+    uniform mix, as frequencies)."""
+    game = _worker_game if game is None else game
+    rng = np.random.default_rng(seed)
+
+    def draw(i):
+        profiles = [rng.multinomial(k, np.full(n, 1.0 / n), size=batch) / k for n in game.n_strategies]
+        return profiles, np.arange(batch)
+
+    return _scan(game, draw, n_batches, eps)
+
+
+class KUniformSearch:
+    """
+    eps-Nash equilibria of n-player games by searching k-uniform profiles
+    (Lipton-Markakis-Mehta: with payoffs in [0, 1], k = lmm_k(n, eps) always
+    suffices). Works for any number of players, unlike LH_solver.
+
+    Candidates are scored a whole batch at a time (one deviation_payoffs call)
+    and split into tasks over a process pool; the search stops at the first
+    profile whose max regret (best single-player deviation gain) is <= eps.
+    mode: 'enumerate' (the full product, exhaustive), 'sample' (random draws)
+    or 'auto' (enumerate when there are at most max_enumerate candidates).
+    workers: processes, None/0/1 runs in this process.
+    """
+    def __init__(self, game:NFG_Core, k:int=4, eps:float=0.01, mode:str='auto',
+                 batch:int=4096, workers:int=None, seed=None, max_enumerate:int=10**6):
+        self.game:NFG_Core = game
+        self.k:int = k
+        self.eps:float = eps
+        self.batch:int = batch
+        self.workers:int = workers
+        self.seed = seed
+
+        self.n_candidates:int = int(np.prod([comb(n + k - 1, k) for n in game.n_strategies], dtype=float))
+        if mode == 'auto':
+            mode = 'enumerate' if self.n_candidates <= max_enumerate else 'sample'
+        self.mode:str = mode
+
+        self.mix:List[np.ndarray] = None
+        self.regret:float = np.inf
+        self.n_evaluated:int = 0
+        self.done = False
+
+    def _tasks(self, max_samples:int):
+        """(function, args) per task, in search order."""
+        per_task = self.batch * 8
+        if self.mode == 'enumerate':
+            strategies = [k_uniform_strategies(n, self.k) for n in self.game.n_strategies]
+            for start in range(0, self.n_candidates, per_task):
+                stop = min(self.n_candidates, start + per_task)
+                yield _enumerate_task, (strategies, start, stop, self.batch, self.eps)
+        else:
+            n_tasks = -(-max_samples // per_task)
+            for seed in np.random.SeedSequence(self.seed).spawn(n_tasks):
+                yield _sample_task, (self.k, seed, 8, self.batch, self.eps)
+
+    def _record(self, result):
+        best, profile, found, evaluated = result
+        self.n_evaluated += evaluated
+        if best < self.regret:
+            self.regret, self.mix = best, profile
+        return found
+
+    def solve(self, max_samples:int=10**6) -> "KUniformSearch":
+        """Search until an eps-equilibrium is found or the candidates (enumerate)
+        or max_samples draws (sample) run out; mix holds the best profile seen."""
+        tasks = self._tasks(max_samples)
+        if not self.workers or self.workers <= 1:
+            for fn, args in tasks:
+                if self._record(fn(*args, game=self.game)):
+                    break
+        else:
+            # workers map the payoffs from shared memory: one copy of u_mat, however many workers
+            with share_game(self.game) as handle, \
+                    ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(handle,)) as pool:
+                # keep a couple of tasks queued per worker, so an early exit leaves little to cancel
+                running, found = set(), False
+                for fn, args in tasks:
+                    running.add(pool.submit(fn, *args))
+                    if len(running) < 2 * self.workers:
+                        continue
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        found |= self._record(future.result())
+                    if found:
+                        break
+                if found:
+                    for future in running:
+                        future.cancel()
+                else:
+                    for future in running:
+                        self._record(future.result())
+        self.done = self.regret <= self.eps
+        return self
+
+    def get_state(self):
+        return {
+            'mix': self.mix,
+            'regret': self.regret,
+            'evaluated': self.n_evaluated,
+            'done': self.done
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for shape, k, mode in (([8, 8, 8], 2, 'enumerate'), ([6, 6, 6, 6], 3, 'sample')):
+        # payoffs in [0, 1], the scale eps refers to
+        game = NFG_Core(len(shape), shape, rng.random([len(shape)] + shape),
+                        f"random {'x'.join(map(str, shape))}",
+                        [[f"s{i}" for i in range(n)] for n in shape])
+        for workers in (None, 4):
+            start = time.perf_counter()
+            model = KUniformSearch(game, k=k, eps=0.05, mode=mode, workers=workers, seed=0).solve()
+            print(f"{game.title} k={k} {model.mode} workers={workers}: regret={model.regret:.4f} "
+                  f"done={model.done} evaluated={model.n_evaluated} time={time.perf_counter()-start:.2f}s")
@@ -0,0 +1,266 @@
+from __future__ import annotations
+from typing import Callable, List
+import time
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+
+
+class SimplicialSubdivision:
+    """
+    Approximate Nash equilibria of n-player games by simplicial subdivision:
+    the variable dimension restart algorithm of van der Laan and Talman on
+    the product of the players' simplices.
+
+    Labels: every point x gets the label (player j, strategy h) with the
+    largest deviation gain g_j(h) = u_j(h, x_-j) - u_j(x), over all players.
+    sum_h x_j(h) g_j(h) = 0, so a small simplex carrying all of one player's
+    labels (or reaching the simplex boundary with the labels it needs) has
+    every gain near the largest one, and that near 0: an approximate
+    equilibrium, with regret shrinking linearly in the mesh.
+
+    From a start point v the algorithm follows completely labeled simplices
+    through regions A(T) = prod_j conv(v_j, e(j,k) : k in T_j), one per
+    label set T, adding labels (going up a dimension) or dropping them
+    (going down) until it terminates. Each region is triangulated with
+    mesh 1/m in the coordinates s_a = (sum of the weights of the a-th and
+    later strategies of T_j) * m, in which the triangulation is Freudenthal's
+    and pivots are index shuffles.
+    Restarts: the solution found with mesh m is the start point of a run
+    with mesh m * refine, until the max regret is within precision (or a run
+    uses up max_pivots: the path from a restart may lead to a different,
+    far away equilibrium, at a cost growing with the mesh).
+    """
+    def __init__(self, game:NFG_Core, precision:float=1e-8, mesh:int=4, refine:int=4,
+                 max_mesh:int=2**40, max_pivots:int=10**5):
+        self.game:NFG_Core = game
+        self.precision:float = precision
+        self.mesh:int = mesh
+        self.refine:int = refine
+        self.max_mesh:int = max_mesh
+        # per refinement
+        self.max_pivots:int = max_pivots
+
+        n = game.n_strategies
+        self.offsets = np.concatenate([[0], np.cumsum(n)])
+        # player of every (player, strategy) label, labels flattened
+        self.player_of = np.repeat(np.arange(game.n_players), n)
+
+        self.mix:List[np.ndarray] = [np.full(k, 1.0 / k) for k in n]
+        self.regret:float = np.inf
+        # one record per mesh: mesh, pivots, seconds, regret
+        self.refinements:List[dict] = []
+        self.done = False
+        # solve(on_progress)
+        self._on_progress:Callable[[int, int], None] = None
+
+    # ---- labels ----
+    def _split(self, points:np.ndarray) -> List[np.ndarray]:
+        return [points[:, self.offsets[p]:self.offsets[p + 1]] for p in range(self.game.n_players)]
+
+    def gains(self, points:np.ndarray) -> np.ndarray:
+        """Deviation gain of every (player, strategy) for a batch of flattened
+        profiles (one deviation_payoffs call), shape (Z, sum n)."""
+        batch = self._split(points)
+        dev = self.game.deviation_payoffs(batch)
+        return np.concatenate([
+            u - np.einsum('zs,zs->z', x, u)[:, None] for x, u in zip(batch, dev)
+        ], axis=1)
+
+    def labels(self, points:np.ndarray) -> np.ndarray:
+        """Flat (player, strategy) label of each point of the batch, shape (Z,)."""
+        return np.argmax(self.gains(points), axis=1)
+
+    def max_regret(self, points:np.ndarray) -> np.ndarray:
+        return self.gains(points).max(axis=1)
+
+    # ---- one run ----
+    def _run(self, v:np.ndarray, m:int):
+        """
+        One pass of the algorithm from v with mesh 1/m.
+        Returns (the vertices of the last simplex as flattened profiles, pivots).
+        """
+        n_labels = len(v)
+        player_of, off = self.player_of, self.offsets
+        in_T = np.zeros(n_labels, dtype=bool)
+        # grid coordinate of every label in T (others unused)
+        y = np.zeros(n_labels, dtype=np.int64)
+        # order of the unit steps from y through the simplex vertices
+        pi:List[int] = []
+
+        def point(s):
+            x = v.copy()
+            for p in range(self.game.n_players):
+                ks = np.flatnonzero(in_T[off[p]:off[p + 1]]) + off[p]
+                if len(ks) == 0:
+                    continue
+                mu = (s[ks] - np.append(s[ks[1:]], 0)) / m
+                x[off[p]:off[p + 1]] *= 1.0 - mu.sum()
+                x[ks] += mu
+            return x
+
+        def vertex(r):
+            s = y.copy()
+            np.add.at(s, pi[:r], 1)
+            return s
+
+        def label_at(s):
+            return int(self.labels(point(s)[None, :])[0])
+
+        def neighbor(k, step):
+            """Next (step=1) / previous (-1) label of the same player in T, or None."""
+            p = player_of[k]
+            i = k + step
+            while off[p] <= i < off[p + 1]:
+                if in_T[i]:
+                    return i
+                i += step
+            return None
+
+        vlabels = [label_at(y)]
+        # what to do next: ('up', label) adds the label to T, ('out', i) pivots vertex i out
+        action = ('up', vlabels[0])
+        pivots = 0
+        while pivots < self.max_pivots:
+            pivots += 1
+            if self._on_progress is not None and pivots % 1024 == 0:
+                self._on_progress(m, pivots)
+            if action[0] == 'up':
+                ell = action[1]
+                p = player_of[ell]
+                # labels for every strategy in the support of v_p: player p has no
+                # weight off T_p here, so its gains on T_p (all near the max) average
+                # to 0: approximate equilibrium (with full support: all of p's labels)
+                if np.all(in_T[off[p]:off[p + 1]] | (v[off[p]:off[p + 1]] == 0)
+                          | (np.arange(off[p], off[p + 1]) == ell)):
+                    break
+                in_T[ell] = True
+                nxt = neighbor(ell, 1)
+                if nxt is None:
+                    # last strategy of the player in T: the region's new face is s_ell = 0
+                    y[ell] = 0
+                    pi.append(ell)
+                    r = len(pi)
+                else:
+                    # the step of nxt splits into ell then nxt
+                    y[ell] = y[nxt]
+                    r = pi.index(nxt)
+                    pi.insert(r, ell)
+                    r += 1
+                new = label_at(vertex(r))
+                vlabels.insert(r, new)
+
+            else:
+                i = action[1]
+                t = len(pi)
+                if i == 0:
+                    k = pi[0]
+                    if neighbor(k, -1) is None and vertex(t)[k] + 1 > m:
+                        # reached the boundary of the player's simplex
+                        break
+                    y[k] += 1
+                    pi = pi[1:] + [k]
+                    vlabels = vlabels[1:] + [None]
+                    r = t
+                elif i == t:
+                    k = pi[-1]
+                    if neighbor(k, 1) is None and y[k] == 0:
+                        # on the face s_k = 0: drop k from T
+                        in_T[k] = False
+                        pi.pop()
+                        vlabels.pop(i)
+                        action = ('out', vlabels.index(k))
+                        continue
+                    y[k] -= 1
+                    pi = [k] + pi[:-1]
+                    vlabels = [None] + vlabels[:-1]
+                    r = 0
+                else:
+                    a, b = pi[i - 1], pi[i]
+                    if neighbor(a, 1) == b and vertex(i - 1)[a] == vertex(i - 1)[b]:
+                        # on the face s_a = s_b (no weight on a): drop a from T
+                        in_T[a] = False
+                        pi.pop(i - 1)
+                        vlabels.pop(i)
+                        action = ('out', vlabels.index(a))
+                        continue
+                    pi[i - 1], pi[i] = b, a
+                    r = i
+                new = label_at(vertex(r))
+                vlabels[r] = new
+
+            if in_T[new]:
+                # duplicate label: the other vertex carrying it leaves next
+                action = ('out', next(q for q, lab in enumerate(vlabels) if lab == new and q != r))
+            else:
+                action = ('up', new)
+
+        return np.stack([point(vertex(r)) for r in range(len(pi) + 1)]), pivots
+
+    def _restart_point(self, x:np.ndarray) -> np.ndarray:
+        """
+        Start point of the next refinement: the solution, with the weight of
+        clearly unprofitable strategies (gain below -10 x regret) set to 0.
+        Regions only reach the faces of v's support after m pivots, while a
+        strategy wrongly dropped costs about (its weight) * m pivots to add back;
+        with regret r a strategy of weight w has gain >= -r (1 - w) / w, so only
+        weights under 1/11 are ever dropped.
+        """
+        v = np.where(self.gains(x[None, :])[0] < -10 * self.regret, 0.0, x)
+        for p in range(self.game.n_players):
+            block = slice(self.offsets[p], self.offsets[p + 1])
+            v[block] /= v[block].sum()
+        return v
+
+    def solve(self, on_progress:Callable[[int, int], None]=None) -> "SimplicialSubdivision":
+        """on_progress(mesh, pivots) every 1024 pivots and after each refinement (raising stops the solve)."""
+        self._on_progress = on_progress
+        v = np.concatenate(self.mix)
+        m = self.mesh
+        while m <= self.max_mesh:
+            start = time.perf_counter()
+            vertices, pivots = self._run(v, m)
+            # best of the last simplex's vertices and its barycenter
+            candidates = np.vstack([vertices, vertices.mean(axis=0)])
+            regret = self.max_regret(candidates)
+            best = int(np.argmin(regret))
+            self.refinements.append(dict(
+                mesh=m, pivots=pivots, seconds=time.perf_counter() - start, regret=float(regret[best])))
+            if regret[best] < self.regret:
+                self.regret = float(regret[best])
+                self.mix = [x[0] for x in self._split(candidates[best][None, :])]
+            if on_progress is not None:
+                on_progress(m, pivots)
+            # a run that used up its pivots didn't terminate: finer meshes only cost more
+            if self.regret <= self.precision or pivots >= self.max_pivots:
+                break
+            v = self._restart_point(np.concatenate(self.mix))
+            m *= self.refine
+        self.done = self.regret <= self.precision
+        return self
+
+    def get_state(self):
+        return {
+            'mix': self.mix,
+            'regret': self.regret,
+            'refinements': self.refinements,
+            'done': self.done
+        }
+
+
+if __name__ == "__main__":
+    with open("data/learning/example_game_3p.json", 'r') as f:
+        game = NFG_Core.load_from_json(f)
+    rng = np.random.default_rng(0)
+    games = [game] + [
+        NFG_Core(len(shape), shape, rng.random([len(shape)] + shape), f"random {'x'.join(map(str, shape))}",
+                 [[f"s{i}" for i in range(n)] for n in shape])
+        for shape in ([5, 5, 5], [3, 3, 3, 3], [10, 10])
+    ]
+    for game in games:
+        model = SimplicialSubdivision(game).solve()
+        print(f"{game.title}: regret={model.regret:.2e} done={model.done}")
+        for rec in model.refinements:
+            print(f"    mesh={rec['mesh']:>14} pivots={rec['pivots']:>6} "
+                  f"time={rec['seconds']*1000:7.1f}ms regret={rec['regret']:.2e}")
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+# pivot elements below this fraction of the column's largest entry are skipped
+PIVOT_TOL = 1e-7
+# degenerate pivots in a row before switching to Bland's rule
+BLAND_AFTER = 50
+
+
+class DenseSimplex:
+    """
+    Dense tableau simplex for   max c.x   s.t.   A x <= b,  x >= 0,   with b >= 0.
+
+    b >= 0 makes the all-slack basis feasible, so no phase 1 is needed.
+    This covers the LPs of this project (matrix games after a payoff shift,
+    correlated equilibria with a positive objective).
+
+    The tableau is kept in compact (Tucker) form: rows are the basic
+    variables, columns the nonbasic ones, so a pivot updates an
+    (m+1) x (n+1) array instead of carrying the m identity columns.
+    Row m is the objective (reduced costs, objective value in the last column).
+    Entering column by steepest edge, i.e. the most negative reduced cost
+    relative to the column norm, which takes several times fewer pivots than
+    Dantzig's rule on game matrices. Leaving rows by the Harris ratio test
+    (largest pivot among the nearly blocking rows). After a run of degenerate
+    pivots both choices switch to Bland's rule (smallest label entering, and
+    smallest label leaving among the tied rows) until the objective moves
+    again, so it cannot cycle.
+    Variables are labelled 0..n-1 (x) and n..n+m-1 (slacks).
+    status: 'running', then 'optimal', 'unbounded' or 'pivot_limit' (solve()
+    stopped at max_pivots: the basis is feasible but not optimal).
+
+    perturb > 0: the ratio test runs on b + (tiny random offsets of this
+    size), which removes degenerate pivots on LPs with many b_i = 0
+    (e.g. correlated equilibria). The exact b is carried through the
+    same pivots in a second column, so primal() is the exact basic
+    solution of the final basis.
+
+    Warm start (row and column generation): add_columns, add_rows and
+    drop_rows change the LP in place and keep the current basis. New
+    columns leave it primal feasible (solve() continues with primal
+    pivots); new rows leave it dual feasible, and solve() first restores
+    primal feasibility with dual simplex pivots.
+    """
+    def __init__(self, c:np.ndarray, A:np.ndarray, b:np.ndarray, tol:float=1e-9,
+                 perturb:float=0.0):
+        A = np.asarray(A, dtype=float)
+        b = np.asarray(b, dtype=float)
+        c = np.asarray(c, dtype=float)
+        m, n = A.shape
+        if np.any(b < -tol):
+            raise ValueError("DenseSimplex needs b >= 0 (origin feasible)")
+        self.m:int = m
+        self.n:int = n
+        self.tol:float = tol
+
+        # columns: nonbasic variables, rhs used by the ratio test, [exact rhs]
+        self.perturbed:bool = perturb > 0
+        self.perturb:float = perturb
+        self.rng = np.random.default_rng(0)
+        self.T = np.zeros((m + 1, n + (2 if self.perturbed else 1)))
+        self.T[:m, :n] = A
+        self.T[:m, n:] = self._rhs_columns(np.maximum(b, 0.0))
+        self.T[m, :n] = -c
+        # variable label of each row / column
+        self.basis = np.arange(n, n + m)
+        self.nonbasic = np.arange(n)
+
+        self.n_pivots:int = 0
+        self.degenerate_run:int = 0
+        self.done:bool = False
+        self.unbounded:bool = False
+        self.status:str = 'running'
+
+    @property
+    def bland(self) -> bool:
+        return self.degenerate_run > BLAND_AFTER
+
+    def _rhs_columns(self, b:np.ndarray) -> np.ndarray:
+        # ratio test column (perturbed b) [and exact b] of new constraints
+        if not self.perturbed:
+            return b[:, None]
+        return np.column_stack([b + self.perturb * self.rng.uniform(1.0, 2.0, len(b)), b])
+
+    def _entering(self) -> int:
+        T, m, n, tol = self.T, self.m, self.n, self.tol
+        reduced = T[m, :n]
+        improving = reduced < -tol
+        if not np.any(improving):
+            return -1
+        if self.bland:
+            # Bland: improving column with the smallest label
+            candidates = np.flatnonzero(improving)
+            return int(candidates[np.argmin(self.nonbasic[candidates])])
+        # steepest edge: |d_j| / ||(1, T_j)||
+        norms = 1.0 + np.einsum('ij,ij->j', T[:m, :n], T[:m, :n])
+        score = np.where(improving, reduced * reduced / norms, -1.0)
+        return int(np.argmax(score))
+
+    def pivot(self) -> bool:
+        """One simplex pivot. Returns False once optimal (or unbounded)."""
+        if self.done:
+            return False
+        col = self._entering()
+        if col < 0:
+            self.done = True
+            self.status = 'optimal'
+            return False
+
+        T, m, tol = self.T, self.m, self.tol
+        column = T[:m, col]
+        # tiny pivots blow up rounding errors
+        positive = column > max(tol, PIVOT_TOL * np.abs(column).max())
+        if not np.any(positive):
+            self.done = True
+            self.unbounded = True
+            self.status = 'unbounded'
+            return False
+        # Rounding can leave a basic value slightly negative: treat it as 0
+        rhs = np.maximum(T[:m, self.n], 0.0)
+        ratios = np.full(m, np.inf)
+        ratios[positive] = rhs[positive] / column[positive]
+        if self.bland:
+            # Bland: the blocking row (ties up to tol) whose variable has the smallest label
+            blocking = np.flatnonzero(ratios <= ratios.min() + tol)
+            row = int(blocking[np.argmin(self.basis[blocking])])
+        else:
+            # Harris ratio test: largest step allowing a violation of tol, then
+            # the largest pivot among the rows blocking within that step.
+            step = np.min((rhs[positive] + tol) / column[positive])
+            blocking = np.flatnonzero(ratios <= step)
+            row = int(blocking[np.argmax(column[blocking])])
+        self.degenerate_run = self.degenerate_run + 1 if ratios[row] <= tol else 0
+        self._exchange(row, col)
+        return True
+
+    def dual_pivot(self) -> bool:
+        """
+        One dual simplex pivot, from a dual feasible basis (reduced costs >= 0).
+        Returns False once primal feasible (or infeasible: status 'infeasible').
+        """
+        T, m, n, tol = self.T, self.m, self.n, self.tol
+        rhs = T[:m, n]
+        infeasible = np.flatnonzero(rhs < -tol)
+        if len(infeasible) == 0:
+            return False
+        if self.bland:
+            # Bland: the infeasible row whose variable has the smallest label
+            row = int(infeasible[np.argmin(self.basis[infeasible])])
+        else:
+            row = int(infeasible[np.argmin(rhs[infeasible])])
+
+        line = T[row, :n]
+        negative = line < -max(tol, PIVOT_TOL * np.abs(line).max())
+        if not np.any(negative):
+            # the row's variable cannot reach 0: no feasible x
+            self.done = True
+            self.status = 'infeasible'
+            return False
+        # Rounding can leave a reduced cost slightly negative: treat it as 0
+        reduced = np.maximum(T[m, :n], 0.0)
+        ratios = np.full(n, np.inf)
+        ratios[negative] = reduced[negative] / -line[negative]
+        if self.bland:
+            entering = np.flatnonzero(ratios <= ratios.min() + tol)
+            col = int(entering[np.argmin(self.nonbasic[entering])])
+        else:
+            # Harris ratio test on the reduced costs, as in pivot()
+            step = np.min((reduced[negative] + tol) / -line[negative])
+            entering = np.flatnonzero(ratios <= step)
+            col = int(entering[np.argmin(line[entering])])
+        self.degenerate_run = self.degenerate_run + 1 if ratios[col] <= tol else 0
+        self._exchange(row, col)
+        return True
+
+    def _exchange(self, row:int, col:int):
+        """Pivot on T[row, col]: exchange basis[row] and nonbasic[col]."""
+        T = self.T
+        p = T[row, col]
+        factors = T[:, col].copy()
+        factors[row] = 0.0
+        T[row] /= p
+        T -= np.outer(factors, T[row])
+        T[:, col] = -factors / p
+        T[row, col] = 1.0 / p
+        self.basis[row], self.nonbasic[col] = self.nonbasic[col], self.basis[row]
+        self.n_pivots += 1
+
+    def solve(self, max_pivots:int=None) -> "DenseSimplex":
+        """
+        Pivot until optimal (or unbounded / infeasible), dual pivots first
+        while the basis is primal infeasible. status is 'pivot_limit' if this
+        call ran out of max_pivots first.
+        """
+        max_pivots = 50 * (self.m + self.n) if max_pivots is None else max_pivots
+        start = self.n_pivots
+        if np.any(self.T[:self.m, self.n] < -self.tol) and np.any(self.T[self.m, :self.n] < -self.tol):
+            raise ValueError("DenseSimplex needs a primal or dual feasible basis")
+        while self.n_pivots - start < max_pivots and not self.done and self.dual_pivot():
+            pass
+        while self.n_pivots - start < max_pivots and self.pivot():
+            pass
+        if not self.done:
+            self.status = 'pivot_limit'
+        return self
+
+    # ---- warm start ----
+    def _reopen(self):
+        self.done = False
+        self.unbounded = False
+        self.status = 'running'
+        self.degenerate_run = 0
+
+    def basis_inverse(self) -> np.ndarray:
+        """B^-1, read off the tableau: column i is the (possibly basic) slack i's column."""
+        m, n = self.m, self.n
+        inverse = np.zeros((m, m))
+        cols = np.flatnonzero(self.nonbasic >= n)
+        inverse[:, self.nonbasic[cols] - n] = self.T[:m, cols]
+        rows = np.flatnonzero(self.basis >= n)
+        inverse[rows, self.basis[rows] - n] = 1.0
+        return inverse
+
+    def add_columns(self, c:np.ndarray, A:np.ndarray):
+        """New variables (nonbasic, at 0) with costs c (k,) and constraint columns A (m, k)."""
+        c = np.asarray(c, dtype=float)
+        A = np.asarray(A, dtype=float).reshape(self.m, len(c))
+        n, k = self.n, len(c)
+        # B^-1 a_j, and reduced cost y.a_j - c_j
+        new = np.vstack([self.basis_inverse() @ A, self.dual() @ A - c])
+        self.T = np.concatenate([self.T[:, :n], new, self.T[:, n:]], axis=1)
+        # slacks keep their order after the new variables
+        self.basis[self.basis >= n] += k
+        self.nonbasic[self.nonbasic >= n] += k
+        self.nonbasic = np.concatenate([self.nonbasic, np.arange(n, n + k)])
+        self.n += k
+        self._reopen()
+
+    def add_rows(self, A:np.ndarray, b:np.ndarray):
+        """New constraints A x <= b (A (r, n)), their slacks basic. Violated ones make rhs < 0."""
+        b = np.asarray(b, dtype=float)
+        A = np.asarray(A, dtype=float).reshape(len(b), self.n)
+        m, n = self.m, self.n
+        # a.x with the basic variables substituted: x_B = rhs - T x_N
+        coef = np.zeros((len(b), n + m))
+        coef[:, :n] = A
+        basic = coef[:, self.basis]
+        rows = np.empty((len(b), self.T.shape[1]))
+        rows[:, :n] = coef[:, self.nonbasic] - basic @ self.T[:m, :n]
+        rows[:, n:] = self._rhs_columns(b) - basic @ self.T[:m, n:]
+        self.T = np.concatenate([self.T[:m], rows, self.T[m:]], axis=0)
+        self.basis = np.concatenate([self.basis, np.arange(n + m, n + m + len(b))])
+        self.m += len(b)
+        self._reopen()
+
+    def drop_rows(self, constraints:np.ndarray):
+        """Remove constraints whose slacks are basic (not binding the basis). ValueError otherwise."""
+        constraints = np.asarray(constraints, dtype=int)
+        if len(constraints) == 0:
+            return
+        m, n = self.m, self.n
+        where = np.full(m, -1)
+        slack_rows = np.flatnonzero(self.basis >= n)
+        where[self.basis[slack_rows] - n] = slack_rows
+        rows = where[constraints]
+        if np.any(rows < 0):
+            raise ValueError("only constraints with a basic slack can be dropped")
+        keep = np.ones(m + 1, dtype=bool)
+        keep[rows] = False
+        self.T = self.T[keep]
+        self.basis = self.basis[keep[:m]]
+        # close the gaps in the slack labels
+        removed = np.zeros(n + m, dtype=int)
+        removed[n + constraints] = 1
+        shift = np.cumsum(removed)
+        self.basis -= shift[self.basis]
+        self.nonbasic -= shift[self.nonbasic]
+        self.m -= len(constraints)
+
+    def basic_slacks(self) -> np.ndarray:
+        """Which constraints have their slack in the basis, shape (m,)."""
+        out = np.zeros(self.m, dtype=bool)
+        out[self.basis[self.basis >= self.n] - self.n] = True
+        return out
+
+    def primal(self) -> np.ndarray:
+        x = np.zeros(self.n + self.m)
+        x[self.basis] = self.T[:self.m, -1]
+        if self.perturbed:
+            # exact basic solution, rounding noise removed
+            x = np.maximum(x, 0.0)
+        return x[:self.n]
+
+    def dual(self) -> np.ndarray:
+        """Shadow prices of the constraints (reduced costs of the slacks)."""
+        y = np.zeros(self.n + self.m)
+        y[self.nonbasic] = self.T[self.m, :self.n]
+        return y[self.n:]
+
+    def objective(self) -> float:
+        return float(self.T[self.m, -1])
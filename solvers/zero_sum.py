@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import numpy as np
+
+from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from solvers.simplex import DenseSimplex
+
+
+class ZeroSumSolver:
+    """
+    Minimax strategies of a 2-player zero-sum (or constant-sum) game by one LP,
+    with the same state interface as LH_solver (update / get_state / mix / done).
+
+    With payoffs A = u_mat[0] shifted to be positive (A' = A - min A + 1),
+    the column player's LP   max 1.y  s.t.  A'y <= 1, y >= 0   has optimum 1/v'.
+    y v' is player 1's minimax strategy, the LP duals times v' player 0's.
+    """
+    def __init__(self, game:NFG_Core):
+        if game.n_players != 2:
+            raise ValueError(f"zero-sum solver takes 2-player games ({game.n_players}-player game given)")
+        self.total = game.constant_sum()
+        if self.total is None:
+            raise ValueError("game is not constant-sum")
+        self.game:NFG_Core = game
+
+        # (restricted games hand out payoff views)
+        A = np.asarray(game.u_mat[0], dtype=float)
+        self.shift:float = float(A.min()) - 1.0
+        na0, na1 = game.n_strategies
+        self.lp = DenseSimplex(np.ones(na1), A - self.shift, np.ones(na0))
+
+        self.mix = [
+            np.zeros(na0),
+            np.zeros(na1)
+        ]
+        # LP scale of each player's mix (sum of the unnormalized variables), as in LH_solver
+        self.a = np.zeros(2)
+        # expected payoff of each player at the solution
+        self.value = np.zeros(2)
+        self.done = False
+
+    @timed('zero_sum.pivot')
+    def update(self, initial=None, log_info=False):
+        """One simplex pivot (initial is ignored: the LP has no free starting label)."""
+        if not self.done:
+            self.lp.pivot()
+            self._read_solution()
+            self.done = self.lp.done
+        if log_info:
+            return dict(
+                pivots=self.lp.n_pivots,
+                mix=[[round(float(p),3) for p in self.mix[pid]] for pid in range(2)],
+                a=[round(float(_a),3) for _a in self.a],
+                value=[round(float(v),3) for v in self.value],
+                done=self.done
+            )
+        return None
+
+    @timed('zero_sum.solve')
+    def solve(self) -> "ZeroSumSolver":
+        self.lp.solve()
+        if self.lp.status != 'optimal':
+            # a non-optimal basis is not a minimax strategy
+            raise ValueError(f"zero-sum LP stopped after {self.lp.n_pivots} pivots ({self.lp.status})")
+        self._read_solution()
+        self.done = True
+        return self
+
+    def _read_solution(self):
+        y = self.lp.primal()
+        x = self.lp.dual()
+        self.a[:] = x.sum(), y.sum()
+        if self.a[1] > 0:
+            v = 1.0 / self.a[1]
+            self.mix[0] = x * v
+            self.mix[1] = y * v
+            self.value[0] = v + self.shift
+            self.value[1] = self.total - self.value[0]
+
+    def get_state(self):
+        return {
+            'coef': self.lp.T,
+            'LHS': self.lp.basis,
+            'mix': self.mix,
+            'a': self.a,
+            'value': self.value,
+            'done': self.done
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for n in (3, 100, 500):
+        A = rng.standard_normal((n, n))
+        game = NFG_Core(2, [n, n], np.stack([A, -A]), f"random zero-sum {n}x{n}",
+                        [[f"s{i}" for i in range(n)]] * 2)
+        start = time.perf_counter()
+        model = ZeroSumSolver(game).solve()
+        elapsed = time.perf_counter() - start
+        exploit = game.exploitability([m[None, :] for m in model.mix])[0]
+        print(f"{n}x{n}: value={model.value[0]:.4f} pivots={model.lp.n_pivots} "
+              f"exploitability={exploit:.2e} time={elapsed*1000:.1f}ms")
@@ -1,23 +1,33 @@
 from __future__ import annotations
 import streamlit as st
-import plotly.graph_objects as go
+import json
 
+from core.fragments import rerun_dependents
+from core.game_cache import get_shared_cache
 from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.session_store import session_namespace
+from core.widget_keys import content_id, widget_key, cached_figure
 from strategy_utility.viz_components import StrategyUtilityViz, MixedStrategy, MixedStrategyProfile
 
-# temporary uid
-class uid:
-    id=0
-    @staticmethod       
-    def get():
-        uid.id += 1
-        return uid.id
+# fragment key -> viz state it reads.
+# callbacks rerun only the fragments reading what they changed;
+# uploaders, player selector and table only rerun with the full page.
+FRAGMENT_DEPS = {
+    'su_chart': {'structure', 'visibility', 'preview'},
+    'su_legend': {'structure'},
+    'su_edit_self': {'structure'},
+    'su_edit_oppo': {'structure'},
+}
 
 def main():
-    if not hasattr(st.session_state,'su'):
-        st.session_state.su = {}
+    # memory-accounted session state, may be spilled to disk while idle
+    session_namespace('su', restorers={'viz': restore_viz})
     if 'tmp' not in st.session_state.su:
         st.session_state.su['tmp'] = {}
+    if 'figs' not in st.session_state.su:
+        # built figures by widget key, reused while their spec version is unchanged
+        st.session_state.su['figs'] = {}
     # render headers, load game and viz
     render_page_header() 
     game: NFG_Core = st.session_state.su['game']
@@ -27,12 +37,40 @@ def main():
     render_player_selector(viz,game)
     plot_tab, table_tab = st.tabs(("Plot","Table"))
     with plot_tab:
-        render_plot()
+        render_chart()
     with table_tab:
         render_table()
-    render_editor_tabs(viz,game)
+    render_editor_tabs(viz)
 
 
+@st.fragment(key='su_chart')
+@timed('su.render_chart')
+def render_chart():
+    viz: StrategyUtilityViz = st.session_state.su['viz']
+    render_plot(*get_previews(viz))
+
+
+def get_previews(viz:StrategyUtilityViz):
+    """Utilities of the strategies currently being edited, if any."""
+    preview_row, preview_col = None, None
+    tmp = st.session_state.su['tmp']
+    # skip empty mixes and leftovers from another player's perspective
+    if 'ms' in tmp and tmp['ms'].pid == viz.player and sum(tmp['ms'].ratios) > 0:
+        preview_row = (tmp['ms'].label, viz.preview_strategy_utils(tmp['ms']))
+    if 'msp' in tmp and all(ms.pid != viz.player and sum(ms.ratios) > 0
+                            for ms in tmp['msp'].mixed_strats):
+        preview_col = (tmp['msp'].label, viz.preview_sprofile_utils(
+            tmp['msp'], changed_pid=tmp.get('changed_pid')))
+    return preview_row, preview_col
+
+
+def restore_viz(data:dict) -> StrategyUtilityViz:
+    # rebuild a spilled viz around the shared game
+    game = get_shared_cache().intern_game(NFG_Core.from_dict(data['game']))
+    return StrategyUtilityViz.from_dict(data, game=game)
+
+
+@timed('su.render_page_header')
 def render_page_header():
     # render title description, savefileloader gametitle
     st.write("### Opponents' Strategy vs Utility Chart")
@@ -43,6 +81,7 @@ def render_page_header():
     )
     render_file_uploaders()
 
+@timed('su.render_game_header')
 def render_game_header():
     # render game title, save viz button
     with st.container(horizontal=True):
@@ -52,19 +91,22 @@ def render_game_header():
         #     viz:StrategyUtilityViz = st.session_state.su['viz']
         #     viz.sav
 
+        # deferred: the viz is edited inside a fragment after this renders
         st.download_button(
             label='Download Viz',
-            data=st.session_state.su['viz'].to_json(),
+            data=st.session_state.su['viz'].to_json,
             file_name=f'viz1_{st.session_state.su['viz'].game.title}.json',
             mime="text/json",
             icon=":material/download:"
         )
                   
+@timed('su.render_file_uploaders')
 def render_file_uploaders():
     # render viz file uploader
     def del_session_viz():
         st.session_state.su.pop('viz')
         st.session_state.su.pop('game')
+        st.session_state.su['figs'] = {}
     # if in session -> session load
     # if no session, has file -> load file
     # if no session, no file --> default file
@@ -73,15 +115,22 @@ def render_file_uploaders():
     
     if 'viz' in st.session_state.su:
         return
+    # games are shared read-only across sessions, the viz itself is per session
+    cache = get_shared_cache()
     if viz_file is not None:
-        st.session_state.su['viz'] = StrategyUtilityViz.load_from_json(viz_file)
-        st.session_state.su['game'] = st.session_state.su['viz'].game
+        data = json.load(viz_file)
+        game = cache.intern_game(NFG_Core.from_dict(data['game']))
     else:
-        with open("data/su/viz1_Prisoner's Dilemma.json") as f:
-            st.session_state.su['viz'] = StrategyUtilityViz.load_from_json(f)
-        st.session_state.su['game'] = st.session_state.su['viz'].game
+        data, game = cache.load_json_file("data/su/viz1_Prisoner's Dilemma.json")
+    viz = StrategyUtilityViz.from_dict(data, game=game)
+    if viz_file is not None:
+        # a re-uploaded download must not take over the live viz's widget keys
+        viz.viz_id = content_id(data)
+    st.session_state.su['viz'] = viz
+    st.session_state.su['game'] = viz.game
 
         
+@timed('su.render_player_selector')
 def render_player_selector(viz:StrategyUtilityViz,game:NFG_Core):
     n = game.n_players
     option_labels = [f"Player {i}" for i in range(n)]
@@ -90,7 +139,7 @@ def render_player_selector(viz:StrategyUtilityViz,game:NFG_Core):
         option_labels,
         label_visibility='collapsed',
         index=viz.player,
-        key=uid.get())
+        key=widget_key(viz.viz_id,'player_selector'))
     player = option_labels.index(player)
     viz.change_player(player)
     # on change - viz.change_player to change the core data
@@ -98,7 +147,12 @@ def render_player_selector(viz:StrategyUtilityViz,game:NFG_Core):
     #       only when actually changed
 
 
-def render_plot():
+@timed('su.render_plot')
+def render_plot(preview_row=None, preview_col=None):
+    """
+    preview_row: (label, utilities vs each opponent profile) of player i's strategy being edited
+    preview_col: (label, utilities of each player i strategy) of opponent profile being edited
+    """
     viz: StrategyUtilityViz = st.session_state.su['viz']
     u_mat, pi_s, oppo_sps = viz.get_plot_data()
 
@@ -111,7 +165,28 @@ def render_plot():
     # collect visible opponent profiles (x-axis)
     x_indices = [j for j, sp in enumerate(oppo_sps) if sp.visible]
     x_labels = [oppo_sps[j].label for j in x_indices]
+    if preview_col is not None:
+        x_labels.append(f"{preview_col[0]} (preview)")
+
+    # rebuild only when structure, visibility or previews changed
+    spec_version = (
+        viz.version, viz.player,
+        tuple(ms.visible for ms in pi_s), tuple(x_indices),
+        preview_row, preview_col
+    )
+    key = widget_key(viz.viz_id,'plot',viz.player)
+    fig = cached_figure(
+        st.session_state.su['figs'], key, spec_version,
+        lambda: _build_plot_figure(viz, u_mat, pi_s, x_indices, x_labels, preview_row, preview_col)
+    )
 
+    with st.container():
+        st.plotly_chart(fig, width='stretch', key=key)
+
+
+@timed('su._build_plot_figure')
+def _build_plot_figure(viz:StrategyUtilityViz, u_mat, pi_s, x_indices, x_labels, preview_row, preview_col):
+    import plotly.graph_objects as go
     fig = go.Figure()
 
     for i, ms in enumerate(pi_s):
@@ -124,6 +199,11 @@ def render_plot():
         # x positions: just indices 0..len-1
         x_values = list(range(len(x_indices)))
 
+        # live preview of the opponent profile being edited, at the end of x axis
+        if preview_col is not None:
+            x_values.append(len(x_indices))
+            y_values.append(preview_col[1][i])
+
         fig.add_trace(
             go.Scatter(
                 x=x_values,
@@ -133,6 +213,18 @@ def render_plot():
             )
         )
 
+    # live preview of player i's strategy being edited
+    if preview_row is not None:
+        fig.add_trace(
+            go.Scatter(
+                x=list(range(len(x_indices))),
+                y=[preview_row[1][j] for j in x_indices],
+                mode="lines+markers",
+                line=dict(dash='dash'),
+                name=f"{preview_row[0]} (preview)",
+            )
+        )
+
     fig.update_layout(
         margin=dict(l=40, r=20, t=40, b=40),
         xaxis=dict(
@@ -149,87 +241,105 @@ def render_plot():
         )
     )
 
-    with st.container():
-        st.plotly_chart(fig, width='stretch')
+    return fig
 
     
+@timed('su.render_table')
 def render_table():
     game:NFG_Core = st.session_state.su['game']
 
     if game.n_players == 2:
-        # mat[col][row], as in plotly
-        mat = []
-        for a1 in range(game.n_strategies[1]):
-            col = []
-            for a0 in range(game.n_strategies[0]):
-                col.append(
-                    (game.u_mat[0,a0,a1],game.u_mat[1,a0,a1])
-                )
-            mat.append(col)
-
-        row_labels = game.labels[0]
-        col_labels = game.labels[1]
-
-        # render table
-        fig = go.Figure(
-            data=[  
-                go.Table(
-                    header=dict(
-                        values=[""] + col_labels,
-                        fill_color="#f0f0f0",
-                        align="center",
-                        font=dict(size=15),
-                        height=30
-                    ),
-                    cells=dict(
-                        values=[row_labels, *mat],
-                        align="center",
-                        font=dict(size=15),
-                        height=30
-                    ),
-                )
-            ]
-        )
-
-        # set height
-        n_rows = game.n_strategies[0] + 1
-        fig.update_layout(
-            height = 30*(n_rows+1),
-            margin=dict(t=15, b=10, l=10, r=10),
-            autosize=True
+        key = widget_key(game.game_hash(),'table')
+        fig = cached_figure(
+            st.session_state.su['figs'], key, game.game_hash(),
+            lambda: _build_table_figure(game)
         )
-
-        st.plotly_chart(fig, width='stretch', key=uid.get())
+        st.plotly_chart(fig, width='stretch', key=key)
 
     else:
         st.write("Utility Matrix is only supported for 2 player games")
 
-def render_editor_tabs(viz:StrategyUtilityViz, game:NFG_Core):
+
+@timed('su._build_table_figure')
+def _build_table_figure(game:NFG_Core):
+    import plotly.graph_objects as go
+    # mat[col][row], as in plotly
+    mat = []
+    for a1 in range(game.n_strategies[1]):
+        col = []
+        for a0 in range(game.n_strategies[0]):
+            col.append(
+                (game.u_mat[0,a0,a1],game.u_mat[1,a0,a1])
+            )
+        mat.append(col)
+
+    row_labels = game.labels[0]
+    col_labels = game.labels[1]
+
+    # render table
+    fig = go.Figure(
+        data=[  
+            go.Table(
+                header=dict(
+                    values=[""] + col_labels,
+                    fill_color="#f0f0f0",
+                    align="center",
+                    font=dict(size=15),
+                    height=30
+                ),
+                cells=dict(
+                    values=[row_labels, *mat],
+                    align="center",
+                    font=dict(size=15),
+                    height=30
+                ),
+            )
+        ]
+    )
+
+    # set height
+    n_rows = game.n_strategies[0] + 1
+    fig.update_layout(
+        height = 30*(n_rows+1),
+        margin=dict(t=15, b=10, l=10, r=10),
+        autosize=True
+    )
+
+    return fig
+
+@timed('su.render_editor_tabs')
+def render_editor_tabs(viz:StrategyUtilityViz):
     # tabs: Legend, Edit Pi, Edit P-i
     tab_legend, tab_edit_self, tab_edit_oppo = st.tabs(
         ('Legend', f'Edit P{viz.player}', 'Edit Opponents')
     )
+    # fragments read the viz from session state on every rerun: it may have
+    # been spilled and restored as a new object since the last full run
     with tab_legend:
-        render_legend_tab(viz)
+        render_legend_tab()
     with tab_edit_self:
-        render_edit_pself_tab(viz,game)
+        render_edit_pself_tab()
     with tab_edit_oppo:
-        render_edit_oppo_tab(viz,game)
+        render_edit_oppo_tab()
 
 
-def render_legend_tab(viz:StrategyUtilityViz):
+@st.fragment(key='su_legend')
+@timed('su.render_legend_tab')
+def render_legend_tab():
+    viz:StrategyUtilityViz = st.session_state.su['viz']
 
     def toggle_s_pi_cb(sid:int):
         viz:StrategyUtilityViz = st.session_state.su['viz']
         current_vis = viz.get_pi_s()[sid].visible
         viz.set_visible('self',sid, not current_vis)
-        # reload UI..?
+        # the toggle already shows the new state: redraw the chart only
+        rerun_dependents(FRAGMENT_DEPS, ['visibility'])
 
     def toggle_s_po_cb(sid:int):
         viz:StrategyUtilityViz = st.session_state.su['viz']
         current_vis = viz.get_oppo_sps()[sid].visible
         viz.set_visible('oppo',sid,not current_vis)
-        # reload UI?
+        rerun_dependents(FRAGMENT_DEPS, ['visibility'])
     
     # split into two columns: player i, player oppo
     col1, col2 = st.columns(2)
@@ -246,7 +356,7 @@ def render_legend_tab(viz:StrategyUtilityViz):
                 st.toggle(
                     label=f"{strategy.label}", # removed icon
                     value=strategy.visible, on_change=toggle_s_pi_cb, args=(sid,),
-                    key=uid.get())
+                    key=widget_key(viz.viz_id,'toggle_pi',viz.player,viz.version,sid))
   
     with col2:
         with st.container(height=250):
@@ -263,10 +373,14 @@ def render_legend_tab(viz:StrategyUtilityViz):
                 st.toggle(
                     label=f"{sp.label}", # removed icon
                     value=sp.visible, on_change=toggle_s_po_cb,args=(sid,),
-                    key=uid.get())
+                    key=widget_key(viz.viz_id,'toggle_po',viz.player,viz.version,sid))
 
 
-def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
+@st.fragment(key='su_edit_self')
+@timed('su.render_edit_pself_tab')
+def render_edit_pself_tab():
+    viz:StrategyUtilityViz = st.session_state.su['viz']
+    game:NFG_Core = viz.game
     # callbacks
     def btn_add_cb(ms:MixedStrategy):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -274,6 +388,7 @@ def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('ms')
         st.session_state['su_pself_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_mod_cb(sid:int, ms:MixedStrategy):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -281,6 +396,7 @@ def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('ms')
         st.session_state['su_pself_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_del_cb(sid:int):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -288,9 +404,20 @@ def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('ms')
         st.session_state['su_pself_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def del_ses_ms():
         st.session_state.su['tmp'].pop('ms')
+        # this tab re-instantiates ms, the chart drops its preview
+        rerun_dependents(FRAGMENT_DEPS, ['preview'], extra=['su_edit_self'])
+
+    def name_cb(ms:MixedStrategy):
+        ms.label = st.session_state['su_pself_name_text_input']
+        rerun_dependents(FRAGMENT_DEPS, ['preview'])
+
+    def slider_cb(ms:MixedStrategy, support):
+        ms.update(support, st.session_state[f"su_pself_supports_slider_{support.sid}"], normalize=False)
+        rerun_dependents(FRAGMENT_DEPS, ['preview'])
 
     # fixed height scrollable window
     with st.container(height=250):
@@ -325,14 +452,18 @@ def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # put name, add, modify, delete horizontally
         with st.container(horizontal=True):
             # Name of current strategy.
-            ms.label = st.text_input('pself mixed strategy name text_input',ms.label,label_visibility='collapsed')
+            if NEW_MS:
+                st.session_state['su_pself_name_text_input'] = ms.label
+            ms.label = st.text_input('pself mixed strategy name text_input',
+                key='su_pself_name_text_input', on_change=name_cb, args=(ms,),
+                label_visibility='collapsed')
             
             # buttons
             if option == 'Add_new':
-                st.button('Add',on_click=btn_add_cb,args=(ms,),key=uid.get())
+                st.button('Add',on_click=btn_add_cb,args=(ms,),key=widget_key(viz.viz_id,'pself_add'))
             else:
-                st.button('Modify',on_click=btn_mod_cb,args=(sid,ms),key=uid.get())
-                st.button('Delete',on_click=btn_del_cb,args=(sid,),key=uid.get())   
+                st.button('Modify',on_click=btn_mod_cb,args=(sid,ms),key=widget_key(viz.viz_id,'pself_mod'))
+                st.button('Delete',on_click=btn_del_cb,args=(sid,),key=widget_key(viz.viz_id,'pself_del'))   
         
         # Mixed strategy supports and mixes
         # list all the supports (even with 0 ratio)
@@ -352,13 +483,18 @@ def render_edit_pself_tab(viz:StrategyUtilityViz, game:NFG_Core):
                         'pself ms support mix ratio slider',
                         0.0,1.0,
                         key=f"su_pself_supports_slider_{support.sid}",
+                        on_change=slider_cb, args=(ms,support),
                         label_visibility='collapsed')
                     ms.update(support,new_ratio,normalize=False)
 
                 # no delete nor add, only use ratio
 
 
-def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
+@st.fragment(key='su_edit_oppo')
+@timed('su.render_edit_oppo_tab')
+def render_edit_oppo_tab():
+    viz:StrategyUtilityViz = st.session_state.su['viz']
+    game:NFG_Core = viz.game
     # callbacks
     def btn_add_cb(msp:MixedStrategyProfile):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -366,6 +502,7 @@ def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('msp')
         st.session_state['su_oppo_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_mod_cb(sid:int, msp:MixedStrategyProfile):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -373,6 +510,7 @@ def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('msp')
         st.session_state['su_oppo_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def btn_del_cb(sid:int):
         viz:StrategyUtilityViz = st.session_state.su['viz']
@@ -380,9 +518,22 @@ def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # clear this edit tab to default
         st.session_state.su['tmp'].pop('msp')
         st.session_state['su_oppo_tab_mixed_strategy_selectbox'] = 'Add_new'
+        rerun_dependents(FRAGMENT_DEPS, ['structure'])
 
     def del_ses_msp():
         st.session_state.su['tmp'].pop('msp')
+        # this tab re-instantiates msp, the chart drops its preview
+        rerun_dependents(FRAGMENT_DEPS, ['preview'], extra=['su_edit_oppo'])
+
+    def name_cb(msp:MixedStrategyProfile):
+        msp.label = st.session_state['su_oppo_name_text_input']
+        rerun_dependents(FRAGMENT_DEPS, ['preview'])
+
+    def slider_cb(ms:MixedStrategy, support):
+        ms.update(support, st.session_state[f"su_oppo_supports_slider_{ms.pid}_{support.sid}"], normalize=False)
+        # only this opponent's mix changed: preview reuses the contraction over the others
+        st.session_state.su['tmp']['changed_pid'] = ms.pid
+        rerun_dependents(FRAGMENT_DEPS, ['preview'])
 
     # fixed height scrollable window
     with st.container(height=250):
@@ -422,14 +573,18 @@ def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
         # put name, add, modify, delete horizontally
         with st.container(horizontal=True):
             # Name of current strategy.
-            msp.label = st.text_input('oppo msp name text_input',msp.label,label_visibility='collapsed')
+            if NEW_MSP:
+                st.session_state['su_oppo_name_text_input'] = msp.label
+            msp.label = st.text_input('oppo msp name text_input',
+                key='su_oppo_name_text_input', on_change=name_cb, args=(msp,),
+                label_visibility='collapsed')
             
             # buttons
             if option == 'Add_new':
-                st.button('Add',on_click=btn_add_cb,args=(msp,),key=uid.get())
+                st.button('Add',on_click=btn_add_cb,args=(msp,),key=widget_key(viz.viz_id,'oppo_add'))
             else:
-                st.button('Modify',on_click=btn_mod_cb,args=(sid,msp),key=uid.get())
-                st.button('Delete',on_click=btn_del_cb,args=(sid,),key=uid.get())   
+                st.button('Modify',on_click=btn_mod_cb,args=(sid,msp),key=widget_key(viz.viz_id,'oppo_mod'))
+                st.button('Delete',on_click=btn_del_cb,args=(sid,),key=widget_key(viz.viz_id,'oppo_del'))   
         
         # Mixed Strategies in the profile
         # list all supports for each mixed strategy
@@ -450,6 +605,7 @@ def render_edit_oppo_tab(viz:StrategyUtilityViz, game:NFG_Core):
                             'oppo mix slider',
                             0.0,1.0,
                             key=f"su_oppo_supports_slider_{ms.pid}_{support.sid}",
+                            on_change=slider_cb, args=(ms,support),
                             label_visibility='collapsed')
                         ms.update(support,new_ratio, normalize=False)
                     # no delete nor add support. only use ratio
@@ -1,7 +1,16 @@
 from __future__ import annotations
+from collections import OrderedDict
 from typing import Dict, List
 import json
+import os
+import weakref
+
+import numpy as np
+
 from core.normal_form_game import NFG_Core
+from core.profiling import timed
+from core.session_store import dump_compact, load_compact, remove_files
+from core.widget_keys import content_id
 
 class PureStrategy:
     def __init__(self,pid,sid,visible,icon,label):
@@ -177,31 +186,143 @@ class compressed_suv:
             u_mat=data['u_mat']
         )
 
+class PartialContractionCache:
+    """
+    LRU cache of partial contractions of a player's payoff tensor.
+
+    An entry keyed by (player, free_pid, versions of the other opponents' mixes)
+    holds u_mat[player] contracted with every opponent except free_pid,
+    shape (n_strategies[player], n_strategies[free_pid]).
+    When only free_pid's mix changes (e.g. a slider moves), the payoff vector
+    is a single matrix-vector product against the cached entry.
+    Keys hold the contracted mixes' contents, so editing a mix never leaves a
+    stale entry behind: the edited mix misses the cache, entries built on its
+    old content age out of the LRU.
+    """
+    def __init__(self, game:NFG_Core, max_entries:int=256):
+        self.game:NFG_Core = game
+        self.max_entries:int = max_entries
+        self.entries:OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _version(vec:np.ndarray) -> bytes:
+        # content of the mix is its version: equal mixes share entries
+        return vec.tobytes()
+
+    def get_partial(self, player:int, free_pid:int, prob_vecs) -> np.ndarray:
+        key = (player, free_pid, tuple(
+            self._version(prob_vecs[p]) for p in range(self.game.n_players)
+            if p != player and p != free_pid
+        ))
+        partial = self.entries.get(key)
+        if partial is not None:
+            self.entries.move_to_end(key)
+            return partial
+
+        # player's axis first, free player's axis second, then contract the rest
+        res = np.moveaxis(self.game.u_mat[player], (player, free_pid), (0, 1))
+        for p in reversed(range(self.game.n_players)):
+            if p == player or p == free_pid:
+                continue
+            res = np.tensordot(res, prob_vecs[p], axes=([-1], [0]))
+
+        self.entries[key] = res
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return res
+
+    def get_payoff_vec(self, player:int, prob_vecs, changed_pid:int=None) -> np.ndarray:
+        """Expected payoff of each pure strategy of player against prob_vecs.
+        changed_pid hints which opponent's mix was edited last, so the
+        contraction over everyone else can be reused."""
+        if not self.game.dense:
+            # compact payoffs (polymatrix, sparse): direct, with no tensor to contract
+            return self.game.get_payoff_vec(player, prob_vecs)
+        if self.game.n_players == 1:
+            return self.game.u_mat[player]
+        if changed_pid is None or changed_pid == player:
+            # default: keep the last opponent free
+            changed_pid = max(p for p in range(self.game.n_players) if p != player)
+        return self.get_partial(player, changed_pid, prob_vecs) @ prob_vecs[changed_pid]
+
+    def nbytes(self) -> int:
+        return sum(partial.nbytes for partial in self.entries.values())
+
+    def invalidate(self):
+        """Drop every entry (to free memory: they are rebuilt on demand)."""
+        self.entries.clear()
+
+
 class StrategyUtilityViz:
     def __init__(self, game:NFG_Core, main_player):
         self.game:NFG_Core = game
         self.player:int = main_player
+        # identity for widget keys, and structure version (bumped on add/modify/delete)
+        self.viz_id:str = game.game_hash()[:12]
+        self.version:int = 0
+        # cached partial tensor contractions for utility updates
+        self.contractions = PartialContractionCache(game)
         # all perspectives
         self.all_player_data: Dict[int,compressed_suv] = {}
+        # perspectives moved to disk by spill_inactive: player -> file path
+        self.spilled: Dict[int,str] = {}
+        weakref.finalize(self, remove_files, self.spilled.values())
         # in each perspective:
         # pi_s:List[MixedStrategy] = [] # player i strategies
         # oppo_sps:List[MixedStrategyProfile] = []  # opponent mixed strategy profile = x data points
         # u_mat:List[List[float]] = [] # utility[self_player_strat][oppo_stat_profile]
 
+    def _oppo_payoff_vec(self,sprofile:MixedStrategyProfile,changed_pid:int=None):
+        # payoff of each of player i's pure strategies against sprofile.
+        # None if some mix in sprofile is empty (utility 0, as in get_util)
+        prob_vecs = self.game.get_prob_vecs(sprofile.mixed_strats)
+        if prob_vecs is None:
+            return None
+        return self.contractions.get_payoff_vec(self.player,prob_vecs,changed_pid)
+
+    def _strategy_vec(self,strategy:MixedStrategy):
+        vec = self.game.get_prob_vecs([strategy])
+        return None if vec is None else vec[strategy.pid]
+
+    def _util_row(self,strategy:MixedStrategy,oppo_sps:List[MixedStrategyProfile]):
+        # utilities of one player i strategy against every opponent profile
+        x = self._strategy_vec(strategy)
+        row = []
+        for oppo_sprofile in oppo_sps:
+            v = self._oppo_payoff_vec(oppo_sprofile)
+            row.append(0.0 if x is None or v is None else float(x @ v))
+        return row
+
+    def _util_col(self,sprofile:MixedStrategyProfile,pi_s:List[MixedStrategy],changed_pid:int=None):
+        # utilities of every player i strategy against one opponent profile
+        v = self._oppo_payoff_vec(sprofile,changed_pid)
+        col = []
+        for pi_strat in pi_s:
+            x = self._strategy_vec(pi_strat)
+            col.append(0.0 if x is None or v is None else float(x @ v))
+        return col
+
+    def preview_strategy_utils(self,strategy:MixedStrategy):
+        """Utilities of a (not yet added) player i strategy against current opponent profiles."""
+        return self._util_row(strategy,self.get_oppo_sps())
+
+    def preview_sprofile_utils(self,sprofile:MixedStrategyProfile,changed_pid:int=None):
+        """Utilities of current player i strategies against a (not yet added) opponent profile.
+        changed_pid: opponent whose mix was just edited, to reuse cached contractions."""
+        return self._util_col(sprofile,self.get_pi_s(),changed_pid)
+
+    @timed('su.viz.add_strategy_player_i')
     def _add_strategy_player_i(self,strategy:MixedStrategy):
+        self.version += 1
         strategy._normalize()
         if strategy.pid == self.player:
             data = self.all_player_data[self.player]
             data.pi_s.append(strategy)
-            data.u_mat.append(
-                [0 for _ in range(len(data.oppo_sps))])
-            for i, oppo_sprofile in enumerate(data.oppo_sps):
-                data.u_mat[-1][i] = self.game.get_util(
-                    self.player,
-                    [strategy,]+oppo_sprofile.mixed_strats
-                )
+            data.u_mat.append(self._util_row(strategy,data.oppo_sps))
 
+    @timed('su.viz.modify_strategy_player_i')
     def _modify_strategy_player_i(self,index:int,new_strategy:MixedStrategy):
+        self.version += 1
         # validity check - index in range, new_strategy belong to player i
         # replace player i's strategy at index
         # update self.u_mat[index]
@@ -210,13 +331,11 @@ class StrategyUtilityViz:
             data = self.all_player_data[self.player]
             if len(data.pi_s) > index and index >= 0:
                 data.pi_s[index] = new_strategy
-                for i, oppo_sprofile in enumerate(data.oppo_sps):
-                    data.u_mat[index][i] = self.game.get_util(
-                        self.player,
-                        [new_strategy,]+oppo_sprofile.mixed_strats
-                    )
+                data.u_mat[index] = self._util_row(new_strategy,data.oppo_sps)
 
+    @timed('su.viz.delete_strategy_player_i')
     def _delete_strategy_player_i(self,index:int):
+        self.version += 1
         # validity check - index in range
         # delete strategy from self.pi_s
         # delete utility row (self.u_mat[index])
@@ -226,21 +345,21 @@ class StrategyUtilityViz:
             data.u_mat.pop(index)
         
 
+    @timed('su.viz.add_sprofile_player_o')
     def _add_sprofile_player_o(self,sprofile:MixedStrategyProfile):
+        self.version += 1
         pids = set([ms.pid for ms in sprofile.mixed_strats])
         if self.player not in pids and len(pids) == self.game.n_players - 1:
             data = self.all_player_data[self.player]
             data.oppo_sps.append(sprofile)
-            for i, u_list in enumerate(data.u_mat):
-                pi_strat = data.pi_s[i]
+            for pi_strat in data.pi_s:
                 pi_strat._normalize()
-                utility = self.game.get_util(
-                    self.player,
-                    [pi_strat,]+sprofile.mixed_strats
-                )
+            for u_list, utility in zip(data.u_mat, self._util_col(sprofile,data.pi_s)):
                 u_list.append(utility)
 
+    @timed('su.viz.modify_sprofile_player_o')
     def _modify_sprofile_player_o(self,index:int,sprofile:MixedStrategyProfile):
+        self.version += 1
         # validity check - index in range, sprofile includes all players except player i
         # replace opponents strategy profile at self.oppo_sps[index]
         # update self.u_mat[:][index]
@@ -249,15 +368,14 @@ class StrategyUtilityViz:
             data = self.all_player_data[self.player]
             if len(data.oppo_sps) > index and index >= 0:
                 data.oppo_sps[index] = sprofile
-                for i, ulist in enumerate(data.u_mat):
-                    pi_strat = data.pi_s[i]
+                for pi_strat in data.pi_s:
                     pi_strat._normalize()
-                    ulist[index] = self.game.get_util(
-                        self.player,
-                        [pi_strat,]+sprofile.mixed_strats
-                    )
+                for ulist, utility in zip(data.u_mat, self._util_col(sprofile,data.pi_s)):
+                    ulist[index] = utility
 
+    @timed('su.viz.delete_sprofile_player_o')
     def _delete_sprofile_player_o(self,index:int):
+        self.version += 1
         # validity check - index in range
         # delete opponent strategy profile at self.oppo_sps[index]
         # delete opponent sp visiblity at self.oppo_viz[index]
@@ -269,11 +387,15 @@ class StrategyUtilityViz:
                 data.u_mat[i].pop(index)
         
 
+    @timed('su.viz.change_player')
     def change_player(self,p_id):
         if p_id == self.player:
             return
         # change pid
         self.player = p_id
+        self.version += 1
+        if p_id in self.spilled:
+            self._unspill(p_id)
         # set default if no previous data
         if p_id not in self.all_player_data:
             self.all_player_data[p_id] = compressed_suv(
@@ -286,6 +408,7 @@ class StrategyUtilityViz:
             # reset player p_id's viz
             self.reset_viz()
         
+    @timed('su.viz.reset_viz')
     def reset_viz(self):
         # initialize to default visualization
         # the game is given
@@ -315,6 +438,22 @@ class StrategyUtilityViz:
         self._add_sprofile_player_o(msp)
         # utility mat will be updated when adding.
 
+    def spill_inactive(self, spill_dir:str):
+        """Move the perspectives of players other than the current one to disk."""
+        for p in list(self.all_player_data.keys()):
+            if p == self.player:
+                continue
+            path = os.path.join(spill_dir, f"su_{id(self):x}_p{p}.json.gz")
+            dump_compact(self.all_player_data.pop(p).to_dict(), path)
+            self.spilled[p] = path
+        # rebuilt on demand
+        self.contractions.invalidate()
+
+    def _unspill(self, p_id:int):
+        path = self.spilled.pop(p_id)
+        self.all_player_data[p_id] = compressed_suv.from_dict(load_compact(path))
+        remove_files([path])
+
     def get_pi_s(self):
         return self.all_player_data[self.player].pi_s
     
@@ -334,14 +473,19 @@ class StrategyUtilityViz:
             'game':self.game.to_dict(),
             'player':self.player,
             'all_player_data':{
-                k:csuv.to_dict() for k,csuv in self.all_player_data.items()
-            }
+                **{k:csuv.to_dict() for k,csuv in self.all_player_data.items()},
+                **{k:load_compact(path) for k,path in self.spilled.items()}
+            },
+            # widget keys of a spilled and restored viz stay the same
+            'viz_id':self.viz_id,
+            'version':self.version
         }
     
     @classmethod
-    def from_dict(cls, data:dict) -> "StrategyUtilityViz":
+    def from_dict(cls, data:dict, game:NFG_Core=None) -> "StrategyUtilityViz":
+        # game: already parsed (e.g. shared) game of data['game']
         out = cls(
-            game=NFG_Core.from_dict(data['game']),
+            game=NFG_Core.from_dict(data['game']) if game is None else game,
             main_player=int(data['player']))
         if len(data['all_player_data']) > 0:
             out.all_player_data = {
@@ -353,6 +497,9 @@ class StrategyUtilityViz:
                     0,[],[],[]
                 )
             }
+        # viz files from before viz_id was saved: id from their content
+        out.viz_id = data['viz_id'] if 'viz_id' in data else content_id(data)
+        out.version = int(data.get('version', 0))
         return out
 
     @staticmethod